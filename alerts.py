@@ -1,20 +1,33 @@
 import requests
 import json
 import os
+import queue
+from collections import deque
 from datetime import datetime
 import cv2
 import threading
 import time
 import logging
-from config import TELEGRAM, RECORDING
-from recording_utils import ensure_recording_directory_exists, generate_recording_filename
+from requests.adapters import HTTPAdapter
+from config import TELEGRAM, RECORDING, ALERTS
+from event_hub import publish_event
+from status_aggregator import notify_status_change
+import metrics
 
 logger = logging.getLogger(__name__)
 
+TRIGGER_SECONDS = metrics.histogram('alert_trigger_seconds', 'Tempo do trigger_alert (sem o envio)', ('type',))
+ALERTS_TOTAL = metrics.counter(
+    'alerts_total', 'Alertas por resultado (sent, saved, failed, dropped, rate_limited)', ('camera', 'result')
+)
+
 
 class TelegramNotifier:
-    def __init__(self, config_source=None):
+    def __init__(self, config_source=None, pool_size=2):
         self.config = config_source or TELEGRAM
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount('https://', adapter)
         self._warn_if_misconfigured()
 
     def _warn_if_misconfigured(self):
@@ -33,6 +46,14 @@ class TelegramNotifier:
     def chat_id(self):
         return self.config.get('chat_id', '')
 
+    @property
+    def configured(self):
+        return bool(self.enabled and self.bot_token and self.chat_id)
+
+    @property
+    def timeout(self):
+        return self.config.get('timeout', 10)
+
     @property
     def send_screenshot(self):
         return self.config.get('send_screenshot', True)
@@ -49,7 +70,7 @@ class TelegramNotifier:
         self._warn_if_misconfigured()
 
     def send_alert(self, image_path=None, location='Camera Principal'):
-        if not self.enabled or not self.bot_token or not self.chat_id:
+        if not self.configured:
             return False
 
         try:
@@ -63,7 +84,7 @@ class TelegramNotifier:
                 'parse_mode': 'HTML'
             }
 
-            response = requests.post(url, data=data)
+            response = self.session.post(url, data=data, timeout=self.timeout)
 
             if response.status_code == 200:
                 logger.info('Telegram alert sent successfully')
@@ -87,7 +108,7 @@ class TelegramNotifier:
             with open(image_path, 'rb') as photo:
                 files = {'photo': photo}
                 data = {'chat_id': self.chat_id}
-                response = requests.post(url, files=files, data=data)
+                response = self.session.post(url, files=files, data=data, timeout=self.timeout)
 
             if response.status_code == 200:
                 logger.info('Telegram photo sent successfully')
@@ -98,239 +119,250 @@ class TelegramNotifier:
             logger.error(f'Error sending Telegram photo: {e}')
 
 
-class VideoRecorder:
+class AlertRateLimiter:
     def __init__(self, config_source=None):
-        self.config = config_source or RECORDING
-        self.recording = False
-        self.video_writer = None
-        self.recording_start_time = None
-        self.frame_buffer = []
-        self.filename = None
-        self._ensure_storage_path()
-
-    def _ensure_storage_path(self):
-        os.makedirs(self.storage_path, exist_ok=True)
-
-    def refresh_from_config(self, config_source=None):
-        self.config = config_source or RECORDING
-        self._ensure_storage_path()
-        self.frame_buffer = self.frame_buffer[-self.max_buffer_size:]
-        if not self.enabled and self.recording:
-            self.stop_recording()
+        self.config = config_source or ALERTS
+        self._lock = threading.Lock()
+        self._last_by_camera = {}
+        self._recent = deque()
 
     @property
-    def enabled(self):
-        return self.config.get('enabled', False)
+    def camera_cooldown(self):
+        return self.config.get('camera_cooldown', 30)
 
     @property
-    def record_on_person(self):
-        return self.config.get('record_on_person_detection', True)
+    def global_max_per_minute(self):
+        return self.config.get('global_max_per_minute', 10)
+
+    def allow(self, key, now=None):
+        now = now or time.time()
+        with self._lock:
+            last = self._last_by_camera.get(key)
+            if last is not None and now - last < self.camera_cooldown:
+                return False
 
-    @property
-    def duration(self):
-        return self.config.get('record_duration', 30)
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            limit = self.global_max_per_minute
+            if limit and len(self._recent) >= limit:
+                return False
 
-    @property
-    def codec(self):
-        return self.config.get('video_codec', 'mp4v')
+            self._last_by_camera[key] = now
+            self._recent.append(now)
+            return True
 
-    @property
-    def fps(self):
-        return self.config.get('fps', 20)
 
-    @property
-    def resolution(self):
-        width, height = self.config.get('resolution', (640, 480))
-        return int(width), int(height)
+class AlertJob:
+    def __init__(self, frame, image_path, alert_type, location, notifier=None, camera=None):
+        self.frame = frame
+        self.image_path = image_path
+        self.alert_type = alert_type
+        self.location = location
+        self.notifier = notifier
+        # Rotulo do alerts_total; None para jobs que nao sao alertas (snapshots)
+        self.camera = camera
+        self.image_saved = False
 
-    @property
-    def storage_path(self):
-        return self.config.get('storage_path', 'recordings/')
+    def run(self):
+        if not self.image_saved and self.image_path:
+            try:
+                cv2.imwrite(self.image_path, self.frame)
+                logger.info(f'Alert image saved: {self.image_path}')
+            except Exception as e:
+                logger.error(f'Error saving alert image: {e}')
+                self.image_path = None
+            self.image_saved = True
+            self.frame = None
 
-    @property
-    def max_storage_gb(self):
-        return self.config.get('max_storage_gb', 10)
+        if self.notifier is None:
+            return True
+        return self.notifier.send_alert(self.image_path, self.location)
 
-    @property
-    def max_buffer_size(self):
-        return int(self.fps * self.duration)
 
-    def start_recording(self, trigger_reason='Person detection'):
-        if not self.enabled or self.recording:
-            return False
+class AlertDispatcher:
+    def __init__(self, config_source=None):
+        self.config = config_source or ALERTS
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._workers = []
+        self._lock = threading.Lock()
 
-        try:
-            recording_dir = ensure_recording_directory_exists()
-            if not recording_dir:
-                logger.error('Could not prepare recordings directory')
-                return False
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
 
-            filename = generate_recording_filename()
-            full_path = os.path.join(recording_dir, filename)
+    @property
+    def queue_size(self):
+        return max(1, int(self.config.get('queue_size', 100)))
 
-            fourcc = cv2.VideoWriter_fourcc(*self.codec)
-            self.video_writer = cv2.VideoWriter(full_path, fourcc, self.fps, self.resolution)
+    @property
+    def worker_count(self):
+        return max(1, int(self.config.get('workers', 2)))
 
-            if self.video_writer.isOpened():
-                self.recording = True
-                self.recording_start_time = time.time()
-                self.filename = full_path
+    @property
+    def max_retries(self):
+        return max(0, int(self.config.get('max_retries', 3)))
 
-                for frame in self.frame_buffer:
-                    self.video_writer.write(frame)
+    @property
+    def retry_backoff(self):
+        return float(self.config.get('retry_backoff', 1.0))
 
-                logger.info(f'Recording started: {full_path}')
-                threading.Timer(self.duration, self.stop_recording).start()
-                return True
+    @property
+    def depth(self):
+        return self._queue.qsize()
 
-            logger.error('Could not open VideoWriter')
+    def submit(self, job):
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            self._count(job, 'dropped')
+            logger.warning('Alert queue full, dropping alert')
             return False
 
-        except Exception as e:
-            logger.error(f'Error starting recording: {e}')
-            return False
+    @staticmethod
+    def _count(job, result):
+        if job.camera is not None:
+            ALERTS_TOTAL.inc(camera=job.camera, result=result)
 
-    def write_frame(self, frame):
-        if not self.enabled:
+    def _ensure_workers(self):
+        if len(self._workers) >= self.worker_count and all(w.is_alive() for w in self._workers):
             return
+        with self._lock:
+            self._workers = [w for w in self._workers if w.is_alive()]
+            while len(self._workers) < self.worker_count:
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    name=f'alert-dispatch-{len(self._workers)}',
+                    daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run_with_retry(job)
+            finally:
+                self._queue.task_done()
 
-        if frame.shape[:2][::-1] != self.resolution:
-            frame = cv2.resize(frame, self.resolution)
-
-        self.frame_buffer.append(frame)
-        if len(self.frame_buffer) > self.max_buffer_size:
-            self.frame_buffer.pop(0)
-
-        if self.recording and self.video_writer:
+    def _run_with_retry(self, job):
+        for attempt in range(self.max_retries + 1):
             try:
-                self.video_writer.write(frame)
+                if job.run():
+                    with self._lock:
+                        self.delivered += 1
+                    # Contado so depois do envio real; sem Telegram o alerta so e salvo
+                    self._count(job, 'sent' if job.notifier is not None else 'saved')
+                    return
             except Exception as e:
-                logger.error(f'Error writing frame: {e}')
+                logger.error(f'Error dispatching alert: {e}')
 
-    def stop_recording(self):
-        if not self.recording or not self.video_writer:
-            return
-
-        try:
-            self.video_writer.release()
-            self.recording = False
-
-            elapsed_time = time.time() - self.recording_start_time
-            logger.info(f'Recording finished: {self.filename} ({elapsed_time:.1f}s)')
-            self.cleanup_old_recordings()
+            if attempt < self.max_retries:
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
 
-        except Exception as e:
-            logger.error(f'Error stopping recording: {e}')
-
-    def cleanup_old_recordings(self):
-        try:
-            total_size = 0
-            files = []
-            base_path = get_recordings_base_path()
-            if not os.path.exists(base_path):
-                return
-
-            for year in os.listdir(base_path):
-                year_path = os.path.join(base_path, year)
-                if not os.path.isdir(year_path):
-                    continue
-
-                for month in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month)
-                    if not os.path.isdir(month_path):
-                        continue
-
-                    for day in os.listdir(month_path):
-                        day_path = os.path.join(month_path, day)
-                        if not os.path.isdir(day_path):
-                            continue
-
-                        for filename in os.listdir(day_path):
-                            if filename.endswith('.mp4'):
-                                filepath = os.path.join(day_path, filename)
-                                try:
-                                    size = os.path.getsize(filepath)
-                                    total_size += size
-                                    files.append((filepath, os.path.getmtime(filepath)))
-                                except OSError:
-                                    continue
-
-            total_size_gb = total_size / (1024 ** 3)
-
-            if total_size_gb > self.max_storage_gb:
-                files.sort(key=lambda x: x[1])
-
-                for filepath, _ in files:
-                    if total_size_gb <= self.max_storage_gb * 0.8:
-                        break
-
-                    try:
-                        size = os.path.getsize(filepath)
-                        os.remove(filepath)
-                        total_size_gb -= size / (1024 ** 3)
-
-                        logger.info(f'Removed old recording: {filepath}')
-                        dir_path = os.path.dirname(filepath)
-                        try:
-                            os.rmdir(dir_path)
-                        except OSError:
-                            pass
-
-                    except Exception as e:
-                        logger.error(f'Error removing file {filepath}: {e}')
+        with self._lock:
+            self.failed += 1
+        self._count(job, 'failed')
 
-        except Exception as e:
-            logger.error(f'Error cleaning recordings: {e}')
+    def get_stats(self):
+        return {
+            'queue_depth': self.depth,
+            'queue_size': self.queue_size,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'retries': self.retries
+        }
 
 
 class AlertManager:
     def __init__(self):
-        self.telegram = TelegramNotifier()
-        self.recorder = VideoRecorder()
+        self.telegram = TelegramNotifier(pool_size=ALERTS.get('workers', 2))
+        self.recording_config = RECORDING
+        self.recorders = {}
+        self.dispatcher = AlertDispatcher()
+        self.rate_limiter = AlertRateLimiter()
         self.alert_count = 0
+        self.rate_limited = 0
         self.last_alert_time = 0
-        self.alert_cooldown = 30  # seconds between alerts
 
     def refresh_from_config(self):
         self.telegram.refresh_from_config()
-        self.recorder.refresh_from_config()
+        for recorder in list(self.recorders.values()):
+            recorder.refresh_from_config()
+
+    def register_recorder(self, camera_id, recorder):
+        self.recorders[camera_id] = recorder
+
+    def unregister_recorder(self, camera_id):
+        recorder = self.recorders.pop(camera_id, None)
+        if recorder:
+            recorder.stop_recording()
+
+    @property
+    def is_recording(self):
+        return any(recorder.recording for recorder in list(self.recorders.values()))
+
+    def save_snapshot(self, image_path, frame):
+        return self.dispatcher.submit(AlertJob(frame, image_path, 'snapshot', None))
 
-    def trigger_alert(self, frame, alert_type='person', location='Camera Principal'):
+    def trigger_alert(self, frame, alert_type='person', location='Camera Principal', camera_id=None):
+        with TRIGGER_SECONDS.time(type=alert_type):
+            sent = self._trigger_alert(frame, alert_type, location, camera_id)
+        if not sent:
+            ALERTS_TOTAL.inc(camera=camera_id or location, result='rate_limited')
+        # Os demais resultados sao contados pelo dispatcher quando o job termina
+        return sent
+
+    def _trigger_alert(self, frame, alert_type, location, camera_id):
         current_time = time.time()
 
-        if current_time - self.last_alert_time < self.alert_cooldown:
+        recorder = self.recorders.get(camera_id)
+        if alert_type == 'person' and recorder and recorder.record_on_person:
+            recorder.start_recording(f'Detection: {alert_type}')
+
+        if not self.rate_limiter.allow(camera_id or location, current_time):
+            self.rate_limited += 1
             return False
 
         self.alert_count += 1
         self.last_alert_time = current_time
+        notify_status_change()
+        publish_event('alert', {
+            'camera_id': camera_id,
+            'type': alert_type,
+            'location': location,
+            'count': self.alert_count,
+            'timestamp': current_time
+        })
 
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         image_path = f'alerts/alerta_{timestamp}.jpg'
 
-        try:
-            cv2.imwrite(image_path, frame)
-            logger.info(f'Alert image saved: {image_path}')
-        except Exception as e:
-            logger.error(f'Error saving alert image: {e}')
-            image_path = None
-
-        if alert_type == 'person':
-            self.telegram.send_alert(image_path, location)
-
-        if alert_type == 'person' and self.recorder.record_on_person:
-            self.recorder.start_recording(f'Detection: {alert_type}')
+        notifier = self.telegram if alert_type == 'person' and self.telegram.configured else None
+        self.dispatcher.submit(AlertJob(frame, image_path, alert_type, location, notifier, camera_id or location))
 
         logger.info(f'Alert #{self.alert_count} triggered: {alert_type} at {location}')
         return True
 
     def get_alert_stats(self):
-        return {
+        stats = {
             'total_alerts': self.alert_count,
             'last_alert_time': self.last_alert_time,
             'telegram_enabled': self.telegram.enabled,
-            'recording_enabled': self.recorder.enabled,
-            'is_recording': self.recorder.recording
+            'recording_enabled': self.recording_config.get('enabled', False),
+            'is_recording': self.is_recording,
+            'rate_limited': self.rate_limited
         }
+        stats.update(self.dispatcher.get_stats())
+        return stats
 
 # Instância global do gerenciador de alertas
 alert_manager = AlertManager()
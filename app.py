@@ -1,20 +1,30 @@
-﻿import json
+﻿import ipaddress
+import json
 import logging
 import os
 import time
 import yaml
 from datetime import datetime
-from flask import Flask, render_template, Response, request, jsonify, redirect, url_for, session, send_file, abort
+from flask import Flask, render_template, Response, request, jsonify, redirect, url_for, session, send_file, send_from_directory, abort
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from ultralytics import YOLO as YOLOModel
 
 from alerts import get_alert_manager
+from detection_scheduler import get_detection_scheduler
+from detection_workers import get_detection_pool
+from event_hub import format_event, get_event_hub
+from hls_live import PLAYLIST_NAME, get_hls_manager
+from inference_engine import get_inference_engine
+from live_view import resolve_view
+from metrics import get_metrics_registry
+from recording_catalog import get_recording_catalog
+from retention import get_retention_manager
+from status_aggregator import get_status_aggregator, get_system_sampler
+from stream_server import StreamServer
 from recording_utils import (
     get_recordings_base_path, get_recording_path_for_date,
     ensure_recording_directory_exists, generate_recording_filename,
-    get_all_recordings, get_recordings_by_year_month, get_recordings_by_date,
-    format_file_size, parse_recording_filename
+    format_file_size, parse_recording_filename, RECORDING_EXTENSIONS
 )
 app = Flask(__name__)
 from config import *
@@ -65,8 +75,41 @@ def load_user(user_id):
 
 from camera_manager import CameraManager
 
-# Inicializar cameras (configuracoes vindas de config.py)
-camera_manager = CameraManager()
+# Workers de deteccao sobem antes de qualquer thread do app (cameras,
+# retencao, status); o CameraManager so reaproveita o pool ja criado.
+get_detection_pool()
+
+# Inicializar cameras (configuracoes vindas de config.py). A conexao com as
+# cameras e o carregamento do modelo acontecem em segundo plano; o servidor
+# responde enquanto isso e o progresso aparece em /api/system/status.
+camera_manager = CameraManager(autostart=False)
+camera_manager.start_background()
+
+# Retencao de gravacoes em segundo plano (cota e idade maxima)
+get_retention_manager().start()
+
+
+def session_authenticated(cookies):
+    """Valida o cookie de sessao do Flask fora de uma requisicao (servidor assincrono)."""
+    raw = cookies.get(app.config['SESSION_COOKIE_NAME'])
+    serializer = app.session_interface.get_signing_serializer(app)
+    if not raw or serializer is None:
+        return False
+    try:
+        data = serializer.loads(raw, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return False
+    return load_user(data.get('_user_id')) is not None
+
+
+# /video_feed e /events tambem servidos pelo aiohttp, sem uma thread por cliente
+stream_server = StreamServer(
+    camera_manager,
+    session_authenticated,
+    initial_status=lambda: get_status_aggregator().snapshot()[1]
+)
+if STREAMING.get('async_enabled'):
+    stream_server.start()
 
 CONFIG_SECTIONS = {
     'camera_defaults': CAMERA_DEFAULTS,
@@ -75,11 +118,17 @@ CONFIG_SECTIONS = {
     'system': SYSTEM,
     'security': SECURITY,
     'telegram': TELEGRAM,
+    'alerts': ALERTS,
     'recording': RECORDING,
     'ip_whitelist': IP_WHITELIST,
     'schedule': SCHEDULE,
     'logging': LOGGING,
-    'performance': PERFORMANCE
+    'performance': PERFORMANCE,
+    'events': EVENTS,
+    'metrics': METRICS,
+    'live_views': LIVE_VIEWS,
+    'streaming': STREAMING,
+    'hls': HLS
 }
 
 
@@ -151,12 +200,14 @@ def apply_configuration_updates(payload):
 
 
 def handle_config_side_effects(changed_sections):
-    if {'camera_defaults', 'motion_detection', 'yolo'} & changed_sections:
+    if {'camera_defaults', 'motion_detection', 'yolo', 'recording'} & changed_sections:
         camera_manager.apply_config()
-    if {'recording', 'telegram'} & changed_sections:
+    if {'recording', 'telegram', 'alerts'} & changed_sections:
         get_alert_manager().refresh_from_config()
     if 'security' in changed_sections:
         refresh_user_store()
+    if 'events' in changed_sections:
+        get_event_hub().configure(EVENTS)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -193,7 +244,42 @@ def recordings():
 @app.route('/')
 @login_required
 def index():
-    return render_template('index.html', cameras=get_camera_entries())
+    return render_template(
+        'index.html',
+        cameras=get_camera_entries(),
+        stream_base=stream_server.public_base(request.host)
+    )
+
+
+def mjpeg_response(stream):
+    """
+    Stream MJPEG do perfil pedido (?profile=grid|focus|full, ?width=,
+    ?quality=, ?fps=). ?client_fps= limita so este cliente, sem mudar o
+    codificador compartilhado do perfil.
+    """
+    spec = resolve_view(
+        request.args.get('profile'),
+        width=request.args.get('width'),
+        quality=request.args.get('quality'),
+        max_fps=request.args.get('fps')
+    )
+    try:
+        client_fps = max(0.0, float(request.args.get('client_fps', 0)))
+    except (TypeError, ValueError):
+        client_fps = 0.0
+
+    # Escrita bloqueada num cliente parado estoura o timeout do socket e
+    # libera a thread, em vez de segurar a conexao indefinidamente
+    stall_timeout = LIVE_VIEWS.get('stall_timeout')
+    sock = request.environ.get('werkzeug.socket')
+    if sock is not None and stall_timeout:
+        try:
+            sock.settimeout(float(stall_timeout))
+        except OSError:
+            pass
+
+    frames = stream.generate_frames(stream.get_view(spec), client=request.remote_addr, max_fps=client_fps)
+    return Response(frames, mimetype='multipart/x-mixed-replace; boundary=frame')
 
 
 @app.route('/video_feed')
@@ -203,8 +289,7 @@ def default_video_feed():
     stream = camera_manager.get_stream(camera_id) if camera_id else camera_manager.get_default_stream()
     if not stream:
         abort(404)
-    return Response(stream.generate_frames(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+    return mjpeg_response(stream)
 
 
 @app.route('/video_feed/<camera_id>')
@@ -213,12 +298,78 @@ def video_feed(camera_id):
     stream = camera_manager.get_stream(camera_id)
     if not stream:
         abort(404)
-    return Response(stream.generate_frames(),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
+    return mjpeg_response(stream)
 
-@app.route('/status')
+
+@app.route('/api/cameras/<camera_id>/viewers')
 @login_required
-def status():
+def api_camera_viewers(camera_id):
+    stream = camera_manager.get_stream(camera_id)
+    if not stream:
+        return jsonify({'error': 'Câmera não encontrada'}), 404
+    return jsonify({'camera_id': stream.camera_id, 'viewers': stream.get_viewers()})
+
+
+@app.route('/api/cameras/<camera_id>/snapshot.jpg')
+@login_required
+def camera_snapshot(camera_id):
+    """Ultimo frame em JPEG (?max_age=, ?width=, ?quality=, ?profile=) com ETag."""
+    stream = camera_manager.get_stream(camera_id)
+    if not stream:
+        abort(404)
+    default_age = float(LIVE_VIEWS.get('snapshot_max_age', 1.0))
+    try:
+        max_age = min(60.0, max(0.0, float(request.args.get('max_age', default_age))))
+    except (TypeError, ValueError):
+        max_age = default_age
+    spec = resolve_view(
+        request.args.get('profile', 'full'),
+        width=request.args.get('width'),
+        quality=request.args.get('quality'),
+        max_fps=0
+    )
+    etag, jpeg = stream.get_snapshot(spec, max_age=max_age)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(jpeg, mimetype='image/jpeg')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={int(max_age)}'
+    return response
+
+
+@app.route('/live/<camera_id>/index.m3u8')
+@login_required
+def live_playlist(camera_id):
+    """Playlist HLS ao vivo (fMP4); o ffmpeg da camera sobe no primeiro pedido."""
+    hls_manager = get_hls_manager()
+    if not hls_manager.enabled:
+        abort(404)
+    stream = camera_manager.get_stream(camera_id)
+    if not stream or not stream.rtsp_url:
+        abort(404)
+    live = hls_manager.open(stream.camera_id, stream.rtsp_url)
+    if live is None:
+        return jsonify({'error': 'HLS indisponível para esta câmera'}), 503
+    response = send_from_directory(live.directory, PLAYLIST_NAME, mimetype='application/vnd.apple.mpegurl')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/live/<camera_id>/<segment>')
+@login_required
+def live_segment(camera_id, segment):
+    """Segmentos (init.mp4 e seg_N.m4s) do playlist ao vivo."""
+    hls_manager = get_hls_manager()
+    live = hls_manager.touch(camera_id)
+    if live is None or not segment.endswith(('.mp4', '.m4s')):
+        abort(404)
+    # Segmentos nao mudam depois de escritos; o init pode mudar se o ffmpeg reiniciar
+    response = send_from_directory(live.directory, segment, mimetype='video/mp4')
+    response.headers['Cache-Control'] = 'no-cache' if segment.endswith('.mp4') else 'private, max-age=60'
+    return response
+
+def build_status_payload():
     alert_manager = get_alert_manager()
     alert_stats = alert_manager.get_alert_stats()
     camera_statuses = camera_manager.get_all_statuses()
@@ -243,7 +394,7 @@ def status():
         fps_sum = sum(float(status.get('frame_rate') or 0) for status in camera_list)
         avg_fps = round(fps_sum / len(camera_list), 2)
 
-    return jsonify({
+    return {
         'cameras': camera_list,
         'motion_detected': aggregate('motion_detected'),
         'person_detected': aggregate('person_detected'),
@@ -257,7 +408,78 @@ def status():
         'ai_last_timestamp': ai_last_timestamp,
         'total_detections': total_detections,
         'avg_fps': avg_fps
-    })
+    }
+
+
+@app.route('/status')
+@login_required
+def status():
+    etag, body = status_aggregator.snapshot()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    # no-cache: o navegador guarda a resposta mas revalida com If-None-Match
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/status/telemetry')
+@login_required
+def status_telemetry():
+    """FPS, contadores e idade dos frames; muda a todo instante, entao nao tem versao."""
+    response = jsonify(status_aggregator.telemetry())
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/events')
+@login_required
+def events():
+    """Canal SSE: status, deteccoes, conexoes e alertas enviados na hora."""
+    _, body = status_aggregator.snapshot()
+    stream = get_event_hub().stream(
+        last_event_id=request.headers.get('Last-Event-ID'),
+        initial=format_event(None, 'status', body)
+    )
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Evita que proxies (nginx) segurem os eventos em buffer
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def metrics_client_allowed(remote_addr):
+    try:
+        address = ipaddress.ip_address(remote_addr or '')
+    except ValueError:
+        return False
+    for network in METRICS.get('allowed_ips') or []:
+        try:
+            if address in ipaddress.ip_network(network, strict=False):
+                return True
+        except ValueError:
+            continue
+    return False
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metricas no formato texto do Prometheus (login ou IP liberado)."""
+    if not METRICS.get('enabled'):
+        abort(404)
+    if not current_user.is_authenticated and not metrics_client_allowed(request.remote_addr):
+        abort(403)
+    return Response(get_metrics_registry().render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Snapshot do /status reconstruido so quando algo muda, e metricas do
+# sistema amostradas em segundo plano
+status_aggregator = get_status_aggregator()
+status_aggregator.configure(build_status_payload)
+status_aggregator.start()
+get_system_sampler().start()
 
 @app.route('/alerts')
 @login_required
@@ -358,6 +580,14 @@ def api_add_camera():
         'rtsp_url': rtsp_url,
         'enabled': enabled
     }
+    substream_url = (data.get('substream_url') or '').strip()
+    if substream_url:
+        payload['substream_url'] = substream_url
+    motion = data.get('motion')
+    if motion is not None and not isinstance(motion, dict):
+        return jsonify({'error': 'Configuração de movimento inválida'}), 400
+    if motion:
+        payload['motion'] = motion
     try:
         new_camera = camera_manager.add_camera(payload)
     except ValueError as exc:
@@ -383,6 +613,14 @@ def api_update_camera(camera_id):
     if 'enabled' in data:
         payload['enabled'] = bool(data['enabled'])
 
+    if 'substream_url' in data:
+        payload['substream_url'] = (data['substream_url'] or '').strip()
+
+    if 'motion' in data:
+        if data['motion'] is not None and not isinstance(data['motion'], dict):
+            return jsonify({'error': 'Configuração de movimento inválida'}), 400
+        payload['motion'] = data['motion']
+
     if not payload:
         return jsonify({'error': 'Nenhuma alteração fornecida'}), 400
 
@@ -393,6 +631,14 @@ def api_update_camera(camera_id):
     return jsonify({'status': 'success', 'camera': updated})
 
 
+@app.route('/api/cameras/<camera_id>/reconnect', methods=['POST'])
+@login_required
+def api_reconnect_camera(camera_id):
+    if not camera_manager.reconnect_camera(camera_id):
+        return jsonify({'error': 'Câmera não encontrada'}), 404
+    return jsonify({'status': 'success'})
+
+
 @app.route('/api/cameras/<camera_id>', methods=['DELETE'])
 @login_required
 def api_delete_camera(camera_id):
@@ -558,25 +804,41 @@ def api_alerts():
 @app.route('/api/recordings')
 @login_required
 def api_recordings():
-    """API: Listar gravações"""
+    """API: Listar gravações (consultas indexadas no catálogo)"""
     try:
-        # Obter parâmetros opcionais de data
+        # Obter parâmetros opcionais de data, câmera e paginação
         year = request.args.get('year')
         month = request.args.get('month')
         day = request.args.get('day')
+        camera_id = request.args.get('camera') or None
+        catalog = get_recording_catalog()
         
         if year and month and day:
-            # Listar vídeos de um dia específico
-            recordings = get_recordings_by_date(year, month, day)
+            # Listar vídeos de um dia específico; paginado só quando o cliente
+            # pede (?page=/?per_page=), senão o dia vem inteiro
+            filters = {'year': year, 'month': month, 'day': day, 'camera_id': camera_id}
+            total = catalog.count_recordings(**filters)
+            if 'page' not in request.args and 'per_page' not in request.args:
+                response = jsonify(catalog.list_recordings(**filters))
+                response.headers['X-Total-Count'] = str(total)
+                return response
+            page = max(1, request.args.get('page', 1, type=int))
+            per_page = min(500, max(1, request.args.get('per_page', 100, type=int)))
+            recordings = catalog.list_recordings(limit=per_page, offset=(page - 1) * per_page, **filters)
+            response = jsonify(recordings)
+            response.headers['X-Total-Count'] = str(total)
+            response.headers['X-Page'] = str(page)
+            response.headers['X-Per-Page'] = str(per_page)
+            return response
         elif year and month:
             # Listar dias disponíveis em um mês
-            recordings = get_recordings_by_year_month(year, month)
+            recordings = catalog.list_days(year, month, camera_id=camera_id)
         elif year:
             # Listar meses disponíveis em um ano
-            recordings = get_recordings_by_year(year)
+            recordings = catalog.list_months(year, camera_id=camera_id)
         else:
-            # Listar todos os vídeos organizados por data
-            recordings = get_all_recordings()
+            # Listar anos com gravações
+            recordings = catalog.list_years(camera_id=camera_id)
         
         return jsonify(recordings)
     
@@ -584,56 +846,15 @@ def api_recordings():
         logger.error(f"Erro ao listar gravações: {e}")
         return jsonify([])
 
-def get_recordings_by_year(year):
-    """Obter lista de meses com gravações em um ano"""
-    recordings = []
-    base_path = get_recordings_base_path()
-    year_path = os.path.join(base_path, year)
-    
-    if os.path.exists(year_path):
-        for month in sorted(os.listdir(year_path)):
-            month_path = os.path.join(year_path, month)
-            if os.path.isdir(month_path):
-                # Contar quantos vídeos existem neste mês
-                video_count = 0
-                for day in os.listdir(month_path):
-                    day_path = os.path.join(month_path, day)
-                    if os.path.isdir(day_path):
-                        video_count += len([f for f in os.listdir(day_path) if f.endswith('.mp4')])
-                
-                if video_count > 0:
-                    recordings.append({
-                        'type': 'month',
-                        'year': year,
-                        'month': month,
-                        'video_count': video_count,
-                        'path': f"{year}/{month}"
-                    })
-    
-    return recordings
-
-def get_recordings_by_year_month(year, month):
-    """Obter lista de dias com gravações em um mês específico"""
-    recordings = []
-    base_path = get_recordings_base_path()
-    month_path = os.path.join(base_path, year, month)
-    
-    if os.path.exists(month_path):
-        for day in sorted(os.listdir(month_path)):
-            day_path = os.path.join(month_path, day)
-            if os.path.isdir(day_path):
-                video_files = [f for f in os.listdir(day_path) if f.endswith('.mp4')]
-                if video_files:
-                    recordings.append({
-                        'type': 'day',
-                        'year': year,
-                        'month': month,
-                        'day': day,
-                        'video_count': len(video_files),
-                        'path': f"{year}/{month}/{day}"
-                    })
-    
-    return recordings
+@app.route('/api/recordings/reconcile', methods=['POST'])
+@login_required
+def api_recordings_reconcile():
+    """API: Reimportar gravações existentes no disco para o catálogo"""
+    try:
+        return jsonify(get_recording_catalog().reconcile())
+    except Exception as e:
+        logger.error(f"Erro ao reconciliar catálogo de gravações: {e}")
+        return jsonify({'error': 'Erro ao reconciliar gravações'}), 500
 
 @app.route('/api/recordings/download/<path:filepath>')
 @login_required
@@ -648,14 +869,15 @@ def download_recording(filepath):
         if not os.path.exists(full_path):
             return jsonify({'error': 'Arquivo não encontrado'}), 404
         
-        # Verificar se é um arquivo .mp4
-        if not filepath.endswith('.mp4'):
+        # Verificar se é um arquivo de vídeo (.mp4/.mkv)
+        if not filepath.endswith(RECORDING_EXTENSIONS):
             return jsonify({'error': 'Tipo de arquivo inválido'}), 400
         
         # Verificar se o caminho está dentro da pasta de gravações
         real_base = os.path.realpath(base_path)
         real_file = os.path.realpath(full_path)
-        if not real_file.startswith(real_base):
+        # startswith aceitaria pastas irmas como recordings_old/
+        if os.path.commonpath([real_base, real_file]) != real_base:
             return jsonify({'error': 'Acesso não autorizado'}), 403
         
         # Enviar arquivo
@@ -665,6 +887,34 @@ def download_recording(filepath):
         logger.error(f"Erro ao fazer download da gravação: {e}")
         return jsonify({'error': 'Erro ao fazer download'}), 500
 
+@app.route('/api/recordings/stream/<path:filepath>')
+@login_required
+def stream_recording(filepath):
+    """Reproduzir uma gravação no navegador (aceita Range para avançar/voltar)"""
+    try:
+        base_path = get_recordings_base_path()
+        full_path = os.path.join(base_path, filepath)
+
+        if not os.path.exists(full_path):
+            return jsonify({'error': 'Arquivo não encontrado'}), 404
+
+        if not filepath.endswith(RECORDING_EXTENSIONS):
+            return jsonify({'error': 'Tipo de arquivo inválido'}), 400
+
+        real_base = os.path.realpath(base_path)
+        real_file = os.path.realpath(full_path)
+        # startswith aceitaria pastas irmas como recordings_old/
+        if os.path.commonpath([real_base, real_file]) != real_base:
+            return jsonify({'error': 'Acesso não autorizado'}), 403
+
+        # conditional=True responde 206 Partial Content aos pedidos com Range
+        mimetype = 'video/x-matroska' if filepath.endswith('.mkv') else 'video/mp4'
+        return send_file(full_path, mimetype=mimetype, as_attachment=False, conditional=True)
+
+    except Exception as e:
+        logger.error(f"Erro ao reproduzir gravação: {e}")
+        return jsonify({'error': 'Erro ao reproduzir gravação'}), 500
+
 @app.route('/api/system/status')
 @login_required
 def api_system_status():
@@ -674,8 +924,6 @@ def api_system_status():
         alert_stats = alert_manager.get_alert_stats()
         camera_statuses = camera_manager.get_all_statuses()
         
-        # Informações do sistema
-        import psutil
         total_motion = sum(status.get('motion_events', 0) for status in camera_statuses.values())
         total_person = sum(status.get('person_events', 0) for status in camera_statuses.values())
         
@@ -684,20 +932,26 @@ def api_system_status():
             'detection': {
                 'motion_enabled': MOTION_DETECTION['enabled'],
                 'yolo_enabled': any(status.get('yolo_active') for status in camera_statuses.values()),
-                'confidence': YOLO['confidence']
+                'confidence': YOLO['confidence'],
+                'inference': get_inference_engine().get_stats(),
+                'workers': camera_manager.detection_pool.get_stats() if camera_manager.detection_pool else None,
+                'scheduler': get_detection_scheduler().get_stats()
             },
+            'startup': get_startup_status(),
             'alerts': alert_stats,
-            'system': {
-                'cpu_percent': psutil.cpu_percent(),
-                'memory_percent': psutil.virtual_memory().percent,
-                'disk_free': psutil.disk_usage('.').free // (1024**3),  # GB
-                'uptime': time.time() - start_time if 'start_time' in globals() else 0
-            },
+            'system': dict(
+                get_system_sampler().sample,
+                uptime=time.time() - start_time if 'start_time' in globals() else 0
+            ),
+            'status_snapshot': status_aggregator.get_stats(),
+            'events': get_event_hub().get_stats(),
+            'async_streaming': stream_server.get_stats(),
             'counts': {
                 'motion': total_motion,
                 'person': total_person,
                 'alerts': alert_stats.get('total_alerts', 0)
             },
+            'storage': get_retention_manager().get_stats(),
             'config': {
                 'telegram_enabled': TELEGRAM['enabled'],
                 'recording_enabled': RECORDING['enabled'],
@@ -710,6 +964,15 @@ def api_system_status():
         logger.error(f"Erro ao obter status do sistema: {e}")
         return jsonify({'error': 'Erro ao obter status do sistema'}), 500
 
+def get_startup_status():
+    cameras = camera_manager.get_readiness()
+    inference_state = get_inference_engine().state
+    return {
+        'ready': cameras['state'] == 'ready' and inference_state in ('ready', 'error'),
+        'cameras': cameras,
+        'inference': inference_state
+    }
+
 # Função auxiliar para obter dados de configuração
 def get_config_data():
     """Obter configurações atuais para exibição"""
@@ -721,11 +984,17 @@ def get_config_data():
         'system': SYSTEM,
         'security': SECURITY,
         'telegram': TELEGRAM,
+        'alerts': ALERTS,
         'recording': RECORDING,
         'ip_whitelist': IP_WHITELIST,
         'schedule': SCHEDULE,
         'logging': LOGGING,
-        'performance': PERFORMANCE
+        'performance': PERFORMANCE,
+        'events': EVENTS,
+        'metrics': METRICS,
+        'live_views': LIVE_VIEWS,
+        'streaming': STREAMING,
+        'hls': HLS
     }
 
 if __name__ == '__main__':
@@ -733,15 +1002,6 @@ if __name__ == '__main__':
     os.makedirs('alerts', exist_ok=True)
     os.makedirs('recordings', exist_ok=True)
     
-    # Baixar modelo YOLOv8 se não existir
-    if not os.path.exists('yolov8n.pt'):
-        logger.info("Baixando modelo YOLOv8n...")
-        try:
-            model = YOLOModel('yolov8n.pt')
-            logger.info("Modelo YOLOv8n baixado com sucesso")
-        except Exception as e:
-            logger.error(f"Erro ao baixar modelo YOLOv8: {e}")
-    
     logger.info("Iniciando servidor Flask...")
     app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
 
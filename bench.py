@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pipeline captura -> movimento -> YOLO -> JPEG.
+
+Sobe N cameras simuladas com ``CameraStream`` lendo um arquivo de video
+(gravado ou sintetico, gerado aqui mesmo) no lugar do RTSP, pendura V
+clientes MJPEG em cada uma e mede fps de captura, custo da deteccao de
+movimento, latencia do YOLO (p50/p95), custo do JPEG por cliente e memoria
+por camera. O relatorio sai em JSON e pode ser comparado com uma linha de
+base salva; regressoes acima da tolerancia encerram com codigo 1.
+
+Roda offline em CPU: o modelo precisa estar no disco (``--model``) ou o
+benchmark segue so com movimento (``--no-yolo``).
+
+Uso:
+    python bench.py --cameras 4 --seconds 30 --viewers 2 --output bench.json
+    python bench.py gravacao.mp4 --cameras 8 --baseline bench_base.json
+    python bench.py --no-yolo --save-baseline bench_base.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import CAMERA_DEFAULTS, PERFORMANCE, RECORDING, TELEGRAM, YOLO
+
+# Metricas comparadas com a linha de base: True = maior e melhor
+BASELINE_METRICS = {
+    'capture_fps': True,
+    'viewer_fps': True,
+    'motion_ms': False,
+    'yolo_p50_ms': False,
+    'yolo_p95_ms': False,
+    'encode_ms': False,
+    'encode_ms_per_viewer': False,
+    'memory_mb_per_camera': False
+}
+
+
+def generate_sample(target, seconds, fps=15, size=(640, 480)):
+    """Video sintetico com fundo ruidoso e um bloco que entra e sai de cena."""
+    width, height = size
+    writer = cv2.VideoWriter(target, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    rng = np.random.default_rng(0)
+    background = rng.integers(40, 80, (height, width, 3), dtype=np.uint8)
+    total = int(seconds * fps)
+    for index in range(total):
+        frame = background.copy()
+        # Metade do tempo com movimento, metade parado: exercita o agendador
+        if (index // (fps * 2)) % 2 == 0:
+            x = int((index % (fps * 2)) / float(fps * 2) * (width - 120))
+            cv2.rectangle(frame, (x, height // 3), (x + 120, height // 3 + 200), (200, 200, 200), -1)
+        writer.write(frame)
+    writer.release()
+    return target
+
+
+def resident_memory_mb():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def mean(values):
+    values = [value for value in values if value is not None]
+    return round(sum(values) / len(values), 2) if values else 0.0
+
+
+class Viewer(threading.Thread):
+    """Cliente MJPEG simulado: consome o gerador de ``/video_feed``."""
+
+    def __init__(self, stream, view, stop_event):
+        super().__init__(daemon=True)
+        self.stream = stream
+        self.view = view
+        self.stop_event = stop_event
+        self.frames = 0
+        self.bytes = 0
+
+    def run(self):
+        for chunk in self.stream.generate_frames(self.view):
+            self.frames += 1
+            self.bytes += len(chunk)
+            if self.stop_event.is_set():
+                break
+
+
+def configure(args):
+    """Ajusta a configuracao global para rodar isolado e sem efeitos colaterais."""
+    RECORDING['enabled'] = False
+    RECORDING['mode'] = 'reencode'
+    TELEGRAM['enabled'] = False
+    PERFORMANCE['use_gpu'] = False
+    PERFORMANCE['detection_workers'] = args.workers
+    if args.detection_resize is not None:
+        PERFORMANCE['detection_resize'] = args.detection_resize
+    if args.backend:
+        YOLO['backend'] = args.backend
+    if args.model:
+        YOLO['model'] = os.path.abspath(args.model) if os.path.isfile(args.model) else args.model
+    if os.path.isfile(YOLO['model']):
+        YOLO['model'] = os.path.abspath(YOLO['model'])
+    YOLO['export_dir'] = os.path.abspath(YOLO.get('export_dir') or 'models')
+    return dict(CAMERA_DEFAULTS, frame_rate=args.fps)
+
+
+def load_engine(args):
+    from inference_engine import get_inference_engine
+
+    engine = get_inference_engine()
+    if args.no_yolo:
+        # Sem modelo carregado as cameras seguem so com movimento
+        engine.refresh_from_config = lambda *a, **k: None
+        return engine
+    started = time.perf_counter()
+    engine.refresh_from_config()
+    if engine.available:
+        print(f'Modelo {engine.model_path} ({engine.backend_name}) carregado em '
+              f'{time.perf_counter() - started:.1f}s')
+    else:
+        print('Modelo indisponivel; benchmark segue so com deteccao de movimento')
+    return engine
+
+
+def run(args, sources, settings, engine):
+    from camera_stream import CameraStream
+    from detection_workers import get_detection_pool
+    from live_view import resolve_view
+
+    memory_before = resident_memory_mb()
+    cameras = []
+    for index in range(args.cameras):
+        source = sources[index % len(sources)]
+        info = {'id': f'bench{index + 1}', 'name': f'Bench {index + 1}', 'rtsp_url': source}
+        cameras.append(CameraStream(info, settings))
+
+    spec = resolve_view(args.profile)
+    views = {camera.camera_id: camera.get_view(spec) for camera in cameras}
+    stop_event = threading.Event()
+    viewers = {
+        camera.camera_id: [Viewer(camera, views[camera.camera_id], stop_event) for _ in range(args.viewers)]
+        for camera in cameras
+    }
+    for group in viewers.values():
+        for viewer in group:
+            viewer.start()
+
+    print(f'{len(cameras)} cameras, {args.viewers} cliente(s) cada; aquecendo {args.warmup}s...')
+    time.sleep(args.warmup)
+
+    start_frames = {camera.camera_id: camera.frame_slot.sequence for camera in cameras}
+    start_viewer_frames = {cid: sum(v.frames for v in group) for cid, group in viewers.items()}
+    start_encoded = {cid: view.frames_encoded for cid, view in views.items()}
+    memory_samples = []
+    started = time.time()
+    while time.time() - started < args.seconds:
+        time.sleep(1.0)
+        memory_samples.append(resident_memory_mb())
+    elapsed = time.time() - started
+
+    per_camera = []
+    for camera in cameras:
+        status = camera.get_status()
+        broadcast = views[camera.camera_id].get_stats()
+        motion = status.get('motion') or {}
+        schedule = status.get('detection_schedule') or {}
+        frames = camera.frame_slot.sequence - start_frames[camera.camera_id]
+        viewer_frames = sum(v.frames for v in viewers[camera.camera_id]) - start_viewer_frames[camera.camera_id]
+        encoded = views[camera.camera_id].frames_encoded - start_encoded[camera.camera_id]
+        per_camera.append({
+            'id': camera.camera_id,
+            'source': camera.rtsp_url,
+            'connected': camera.connected,
+            'capture_fps': round(frames / elapsed, 2),
+            'frames_grabbed': camera.frames_grabbed,
+            'frames_discarded': camera.frames_discarded,
+            'motion_ms': motion.get('avg_ms', 0.0),
+            'motion_frames': motion.get('frames_processed', 0),
+            'detection_runs': schedule.get('runs', 0),
+            'detection_interval': schedule.get('interval'),
+            'detection_latency_ms': status.get('detection_latency_ms'),
+            'encode_fps': round(encoded / elapsed, 2),
+            'encode_ms': broadcast['avg_encode_ms'],
+            'jpeg_kb': round(broadcast['bytes_encoded'] / broadcast['frames_encoded'] / 1024, 1)
+            if broadcast['frames_encoded'] else 0.0,
+            'viewer_fps': round(viewer_frames / elapsed / args.viewers, 2) if args.viewers else 0.0
+        })
+
+    stop_event.set()
+    for camera in cameras:
+        camera.stop()
+    pool = get_detection_pool()
+    if pool is not None:
+        pool.stop()
+
+    inference = engine.get_stats()
+    memory_peak = max([value for value in memory_samples if value is not None], default=None)
+    memory_per_camera = None
+    if memory_before is not None and memory_peak is not None:
+        memory_per_camera = round((memory_peak - memory_before) / len(cameras), 2)
+
+    encode_ms = mean(camera['encode_ms'] for camera in per_camera)
+    summary = {
+        'cameras': len(cameras),
+        'viewers_per_camera': args.viewers,
+        'capture_fps': mean(camera['capture_fps'] for camera in per_camera),
+        'viewer_fps': mean(camera['viewer_fps'] for camera in per_camera),
+        'motion_ms': mean(camera['motion_ms'] for camera in per_camera),
+        'yolo_frames': inference['frames'],
+        'yolo_avg_batch': inference['avg_batch_size'],
+        'yolo_p50_ms': inference['p50_batch_latency_ms'],
+        'yolo_p95_ms': inference['p95_batch_latency_ms'],
+        'encode_ms': encode_ms,
+        # O JPEG e codificado uma vez e dividido entre os clientes da camera
+        'encode_ms_per_viewer': round(encode_ms / args.viewers, 2) if args.viewers else encode_ms,
+        'memory_mb_per_camera': memory_per_camera
+    }
+    return {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'cpus': os.cpu_count()
+        },
+        'settings': {
+            'seconds': round(elapsed, 1),
+            'warmup': args.warmup,
+            'frame_rate': args.fps,
+            'view': spec._asdict(),
+            'detection_workers': args.workers,
+            'detection_resize': PERFORMANCE.get('detection_resize'),
+            'yolo_backend': inference['backend'],
+            'yolo_model': inference['model']
+        },
+        'summary': summary,
+        'inference': inference,
+        'cameras': per_camera
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Lista as metricas que pioraram mais que ``tolerance`` (fracao) em relacao a base."""
+    regressions = []
+    current, reference = report['summary'], baseline.get('summary', {})
+    for name, higher_is_better in BASELINE_METRICS.items():
+        new, old = current.get(name), reference.get(name)
+        if new is None or not old:
+            continue
+        change = (new - old) / abs(old)
+        worse = -change if higher_is_better else change
+        status = 'PIOROU' if worse > tolerance else 'ok'
+        print(f'  {name}: {old} -> {new} ({change * 100:+.1f}%) {status}')
+        if worse > tolerance:
+            regressions.append({'metric': name, 'baseline': old, 'current': new, 'change': round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline captura/deteccao/JPEG')
+    parser.add_argument('sources', nargs='*', help='videos usados como cameras (padrao: clipe sintetico)')
+    parser.add_argument('--cameras', type=int, default=4, help='cameras simuladas')
+    parser.add_argument('--viewers', type=int, default=1, help='clientes MJPEG por camera')
+    parser.add_argument('--profile', help='perfil do /video_feed usado pelos clientes (padrao: full)')
+    parser.add_argument('--seconds', type=int, default=30, help='duracao da medicao')
+    parser.add_argument('--warmup', type=int, default=5, help='segundos descartados no inicio')
+    parser.add_argument('--fps', type=int, default=CAMERA_DEFAULTS.get('frame_rate', 30), help='frame_rate das cameras')
+    parser.add_argument('--workers', type=int, default=int(PERFORMANCE.get('detection_workers') or 0),
+                        help='processos de deteccao de movimento (0 = threads)')
+    parser.add_argument('--detection-resize', type=int, help='largura usada no YOLO')
+    parser.add_argument('--backend', choices=['ultralytics', 'onnxruntime', 'opencv'])
+    parser.add_argument('--model', help='arquivo do modelo (precisa existir para rodar offline)')
+    parser.add_argument('--no-yolo', action='store_true', help='mede so captura, movimento e JPEG')
+    parser.add_argument('--output', help='grava o relatorio JSON neste arquivo')
+    parser.add_argument('--baseline', help='relatorio anterior para comparacao')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='piora relativa aceita (0.15 = 15%%)')
+    parser.add_argument('--save-baseline', help='grava o relatorio tambem como nova linha de base')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    sources = [os.path.abspath(source) for source in args.sources]
+    missing = [source for source in sources if not os.path.isfile(source)]
+    if missing:
+        print(f'Arquivo nao encontrado: {", ".join(missing)}')
+        return 1
+    if not sources:
+        sources = [generate_sample(os.path.join(workdir, 'sample.mp4'), 20)]
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+    outputs = [os.path.abspath(path) for path in (args.output, args.save_baseline) if path]
+
+    settings = configure(args)
+    engine = load_engine(args)
+    # Snapshots de alerta e demais arquivos relativos ficam na pasta temporaria
+    os.chdir(workdir)
+
+    report = run(args, sources, settings, engine)
+    summary = report['summary']
+    print(f'Captura: {summary["capture_fps"]} fps/camera | clientes: {summary["viewer_fps"]} fps | '
+          f'movimento: {summary["motion_ms"]} ms')
+    print(f'YOLO: {summary["yolo_frames"]} frames, p50 {summary["yolo_p50_ms"]} ms, '
+          f'p95 {summary["yolo_p95_ms"]} ms (lote medio {summary["yolo_avg_batch"]})')
+    print(f'JPEG: {summary["encode_ms"]} ms/frame, {summary["encode_ms_per_viewer"]} ms por cliente | '
+          f'memoria: {summary["memory_mb_per_camera"]} MB/camera')
+
+    exit_code = 0
+    if baseline is not None:
+        print(f'Comparando com {args.baseline} (tolerancia {args.tolerance * 100:.0f}%):')
+        report['regressions'] = compare(report, baseline, args.tolerance)
+        if report['regressions']:
+            exit_code = 1
+
+    for path in outputs:
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2)
+        print(f'Relatorio salvo em {path}')
+    if not outputs:
+        print(json.dumps(report, indent=2))
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
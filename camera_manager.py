@@ -1,6 +1,14 @@
 ﻿import logging
+import threading
+import time
 
+from alerts import get_alert_manager
 from camera_stream import CameraStream
+from detection_scheduler import get_detection_scheduler
+from detection_workers import get_detection_pool
+from inference_engine import get_inference_engine
+import metrics
+from status_aggregator import notify_status_change
 from config import CAMERA_DEFAULTS
 from config_loader import (
     get_cameras as load_cameras_from_store,
@@ -11,13 +19,68 @@ from config_loader import (
 
 logger = logging.getLogger(__name__)
 
+CAMERA_CONNECTED = metrics.gauge('camera_connected', '1 se a camera esta recebendo frames', ('camera',))
+CAMERA_VIEWERS = metrics.gauge('camera_viewers', 'Clientes MJPEG conectados', ('camera',))
+CAMERA_FPS = metrics.gauge('camera_capture_fps', 'FPS de captura medido no ultimo segundo', ('camera',))
+DETECTION_INTERVAL = metrics.gauge(
+    'detection_interval_seconds', 'Intervalo atual do agendador de deteccao', ('camera',)
+)
+
 
 class CameraManager:
-    def __init__(self, cameras=None, base_settings=None):
+    def __init__(self, cameras=None, base_settings=None, autostart=True):
         self.cameras_config = self._normalize_cameras(cameras or load_cameras_from_store())
         self.settings = base_settings or CAMERA_DEFAULTS
         self.streams = {}
-        self._init_streams()
+        self.detection_pool = None
+
+        self.state = 'pending'
+        self.started_at = None
+        self.ready_at = None
+        self.startup_error = None
+        self._startup_thread = None
+        metrics.register_collector(self._collect_metrics)
+
+        if autostart:
+            self.start()
+
+    def start(self):
+        self.state = 'starting'
+        self.started_at = time.time()
+        try:
+            # Normalmente ja criado pelo app.py; aqui cobre o uso fora do app (bench)
+            self.detection_pool = get_detection_pool()
+            get_inference_engine().refresh_from_config(background=True)
+            self._init_streams()
+        except Exception as exc:
+            self.state = 'error'
+            self.startup_error = str(exc)
+            logger.error('Erro ao iniciar cameras: %s', exc)
+            return
+        self.state = 'ready'
+        self.ready_at = time.time()
+        notify_status_change()
+        logger.info('Cameras iniciadas em %.2fs', self.ready_at - self.started_at)
+
+    def start_background(self):
+        """Inicia as cameras em outra thread para o servidor web subir antes."""
+        if self._startup_thread is not None:
+            return
+        self.state = 'starting'
+        self._startup_thread = threading.Thread(target=self.start, name='camera-startup', daemon=True)
+        self._startup_thread.start()
+
+    def get_readiness(self):
+        statuses = [stream.connected for stream in list(self.streams.values())]
+        enabled = sum(1 for cam in self.cameras_config.values() if cam.get('enabled', True))
+        return {
+            'state': self.state,
+            'error': self.startup_error,
+            'cameras_enabled': enabled,
+            'cameras_started': len(statuses),
+            'cameras_connected': sum(1 for connected in statuses if connected),
+            'startup_seconds': round(self.ready_at - self.started_at, 2) if self.ready_at else None
+        }
 
     def _normalize_cameras(self, cameras):
         normalized = {}
@@ -45,13 +108,23 @@ class CameraManager:
         return normalized
 
     def _init_streams(self):
-        for cam_id, cam in self.cameras_config.items():
+        for cam_id, cam in list(self.cameras_config.items()):
             if not cam.get('enabled', True):
                 continue
-            if cam_id in self.streams:
+            if cam_id in self.streams or cam_id not in self.cameras_config:
                 continue
             self.streams[cam_id] = CameraStream(cam, self.settings)
 
+    def _collect_metrics(self):
+        streams = list(self.streams.values())
+        for gauge in (CAMERA_CONNECTED, CAMERA_VIEWERS, CAMERA_FPS, DETECTION_INTERVAL):
+            gauge.clear()
+        for stream in streams:
+            CAMERA_CONNECTED.set(1 if stream.connected else 0, camera=stream.camera_id)
+            CAMERA_VIEWERS.set(stream.viewer_count(), camera=stream.camera_id)
+            CAMERA_FPS.set(round(stream.capture_fps, 2), camera=stream.camera_id)
+            DETECTION_INTERVAL.set(stream.detection_interval, camera=stream.camera_id)
+
     def get_stream(self, camera_id):
         if camera_id is None:
             return None
@@ -62,7 +135,7 @@ class CameraManager:
 
     def get_all_statuses(self):
         statuses = {}
-        for cam_id, cam in self.cameras_config.items():
+        for cam_id, cam in list(self.cameras_config.items()):
             stream = self.streams.get(cam_id)
             if stream:
                 status = stream.get_status()
@@ -73,7 +146,7 @@ class CameraManager:
                     'id': cam_id,
                     'name': cam.get('name', cam_id),
                     'connected': False,
-                    'state': 'disabled' if not cam.get('enabled', True) else 'offline',
+                    'state': self._idle_state(cam),
                     'rtsp_url': cam.get('rtsp_url', ''),
                     'enabled': cam.get('enabled', True),
                     'motion_detected': False,
@@ -88,8 +161,13 @@ class CameraManager:
                 }
         return statuses
 
+    def _idle_state(self, cam):
+        if not cam.get('enabled', True):
+            return 'disabled'
+        return 'offline' if self.state == 'ready' else 'starting'
+
     def apply_config(self):
-        for stream in self.streams.values():
+        for stream in list(self.streams.values()):
             stream.apply_config()
 
     def update_camera(self, camera_id, data):
@@ -99,6 +177,7 @@ class CameraManager:
 
         camera_id = str(updated['id'])
         self.cameras_config[camera_id] = updated
+        notify_status_change()
         enabled = updated.get('enabled', True)
         stream = self.streams.get(camera_id)
 
@@ -106,11 +185,16 @@ class CameraManager:
             if stream:
                 stream.stop()
                 del self.streams[camera_id]
+            get_alert_manager().unregister_recorder(camera_id)
             logger.info('Camera %s desativada', camera_id)
             return updated
 
         if stream:
             stream.info.update(updated)
+            if 'motion' not in updated:
+                stream.info.pop('motion', None)
+            if 'substream_url' not in updated:
+                stream.info.pop('substream_url', None)
             stream.apply_config()
             logger.info('Camera %s atualizada', camera_id)
         else:
@@ -119,6 +203,13 @@ class CameraManager:
 
         return updated
 
+    def reconnect_camera(self, camera_id):
+        stream = self.get_stream(camera_id)
+        if not stream:
+            return False
+        stream.request_reconnect()
+        return True
+
     def update_camera_rtsp(self, camera_id, new_url):
         return bool(self.update_camera(camera_id, {'rtsp_url': new_url}))
 
@@ -131,6 +222,7 @@ class CameraManager:
 
         cam_id = str(new_cam['id'])
         self.cameras_config[cam_id] = new_cam
+        notify_status_change()
         if new_cam.get('enabled', True):
             self.streams[cam_id] = CameraStream(new_cam, self.settings)
         return new_cam
@@ -143,11 +235,16 @@ class CameraManager:
         stream = self.streams.pop(camera_id, None)
         if stream:
             stream.stop()
+        get_detection_scheduler().remove(camera_id)
+        get_alert_manager().unregister_recorder(camera_id)
         self.cameras_config.pop(camera_id, None)
+        notify_status_change()
         logger.info('Camera %s removida', camera_id)
         return True
 
     def stop_all(self):
-        for stream in self.streams.values():
+        for stream in list(self.streams.values()):
             stream.stop()
+        if self.detection_pool is not None:
+            self.detection_pool.stop()
 
@@ -1,16 +1,46 @@
 ﻿import logging
+import os
 import threading
 import time
 from datetime import datetime
+from functools import partial
 
 import cv2
 import numpy as np
 
 from alerts import get_alert_manager
-from config import CAMERA_DEFAULTS, MOTION_DETECTION, YOLO, PERFORMANCE
+from detection_scheduler import get_detection_scheduler
+from detection_workers import get_detection_pool
+from frame_broadcast import FrameBroadcaster
+from frame_slot import FrameSlot
+from inference_engine import get_inference_engine
+from live_view import NATIVE_VIEW, SubstreamReader
+import metrics
+from motion import MotionDetector
+from reconnect_scheduler import get_reconnect_scheduler
+from event_hub import publish_event
+from status_aggregator import notify_status_change
+from tracker import IoUTracker
+from recorder import create_recorder
+from config import CAMERA_DEFAULTS, LIVE_VIEWS, MOTION_DETECTION, YOLO, PERFORMANCE, RECORDING
 
 logger = logging.getLogger(__name__)
 
+CAPTURE_READ_SECONDS = metrics.histogram(
+    'camera_read_seconds', 'Tempo de cap.grab/retrieve/read por camera', ('camera', 'op')
+)
+FRAMES_CAPTURED = metrics.counter('camera_frames_total', 'Frames decodificados por camera', ('camera',))
+FRAMES_DROPPED = metrics.counter(
+    'camera_frames_dropped_total', 'Frames descartados na captura ou pulados pela deteccao', ('camera', 'stage')
+)
+MOTION_SECONDS = metrics.histogram('motion_seconds', 'Tempo da analise de movimento por camera', ('camera',))
+INFERENCE_WAIT_SECONDS = metrics.histogram(
+    'camera_inference_seconds', 'Espera da camera pelo YOLO (fila + lote)', ('camera',)
+)
+JPEG_ENCODE_SECONDS = metrics.histogram(
+    'jpeg_encode_seconds', 'Tempo do cv2.imencode por camera e largura do perfil', ('camera', 'width')
+)
+
 
 class CameraStream:
     def __init__(self, camera_info, camera_settings=None):
@@ -24,11 +54,25 @@ class CameraStream:
         self.rtsp_url = None
         self.cap = None
         self.running = False
+        # Pedido de reconexao vindo de outra thread; so o loop de captura solta o cap
+        self.reconnect_requested = threading.Event()
         self.lock = threading.Lock()
-        self.background_subtractor = None
+        self.motion_detector = None
+        self.motion_settings = {}
+        self.motion_stats = None
+        self.detection_pool = None
         self.connected = False
 
-        self.stream_frame = None
+        self.frame_slot = FrameSlot()
+        self.views = {}
+        self.views_lock = threading.Lock()
+        self.substream = None
+        self.substream_url = None
+        self.broadcaster = self.get_view(NATIVE_VIEW)
+        self.snapshots = {}
+        self.snapshot_lock = threading.Lock()
+        # Diferencia ETags de sequencias iguais entre reinicios do processo
+        self.snapshot_epoch = format(int(time.time() * 1000), 'x')
         self.last_frame_shape = (480, 640, 3)
         self.last_frame_success = time.time()
 
@@ -39,12 +83,15 @@ class CameraStream:
 
         self.last_detection_time = 0
         self.last_inference_time = 0
-        self.latest_detections = []
-        self.latest_detections_ts = 0
+        self.tracker = IoUTracker()
         self.detections_total = 0
 
+        self.recorder = None
+
         self.capture_thread = None
         self.detection_thread = None
+        self.detection_wake = threading.Event()
+        self.detection_scheduler = get_detection_scheduler()
         self.capture_frame_count = 0
         self.capture_last_fps_check = time.time()
         self.capture_fps = 0.0
@@ -57,16 +104,32 @@ class CameraStream:
         self.use_gpu = False
         self.cache_last_frame = True
 
-        self.reconnect_attempts = 5
-        self.reconnect_delay = 2
         self.frame_rate = 30
+        self.low_latency = True
         self.frame_failure_timeout = self.settings.get('frame_failure_timeout', 5)
 
+        self._clock_offset = None
+        self.file_source = False
+        self._file_next_frame = 0.0
+        self.last_buffer_lag = 0.0
+        self.detection_latency = 0.0
+        self.frames_grabbed = 0
+        self.frames_discarded = 0
+
+        self.reconnect_scheduler = get_reconnect_scheduler()
+
         self.apply_config(initial=True)
         self.start_stream()
 
     def _create_capture(self):
-        cap = cv2.VideoCapture(self.rtsp_url)
+        # Timeouts do FFmpeg evitam que um host morto prenda a thread de conexao
+        open_timeout = int(float(self.settings.get('open_timeout', 5)) * 1000)
+        read_timeout = int(float(self.settings.get('read_timeout', 5)) * 1000)
+        cap = cv2.VideoCapture(
+            self.rtsp_url,
+            cv2.CAP_ANY,
+            [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, open_timeout, cv2.CAP_PROP_READ_TIMEOUT_MSEC, read_timeout]
+        )
         buffer_size = self.settings.get('buffer_size')
         if cap is not None and buffer_size is not None:
             try:
@@ -85,177 +148,284 @@ class CameraStream:
             restart_stream = True
             self.rtsp_url = new_rtsp
 
-        self.reconnect_attempts = self.settings.get('reconnect_attempts', 5)
-        self.reconnect_delay = self.settings.get('reconnect_delay', 2)
+        self.file_source = os.path.isfile(self.rtsp_url)
+        substream_url = self.info.get('substream_url') or None
+        if substream_url != self.substream_url:
+            self.substream_url = substream_url
+            self._stop_substream()
+            if self.running:
+                self._ensure_substream()
         self.frame_rate = self.settings.get('frame_rate', 30)
+        self.low_latency = self.settings.get('low_latency', True)
         self.frame_failure_timeout = self.settings.get('frame_failure_timeout', self.frame_failure_timeout)
 
         self.performance_settings = PERFORMANCE
-        self.detection_interval = max(
-            0.2,
-            float(self.performance_settings.get('process_interval', 0.5))
-        )
+        self.detection_interval = self.detection_scheduler.interval_for(self.camera_id)
         self.detect_on_motion_only = self.performance_settings.get('detect_on_motion_only', True)
         self.detection_resize = self._resolve_detection_resize(self.performance_settings.get('detection_resize'))
         self.use_gpu = self.performance_settings.get('use_gpu', False)
 
-        new_history = MOTION_DETECTION.get('history', 500)
-        new_threshold = MOTION_DETECTION.get('var_threshold', 16)
-        new_detect_shadows = MOTION_DETECTION.get('detect_shadows', True)
-
-        needs_new_bg = (
-            initial
-            or self.background_subtractor is None
-            or new_history != getattr(self, 'motion_history', None)
-            or new_threshold != getattr(self, 'motion_var_threshold', None)
-            or new_detect_shadows != getattr(self, 'motion_detect_shadows', None)
-        )
-
-        if needs_new_bg:
-            self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
-                history=new_history,
-                varThreshold=new_threshold,
-                detectShadows=new_detect_shadows
-            )
-            self.motion_history = new_history
-            self.motion_var_threshold = new_threshold
-            self.motion_detect_shadows = new_detect_shadows
-
-        self.motion_min_area = MOTION_DETECTION.get('min_area', 500)
-        self.motion_enabled = MOTION_DETECTION.get('enabled', True)
+        motion_settings = self.info.get('motion') or {}
+        if self.motion_detector is None:
+            self.motion_detector = MotionDetector(MOTION_DETECTION, motion_settings)
+        else:
+            self.motion_detector.configure(MOTION_DETECTION, motion_settings)
+        self.motion_enabled = self.motion_detector.enabled
+        self.motion_settings = dict(MOTION_DETECTION, **motion_settings)
+        self.detection_pool = get_detection_pool()
+        self.worker_timeout = self.performance_settings.get('detection_worker_timeout', 2.0)
 
-        new_model_path = YOLO.get('model', 'yolov8n.pt')
-        if initial or new_model_path != getattr(self, 'yolo_model_path', None):
-            try:
-                from ultralytics import YOLO as YOLOModel
-
-                self.yolo_model = YOLOModel(new_model_path)
-                if self.use_gpu:
-                    try:
-                        self.yolo_model.to('cuda')
-                        logger.info('YOLO movido para GPU (%s)', self.camera_id)
-                    except Exception as gpu_err:
-                        logger.warning('Falha ao usar GPU na camera %s: %s', self.camera_id, gpu_err)
-                self.yolo_model_path = new_model_path
-            except Exception as exc:
-                logger.error('Erro ao carregar modelo YOLO para %s: %s', self.camera_id, exc)
-                self.yolo_model = None
+        self.inference_engine = get_inference_engine()
+        self.inference_engine.refresh_from_config(background=True)
+        self.inference_timeout = YOLO.get('inference_timeout', 5)
 
         self.detection_cooldown = YOLO.get('detection_cooldown', 2)
-        self.yolo_confidence = YOLO.get('confidence', 0.5)
-        self.yolo_classes = YOLO.get('classes', [0])
+        self.tracker.configure(YOLO)
+
+        self._configure_recorder(restart_stream)
 
         if restart_stream:
             self.restart_stream()
 
+    def _configure_recorder(self, source_changed=False):
+        mode = RECORDING.get('mode', 'reencode')
+        recorder = self.recorder
+        if recorder is None or recorder.mode != mode or (source_changed and mode == 'passthrough'):
+            if recorder is not None:
+                recorder.close()
+            self.recorder = create_recorder(self.camera_id, self.rtsp_url)
+            get_alert_manager().register_recorder(self.camera_id, self.recorder)
+        if self.running:
+            self.recorder.open()
+
     def start_stream(self):
         if self.running:
             return
 
         self.running = True
-        if self.cap is None:
-            try:
-                self.cap = self._create_capture()
-                if self.cap.isOpened():
-                    logger.info('Conexao RTSP %s estabelecida', self.camera_id)
-                    self.last_frame_success = time.time()
-                else:
-                    logger.error('Falha ao conectar camera %s', self.camera_id)
-                    self.cap.release()
-                    self.cap = None
-            except Exception as exc:
-                logger.error('Erro ao iniciar stream %s: %s', self.camera_id, exc)
-                self.cap = None
-
+        self.detection_wake.clear()
         self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
         self.capture_thread.start()
+        self.recorder.open()
 
         if self.detection_thread is None or not self.detection_thread.is_alive():
             self.detection_thread = threading.Thread(target=self._detection_loop, daemon=True)
             self.detection_thread.start()
+        self._ensure_substream()
 
     def restart_stream(self):
         self.stop()
         self.start_stream()
 
+    def _attach_capture(self, cap):
+        """Chamado pelo agendador quando uma conexao abre."""
+        if not self.running or self.cap is not None:
+            return False
+        self._clock_offset = None
+        self._file_next_frame = 0.0
+        self.last_frame_success = time.time()
+        self.cap = cap
+        return True
+
+    def request_reconnect(self):
+        """Pede ao loop de captura que feche a conexao atual e reconecte ja."""
+        self.reconnect_requested.set()
+
+    def _drop_capture(self, reason):
+        cap, self.cap = self.cap, None
+        if cap is not None:
+            cap.release()
+        self._set_connected(False)
+        self.reconnect_scheduler.mark_disconnected(self.camera_id, reason)
+
     def _capture_loop(self):
+        # A conexao e aberta pelo agendador em paralelo; aqui so esperamos
+        # publicando o placeholder, sem bloquear quem criou a camera.
+        last_retrieve = 0.0
         while self.running:
-            if self.cap is None or not self.cap.isOpened():
-                self.connected = False
+            if self.reconnect_requested.is_set():
+                # release() so nesta thread: fora dela poderia coincidir com um grab()
+                self.reconnect_requested.clear()
+                self._drop_capture('reconexao manual')
+                self.reconnect_scheduler.reset(self)
+
+            cap = self.cap
+            if cap is None or not cap.isOpened():
+                if cap is not None:
+                    self._drop_capture('stream fechado')
                 self._publish_placeholder()
-                self._attempt_reconnect()
-                time.sleep(self.reconnect_delay)
+                self.reconnect_scheduler.request(self)
+                time.sleep(0.5)
+                continue
+
+            interval = 1 / max(self.frame_rate, 1)
+            if self.file_source:
+                self._pace_file_source(cap)
+            if self.low_latency:
+                # grab() acompanha a taxa da fonte e mantem o buffer do
+                # FFmpeg vazio; so o frame mais recente e convertido.
+                with CAPTURE_READ_SECONDS.time(camera=self.camera_id, op='grab'):
+                    ret = cap.grab()
+                frame = None
+                if ret:
+                    self.frames_grabbed += 1
+                    if time.time() - last_retrieve < interval:
+                        self.frames_discarded += 1
+                        FRAMES_DROPPED.inc(camera=self.camera_id, stage='capture')
+                        continue
+                    with CAPTURE_READ_SECONDS.time(camera=self.camera_id, op='retrieve'):
+                        ret, frame = cap.retrieve()
+                    last_retrieve = time.time()
+            else:
+                with CAPTURE_READ_SECONDS.time(camera=self.camera_id, op='read'):
+                    ret, frame = cap.read()
+
+            if not ret and self.file_source and self._rewind_file_source(cap):
                 continue
 
-            ret, frame = self.cap.read()
             if ret and frame is not None:
-                self.connected = True
+                self._set_connected(True)
                 self.last_frame_success = time.time()
                 self.last_frame_shape = frame.shape
                 self.capture_frame_count += 1
+                FRAMES_CAPTURED.inc(camera=self.camera_id)
                 now = time.time()
                 elapsed = now - self.capture_last_fps_check
                 if elapsed >= 1:
                     self.capture_fps = self.capture_frame_count / elapsed
                     self.capture_frame_count = 0
                     self.capture_last_fps_check = now
-                with self.lock:
-                    self.stream_frame = frame.copy()
+                self.frame_slot.publish(frame, self._estimate_capture_time(now))
+                self._notify_views()
+                self.recorder.push_frame(frame)
             else:
-                self.connected = False
+                self._set_connected(False)
                 self._publish_placeholder()
                 if time.time() - self.last_frame_success > self.frame_failure_timeout:
                     logger.warning('[RECONNECT] Tentando reconectar camera %s', self.camera_id)
-                    self._attempt_reconnect()
+                    self._drop_capture('sem frames')
+                # Na falha sempre pausa, mesmo em baixa latencia: um stream
+                # travado nao pode girar o loop montando placeholders
+                time.sleep(min(interval, 0.05) if self.low_latency else interval)
+                continue
+
+            if not self.low_latency:
+                time.sleep(interval)
+
+    def _pace_file_source(self, cap):
+        """Le arquivos na velocidade do video, como uma camera ao vivo."""
+        fps = cap.get(cv2.CAP_PROP_FPS) or self.frame_rate
+        now = time.time()
+        if self._file_next_frame > now:
+            time.sleep(self._file_next_frame - now)
+        self._file_next_frame = max(self._file_next_frame, now) + 1 / max(fps, 1)
+
+    def _rewind_file_source(self, cap):
+        """Volta o arquivo ao inicio no fim do video (fonte em loop)."""
+        self._clock_offset = None
+        return cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def _estimate_capture_time(self, now):
+        """
+        Estima o instante de captura do frame a partir do PTS do stream.
+
+        A menor diferenca entre o relogio local e o PTS vista desde a conexao
+        e tomada como atraso de rede/decodificacao; o que passar disso e
+        tempo parado no buffer.
+        """
+        try:
+            position = self.cap.get(cv2.CAP_PROP_POS_MSEC) if self.cap is not None else 0
+        except Exception:
+            position = 0
+        if not position or position <= 0:
+            self.last_buffer_lag = 0.0
+            return now
 
-            time.sleep(1 / max(self.frame_rate, 1))
+        offset = now - position / 1000.0
+        if self._clock_offset is None or offset < self._clock_offset:
+            self._clock_offset = offset
+        self.last_buffer_lag = offset - self._clock_offset
+        return now - self.last_buffer_lag
 
     def _detection_loop(self):
+        # O intervalo vem do agendador adaptativo; a espera e interrompida
+        # por stop() e pela chegada de um frame novo, sem polling.
         next_run = time.time()
+        last_sequence = self.frame_slot.sequence
         while self.running:
-            now = time.time()
-            if now < next_run:
-                time.sleep(0.05)
+            delay = next_run - time.time()
+            if delay > 0 and self.detection_wake.wait(delay):
                 continue
 
-            frame = self._snapshot_stream_frame()
-            if frame is None:
-                time.sleep(0.1)
+            sequence, frame, captured_at = self.frame_slot.wait_newer(last_sequence, timeout=1.0)
+            if frame is None or sequence <= last_sequence:
                 continue
+            skipped = sequence - last_sequence - 1
+            last_sequence = sequence
+            if skipped:
+                FRAMES_DROPPED.inc(skipped, camera=self.camera_id, stage='detection')
 
+            started = time.time()
             try:
                 self._process_detection_frame(frame)
             except Exception as exc:
                 logger.error('Erro no processamento da camera %s: %s', self.camera_id, exc)
-
-            next_run = time.time() + self.detection_interval
+            finished = time.time()
+            self.detection_latency = finished - captured_at
+
+            self.detection_interval = self.detection_scheduler.report(
+                self.camera_id,
+                finished - started,
+                self.motion_detected,
+                self.person_detected,
+                frames_skipped=skipped
+            )
+            next_run = finished + self.detection_interval
 
     def _should_run_yolo(self, motion_detected_now):
-        if self.yolo_model is None:
+        if not self.inference_engine.available:
             return False
-        if self.detect_on_motion_only and self.motion_enabled and not motion_detected_now:
+        now = time.time()
+        tracking = self.tracker.has_active(now)
+        # Pessoa rastreada continua sendo confirmada mesmo parada (sem movimento)
+        if self.detect_on_motion_only and self.motion_enabled and not motion_detected_now and not tracking:
             return False
-        if self.last_inference_time and (time.time() - self.last_inference_time) < self.detection_interval:
+        if self.last_inference_time and (now - self.last_inference_time) < self.detection_interval:
             return False
-        if self.last_detection_time and (time.time() - self.last_detection_time) <= self.detection_cooldown:
+        # Com trilhas ativas as caixas sao interpoladas; o YOLO so reconfirma a cada cooldown
+        if tracking and (now - self.last_inference_time) < self.detection_cooldown:
             return False
         return True
 
     def _process_detection_frame(self, frame):
-        motion_detected_now = False
-        person_detected_now = False
-        detections_data = []
-        current_time = time.time()
+        motion_detected_now = self._analyze_motion(frame)
+        self._handle_detection(frame, motion_detected_now)
 
-        if self.motion_enabled and self.background_subtractor is not None:
-            fg_mask = self.background_subtractor.apply(frame)
-            contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    def _analyze_motion(self, frame):
+        if not self.motion_enabled:
+            return False
+        # Medido aqui porque o apply() dos workers roda em outro processo
+        with MOTION_SECONDS.time(camera=self.camera_id):
+            return self._run_motion(frame)
 
-            for contour in contours:
-                if cv2.contourArea(contour) < self.motion_min_area:
-                    continue
-                motion_detected_now = True
-                break
+    def _run_motion(self, frame):
+        pool = self.detection_pool
+        if pool is not None:
+            try:
+                result = pool.analyze(self.camera_id, frame, self.motion_settings, timeout=self.worker_timeout)
+                self.motion_stats = dict(result['stats'] or {}, worker=pool.shard_of(self.camera_id))
+                return result['motion']
+            except Exception as exc:
+                logger.warning('Worker de deteccao indisponivel para %s: %s', self.camera_id, exc)
+
+        motion = self.motion_detector.detect(frame)
+        self.motion_stats = self.motion_detector.get_stats()
+        return motion
+
+    def _handle_detection(self, frame, motion_detected_now):
+        detections_data = []
+        new_tracks = []
+        current_time = time.time()
 
         run_yolo = self._should_run_yolo(motion_detected_now)
 
@@ -275,36 +445,30 @@ class CameraStream:
                 scale_x = frame.shape[1] / float(width)
                 scale_y = frame.shape[0] / float(height)
 
-            yolo_results = self.yolo_model(
-                detection_frame,
-                conf=self.yolo_confidence,
-                classes=self.yolo_classes,
-                verbose=False
-            )
+            try:
+                with INFERENCE_WAIT_SECONDS.time(camera=self.camera_id):
+                    detections_data = self.inference_engine.infer(
+                        detection_frame,
+                        (scale_x, scale_y),
+                        timeout=self.inference_timeout
+                    )
+            except Exception as exc:
+                logger.warning('Inferencia indisponivel para %s: %s', self.camera_id, exc)
+                detections_data = []
 
-            boxes = getattr(yolo_results[0], 'boxes', None)
-            if boxes is not None and len(boxes) > 0:
-                person_detected_now = True
-                self.person_events += 1
-                for box in boxes:
-                    coords = box.xyxy[0].tolist()
-                    conf = float(box.conf[0])
-                    x1 = int(coords[0] * scale_x)
-                    y1 = int(coords[1] * scale_y)
-                    x2 = int(coords[2] * scale_x)
-                    y2 = int(coords[3] * scale_y)
-                    detections_data.append({
-                        'bbox': (x1, y1, x2, y2),
-                        'confidence': conf
-                    })
+            # So trilhas novas contam e disparam alerta/gravacao
+            tracks, new_tracks = self.tracker.update(detections_data, current_time)
+            if new_tracks:
+                self.person_events += len(new_tracks)
+                self.detections_total += len(new_tracks)
 
                 annotated = frame.copy()
-                for det in detections_data:
+                for det in tracks:
                     (x1, y1, x2, y2) = det['bbox']
                     cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
                     cv2.putText(
                         annotated,
-                        f'{det["confidence"]:.2f}',
+                        f'#{det["track_id"]} {det["confidence"]:.2f}',
                         (x1, max(20, y1 - 10)),
                         cv2.FONT_HERSHEY_SIMPLEX,
                         0.6,
@@ -314,49 +478,167 @@ class CameraStream:
 
                 self.save_alert_image(annotated)
 
-                try:
-                    alert_manager = get_alert_manager()
-                    alert_manager.recorder.write_frame(annotated)
-                except Exception as exc:
-                    logger.debug('Recorder indisponivel para %s: %s', self.camera_id, exc)
-
                 self.last_detection_time = current_time
-                self.detections_total += len(detections_data)
 
             self.last_inference_time = current_time
 
+        person_detected_now = self.tracker.has_active(current_time)
+
+        changed = (
+            motion_detected_now
+            or person_detected_now
+            or motion_detected_now != self.motion_detected
+            or person_detected_now != self.person_detected
+        )
         with self.lock:
+            transition = (
+                motion_detected_now != self.motion_detected
+                or person_detected_now != self.person_detected
+            )
             self.motion_detected = motion_detected_now
             self.person_detected = person_detected_now
             if motion_detected_now:
                 self.motion_events += 1
-            if detections_data:
-                self.latest_detections = detections_data
-                self.latest_detections_ts = current_time
-            elif (current_time - self.latest_detections_ts) > max(self.detection_interval * 2, 1.0):
-                self.latest_detections = []
-
-    def _snapshot_stream_frame(self):
-        with self.lock:
-            if self.stream_frame is None:
-                return None
-            return self.stream_frame.copy()
+        if changed:
+            notify_status_change()
+        if transition:
+            publish_event('detection', {
+                'camera_id': self.camera_id,
+                'motion': motion_detected_now,
+                'person': person_detected_now,
+                'detections': len(detections_data),
+                'new_tracks': [track['track_id'] for track in new_tracks],
+                'timestamp': current_time
+            })
 
     def get_frame(self):
+        return self.get_snapshot()[1]
+
+    def get_snapshot(self, spec=NATIVE_VIEW, max_age=1.0):
+        """
+        Retorna ``(etag, jpeg)`` do frame mais recente no perfil ``spec``.
+
+        O JPEG fica em cache por perfil junto com a sequencia do frame de
+        origem: enquanto o frame nao muda, ou o cache tem menos de
+        ``max_age`` segundos, nada e codificado. Se ha clientes MJPEG no
+        mesmo perfil, o JPEG que eles ja receberam e reaproveitado.
+        """
+        sequence = self.frame_slot.sequence
+        now = time.time()
+        cached = self.snapshots.get(spec)
+        if cached is not None and (cached[0] == sequence or now - cached[1] < max_age):
+            return cached[2], cached[3]
+
+        with self.snapshot_lock:
+            # Outro pedido pode ter codificado enquanto esperavamos o lock
+            cached = self.snapshots.get(spec)
+            if cached is not None and (cached[0] == sequence or now - cached[1] < max_age):
+                return cached[2], cached[3]
+
+            view = self.views.get(spec)
+            jpeg = None
+            if view is not None and view.subscribers and now - view.encoded_at < max(max_age, 1.0):
+                _, jpeg = view.latest()
+            if not jpeg:
+                jpeg = self._render_jpeg(spec)
+            etag = f'{self.camera_id}-{self.snapshot_epoch}-{spec.width}-{spec.quality}-{sequence}'
+            self.snapshots[spec] = (sequence, time.time(), etag, jpeg)
+            return etag, jpeg
+
+    def get_view(self, spec=NATIVE_VIEW):
+        """Broadcaster compartilhado por todos os clientes do mesmo ``ViewSpec``."""
+        with self.views_lock:
+            view = self.views.get(spec)
+            if view is None:
+                view = FrameBroadcaster(
+                    partial(self._render_jpeg, spec),
+                    name=f'{self.camera_id}-{spec.width or "full"}',
+                    max_fps=spec.max_fps
+                )
+                self.views[spec] = view
+        if spec.substream:
+            self._ensure_substream()
+        return view
+
+    def get_viewers(self):
+        """Clientes MJPEG por perfil, com frames pulados e bytes enviados."""
+        with self.views_lock:
+            views = list(self.views.items())
+        return [
+            dict(client, width=spec.width, quality=spec.quality, view_fps=spec.max_fps)
+            for spec, view in views
+            for client in view.get_clients()
+        ]
+
+    def viewer_count(self):
+        with self.views_lock:
+            return sum(view.subscribers + view.relayed_viewers for view in self.views.values())
+
+    def _notify_views(self, from_substream=False, captured=True):
+        live = self.substream is not None and self.substream.connected
+        with self.views_lock:
+            views = list(self.views.items())
+        for spec, view in views:
+            # Perfis do sub-stream seguem o stream principal ate ele conectar
+            if (spec.substream and live) == from_substream:
+                view.notify_frame(captured)
+
+    def _substream_wanted(self):
+        with self.views_lock:
+            return any(view.subscribers for spec, view in self.views.items() if spec.substream)
+
+    def _ensure_substream(self):
+        if not self.running or not self.substream_url or self.substream is not None:
+            return
+        if not any(spec.substream for spec in list(self.views)):
+            return
+        self.substream = SubstreamReader(
+            self.camera_id,
+            self.substream_url,
+            self._substream_wanted,
+            partial(self._notify_views, True),
+            self.settings
+        )
+        self.substream.start()
+
+    def _stop_substream(self):
+        substream, self.substream = self.substream, None
+        if substream is not None:
+            substream.stop()
+
+    def _render_jpeg(self, spec=NATIVE_VIEW):
+        source = self.frame_slot.frame
+        substream = self.substream
+        if spec.substream and substream is not None and substream.connected:
+            source = substream.frame_slot.frame if substream.frame_slot.frame is not None else source
         with self.lock:
-            frame = self.stream_frame.copy() if self.stream_frame is not None else None
             motion = self.motion_detected
             person = self.person_detected
-            detections = list(self.latest_detections)
-            detections_ts = self.latest_detections_ts
+        # Caixas extrapoladas pelo rastreador entre as rodadas do YOLO
+        detections = self.tracker.predict(time.time())
+
+        # Unica copia do caminho de exibicao: feita uma vez por frame
+        # codificado e compartilhada por todos os clientes do broadcaster.
+        # Perfis menores reduzem antes de desenhar, e a reducao ja e a copia.
+        if source is None:
+            source = self._gray_frame()
+        resized = bool(spec.width) and spec.width < source.shape[1]
+        if resized:
+            height = max(1, int(round(source.shape[0] * spec.width / float(source.shape[1]))))
+            frame = cv2.resize(source, (spec.width, height), interpolation=cv2.INTER_AREA)
+        else:
+            frame = source.copy()
 
-        if frame is None:
-            frame = self._gray_frame()
+        # As caixas estao nas coordenadas do stream principal
+        box_scale = frame.shape[1] / float(self.last_frame_shape[1])
+        text_scale = max(0.4, min(1.0, frame.shape[1] / 640.0)) if resized else 1.0
+        thickness = 1 if text_scale < 0.75 else 2
 
-        if detections and (time.time() - detections_ts) <= max(self.detection_interval * 2, 1.5):
-            for det in detections:
-                (x1, y1, x2, y2) = det['bbox']
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
+        for det in detections:
+            (x1, y1, x2, y2) = det['bbox']
+            if box_scale != 1.0:
+                (x1, y1, x2, y2) = (int(x1 * box_scale), int(y1 * box_scale), int(x2 * box_scale), int(y2 * box_scale))
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), thickness)
 
         status_text = 'STATUS: '
         color = (0, 255, 0)
@@ -369,50 +651,76 @@ class CameraStream:
         else:
             status_text += 'MONITORANDO'
 
-        cv2.putText(frame, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+        cv2.putText(
+            frame, status_text, (10, int(30 * text_scale)), cv2.FONT_HERSHEY_SIMPLEX, text_scale, color, thickness
+        )
         cv2.putText(
             frame,
             datetime.now().strftime('%d/%m/%Y %H:%M:%S'),
-            (10, 60),
+            (10, int(60 * text_scale)),
             cv2.FONT_HERSHEY_SIMPLEX,
-            0.7,
+            0.7 * text_scale,
             (255, 255, 255),
-            2
+            thickness
         )
 
-        _, buffer = cv2.imencode('.jpg', frame)
+        with JPEG_ENCODE_SECONDS.time(camera=self.camera_id, width=spec.width or 'full'):
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, spec.quality])
         return buffer.tobytes()
 
-    def generate_frames(self):
-        while True:
-            frame = self.get_frame()
-            if frame:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                time.sleep(0.1)
+    def generate_frames(self, view=None, client=None, max_fps=0):
+        frames = (view or self.broadcaster).subscribe(
+            client=client,
+            max_fps=max_fps,
+            idle_timeout=LIVE_VIEWS.get('idle_timeout') or None,
+            stall_timeout=LIVE_VIEWS.get('stall_timeout') or None
+        )
+        for frame in frames:
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+
+    @staticmethod
+    def _connection_state(connection):
+        status = connection.get('status')
+        if status in ('connecting', 'scheduled'):
+            return 'connecting'
+        if status in ('backoff', 'parked'):
+            return status
+        return 'offline'
 
     def get_status(self):
+        connection = self.reconnect_scheduler.get_state(self.camera_id)
         return {
             'id': self.camera_id,
             'name': self.camera_name,
             'connected': self.connected,
-            'state': 'online' if self.connected else 'offline',
+            'state': 'online' if self.connected else self._connection_state(connection),
+            'connection': connection,
             'rtsp_url': self.rtsp_url,
             'motion_detected': self.motion_detected,
             'person_detected': self.person_detected,
             'motion_events': self.motion_events,
             'person_events': self.person_events,
             'detection_count': self.detections_total,
+            'tracking': self.tracker.get_stats(),
             'last_frame': self.last_frame_success,
             'last_detection_ts': self.last_detection_time,
             'last_detection': self._format_timestamp(self.last_detection_time),
             'last_inference_ts': self.last_inference_time,
             'last_inference': self._format_timestamp(self.last_inference_time),
-            'yolo_active': self.yolo_model is not None,
-            'ai_active': self.yolo_model is not None,
+            'yolo_active': self.inference_engine.available,
+            'ai_active': self.inference_engine.available,
             'frame_rate': round(self.capture_fps, 2),
-            'process_interval': self.detection_interval
+            'process_interval': self.detection_interval,
+            'detection_schedule': self.detection_scheduler.get_camera_stats(self.camera_id),
+            'low_latency': self.low_latency,
+            'frame_age_ms': self._frame_age_ms(),
+            'buffer_lag_ms': round(self.last_buffer_lag * 1000, 1),
+            'detection_latency_ms': round(self.detection_latency * 1000, 1),
+            'frames_discarded': self.frames_discarded,
+            'motion': self.motion_stats or self.motion_detector.get_stats(),
+            'viewers': self.viewer_count(),
+            'substream': self.substream.get_stats() if self.substream else None
         }
 
     def update_rtsp_url(self, new_url):
@@ -425,6 +733,12 @@ class CameraStream:
 
     def stop(self):
         self.running = False
+        self.detection_wake.set()
+        self.reconnect_scheduler.cancel(self.camera_id)
+        self._stop_substream()
+        self.recorder.close()
+        if self.detection_pool is not None:
+            self.detection_pool.release(self.camera_id)
 
         if self.capture_thread and self.capture_thread.is_alive():
             self.capture_thread.join(timeout=2)
@@ -438,44 +752,34 @@ class CameraStream:
             self.cap.release()
             self.cap = None
 
-    def _attempt_reconnect(self):
-        if self.cap:
-            self.cap.release()
-            self.cap = None
-
-        for attempt in range(self.reconnect_attempts):
-            try:
-                self.cap = self._create_capture()
-                if self.cap.isOpened():
-                    logger.info('Reconexao bem-sucedida para %s', self.camera_id)
-                    self.last_frame_success = time.time()
-                    self.connected = True
-                    return
-            except Exception as exc:
-                logger.error('Erro ao reconectar camera %s: %s', self.camera_id, exc)
-
-            time.sleep(self.reconnect_delay)
-
-        self.connected = False
-        logger.error('Falha ao reconectar camera %s apos %s tentativas', self.camera_id, self.reconnect_attempts)
+    def _set_connected(self, connected):
+        if self.connected != connected:
+            self.connected = connected
+            notify_status_change()
+            publish_event('connection', {
+                'camera_id': self.camera_id,
+                'connected': connected,
+                'timestamp': time.time()
+            })
 
     def _publish_placeholder(self):
-        with self.lock:
-            self.connected = False
-            if self.cache_last_frame and self.stream_frame is not None:
-                frame = self.stream_frame.copy()
-                cv2.putText(
-                    frame,
-                    'Reconectando camera...',
-                    (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (0, 0, 0),
-                    2
-                )
-                self.stream_frame = frame
-            else:
-                self.stream_frame = self._gray_frame()
+        self._set_connected(False)
+        cached = self.frame_slot.frame
+        if self.cache_last_frame and cached is not None:
+            frame = cached.copy()
+            cv2.putText(
+                frame,
+                'Reconectando camera...',
+                (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (0, 0, 0),
+                2
+            )
+        else:
+            frame = self._gray_frame()
+        self.frame_slot.publish(frame)
+        self._notify_views(captured=False)
 
     def _gray_frame(self):
         height, width = self.last_frame_shape[:2]
@@ -495,10 +799,10 @@ class CameraStream:
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f'alerts/alerta_{timestamp}_{self.camera_id}.jpg'
-            cv2.imwrite(filename, frame)
 
             alert_manager = get_alert_manager()
-            alert_manager.trigger_alert(frame, 'person', self.camera_name)
+            alert_manager.save_snapshot(filename, frame)
+            alert_manager.trigger_alert(frame, 'person', self.camera_name, camera_id=self.camera_id)
         except Exception as exc:
             logger.error('Erro ao salvar alerta da camera %s: %s', self.camera_id, exc)
 
@@ -521,6 +825,12 @@ class CameraStream:
             return None
         return None
 
+    def _frame_age_ms(self):
+        _, frame, captured_at = self.frame_slot.get()
+        if frame is None or not self.connected:
+            return None
+        return round((time.time() - captured_at) * 1000, 1)
+
     @staticmethod
     def _format_timestamp(ts):
         if not ts:
@@ -18,7 +18,13 @@ CAMERA_DEFAULTS = {
     'reconnect_delay': 2,
     'frame_rate': 30,
     'buffer_size': 4096,
-    'frame_failure_timeout': 5
+    'frame_failure_timeout': 5,
+    'open_timeout': 5,            # segundos para abrir o stream (timeout do FFmpeg)
+    'read_timeout': 5,            # segundos sem pacotes antes de a leitura falhar
+    'reconnect_max_delay': 60,    # teto do backoff exponencial entre tentativas
+    'circuit_park_seconds': 300,  # camera estacionada apos reconnect_attempts falhas seguidas
+    'connect_workers': 8,         # conexoes abertas em paralelo
+    'low_latency': True  # grab() na taxa da fonte e decodifica so o frame mais recente
 }
 
 # ConfiguraÃ§Ãµes de DetecÃ§Ã£o de Movimento
@@ -27,7 +33,11 @@ MOTION_DETECTION = {
     'min_area': 500,  # Ã¡rea mÃ­nima em pixels para considerar movimento
     'history': 500,   # histÃ³rico do MOG2
     'var_threshold': 16,  # limiar de variaÃ§Ã£o
-    'detect_shadows': True
+    'detect_shadows': True,
+    'backend': 'mog2',      # 'mog2' ou 'frame_diff' (mais barato); pode ser sobrescrito por camera
+    'working_width': 320,   # largura usada na analise (0 = resolucao original)
+    'blur_kernel': 5,       # suavizacao antes da subtracao (0 = desativado)
+    'diff_threshold': 25    # limiar de diferenca do backend frame_diff
 }
 
 # ConfiguraÃ§Ãµes do YOLOv8
@@ -35,7 +45,18 @@ YOLO = {
     'model': 'yolov8n.pt',  # modelo leve para CPU
     'confidence': 0.5,      # limiar de confianÃ§a
     'classes': [0],         # classe 0 = pessoa
-    'detection_cooldown': 2  # segundos entre detecÃ§Ãµes
+    'detection_cooldown': 2,  # segundos entre rodadas do YOLO enquanto ha pessoa rastreada
+    'track_iou': 0.3,         # IoU minimo para associar uma caixa a uma trilha
+    'track_max_age': 3.0,     # segundos sem confirmacao ate descartar a trilha
+    'track_min_hits': 1,      # confirmacoes antes de contar a trilha como nova pessoa
+    'batch_size': 8,          # maximo de frames por inferencia em lote
+    'batch_max_wait': 0.02,   # segundos aguardando frames para completar o lote
+    'inference_timeout': 5,   # segundos aguardando resultado do motor compartilhado
+    'backend': 'ultralytics', # 'ultralytics', 'onnxruntime' ou 'opencv' (DNN)
+    'imgsz': 640,             # resolucao de entrada dos backends ONNX
+    'export_dir': 'models',   # cache dos modelos exportados para ONNX
+    'quantize': None,         # 'int8' gera versao quantizada (onnxruntime)
+    'nms_iou': 0.45           # limiar de IoU do NMS nos backends ONNX
 }
 
 # ConfiguraÃ§Ãµes do Sistema
@@ -64,19 +85,40 @@ TELEGRAM = {
     'bot_token': TELEGRAM_BOT_TOKEN,  # do ambiente
     'chat_id': TELEGRAM_CHAT_ID,      # do ambiente
     'send_screenshot': True,
+    'timeout': 10,  # segundos por requisicao a API do Telegram
     'message_template': 'ðŸš¨ PESSOA DETECTADA!\nðŸ“ Local: {location}\nðŸ• HorÃ¡rio: {timestamp}\nðŸ“· Screenshot anexada'
 }
 
+# Configuracoes da fila de envio de alertas
+ALERTS = {
+    'queue_size': 100,            # alertas pendentes antes de descartar
+    'workers': 2,                 # threads de envio
+    'max_retries': 3,             # novas tentativas por alerta
+    'retry_backoff': 1.0,         # segundos, dobra a cada tentativa
+    'camera_cooldown': 30,        # segundos entre alertas da mesma camera
+    'global_max_per_minute': 10   # limite global de alertas por minuto (0 = sem limite)
+}
+
 # ConfiguraÃ§Ãµes de GravaÃ§Ã£o
 RECORDING = {
     'enabled': False,
     'record_on_person_detection': True,
     'record_duration': 30,  # segundos
+    'pre_roll_seconds': 5,  # segundos mantidos em memoria antes do evento
     'video_codec': 'mp4v',
     'fps': 20,
     'resolution': (640, 480),
     'storage_path': 'recordings/',
-    'max_storage_gb': 10
+    'max_storage_gb': 10,
+    'camera_quotas_gb': {},           # cota por camera, ex.: {'cam1': 5}
+    'retention_days': None,           # idade maxima; None usa SYSTEM['alert_retention_days']
+    'cleanup_target_ratio': 0.8,      # ao estourar a cota, apaga ate esta fracao
+    'retention_check_interval': 300,  # segundos entre verificacoes de retencao
+    'mode': 'reencode',       # 'reencode' (OpenCV) ou 'passthrough' (copia pacotes via ffmpeg)
+    'segment_seconds': 60,    # duracao dos segmentos no modo passthrough
+    'container': 'mp4',       # 'mp4', 'fmp4' (MP4 fragmentado) ou 'mkv' no modo passthrough
+    'ffmpeg_path': 'ffmpeg',
+    'input_timeout': 10       # passthrough: segundos sem dados da camera antes de o ffmpeg desistir
 }
 
 # ConfiguraÃ§Ãµes de IP (Whitelist - Opcional)
@@ -119,9 +161,69 @@ def _get_float_env(var_name, default):
 
 
 PERFORMANCE = {
-    'process_interval': _get_float_env('PROCESS_INTERVAL', 0.5),
+    'process_interval': _get_float_env('PROCESS_INTERVAL', 0.5),  # intervalo minimo de deteccao por camera
+    'detection_max_interval': 5.0,  # intervalo de cameras sem atividade
+    'detection_cpu_budget': _get_float_env('DETECTION_CPU_BUDGET', 1.0),  # nucleos dedicados a deteccao (todas as cameras)
+    'cpu_high_watermark': 85.0,  # acima deste uso de CPU o orcamento diminui
+    'person_hold': 30.0,  # segundos em taxa alta depois de ver uma pessoa
     'detection_resize': int(os.getenv('DETECTION_RESIZE', 640)),
     'detect_on_motion_only': True,
-    'use_gpu': os.getenv('YOLO_USE_GPU', 'false').lower() in {'1', 'true', 'yes'}
+    'use_gpu': os.getenv('YOLO_USE_GPU', 'false').lower() in {'1', 'true', 'yes'},
+    'detection_workers': int(os.getenv('DETECTION_WORKERS', 0)),  # processos de analise (0 = threads no processo web; requer reinicio)
+    'detection_worker_timeout': 2.0  # segundos aguardando o resultado do worker
+}
+
+# Canal de eventos (SSE) do dashboard
+EVENTS = {
+    'enabled': True,
+    'heartbeat': _get_float_env('EVENTS_HEARTBEAT', 15.0),  # segundos entre comentarios de keep-alive
+    'history': 200,      # eventos guardados para clientes que reconectam
+    'retry_ms': 3000     # intervalo de reconexao sugerido ao navegador
+}
+
+# Metricas no formato Prometheus (/metrics)
+METRICS = {
+    'enabled': os.getenv('METRICS_ENABLED', 'false').lower() in {'1', 'true', 'yes'},
+    # Scrape sem login a partir destes IPs/redes. Vazio = sempre exige login.
+    # Atras de um proxy reverso no mesmo host (nginx) todo pedido chega de
+    # 127.0.0.1: nesse caso nao libere o loopback, ou /metrics fica publico.
+    'allowed_ips': [],
+    'buckets': None                       # limites dos histogramas em segundos (None = padrao)
 }
 
+# Perfis do /video_feed: cada perfil e codificado uma vez e dividido entre os clientes
+LIVE_VIEWS = {
+    'default_profile': 'full',
+    'max_width': 1920,   # limite para ?width= avulso
+    'max_fps': 30,       # limite para ?fps= avulso
+    'snapshot_max_age': 1.0,  # segundos que o snapshot.jpg pode reaproveitar o JPEG em cache
+    'stall_timeout': 10.0,    # segundos com a escrita bloqueada antes de derrubar o cliente
+    'idle_timeout': 120.0,    # segundos sem frame real da camera (placeholder nao conta) antes de encerrar o stream (0 = nunca)
+    'profiles': {
+        # Miniaturas do painel; usa o sub-stream da camera quando configurado
+        'grid': {'width': 480, 'quality': 60, 'max_fps': 5, 'substream': True},
+        'focus': {'width': 1280, 'quality': 80, 'max_fps': 15},
+        'full': {'width': 0, 'quality': 95, 'max_fps': 0}  # 0 = resolucao/taxa originais
+    }
+}
+
+# Servidor assincrono (aiohttp) para /video_feed e /events, na mesma instancia
+STREAMING = {
+    'async_enabled': os.getenv('ASYNC_STREAMING', 'false').lower() in {'1', 'true', 'yes'},
+    'host': '0.0.0.0',
+    'port': int(os.getenv('ASYNC_STREAMING_PORT', 5001)),
+    'public_url': os.getenv('ASYNC_STREAMING_URL', ''),  # base usada pelo painel (vazio = mesmo host, porta acima)
+    'client_queue': 2,     # frames pendentes por cliente; o mais antigo e descartado quando enche
+    'event_queue': 100     # lotes de eventos SSE pendentes por cliente
+}
+
+# Ao vivo em HLS (segmentos fMP4 copiados da camera pelo ffmpeg, sob demanda).
+# Desligado por padrao: o painel ainda usa MJPEG; o playlist precisa de um
+# player com HLS (Safari nativo ou hls.js).
+HLS = {
+    'enabled': os.getenv('HLS_ENABLED', 'false').lower() in {'1', 'true', 'yes'},
+    'segment_seconds': 2,   # duracao alvo; o corte real acontece no keyframe seguinte
+    'playlist_size': 6,     # segmentos mantidos no playlist ao vivo
+    'start_timeout': 10,    # segundos esperando o primeiro segmento
+    'idle_timeout': 30      # sem pedidos do playlist por este tempo, o ffmpeg para
+}
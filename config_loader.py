@@ -30,12 +30,18 @@ def _sanitize_camera(cam: Dict, index: int) -> Dict:
     cam_id = str(cam.get('id') or f'cam{index}')
     rtsp_url = cam.get('rtsp_url') or cam.get('rtsp') or ''
 
-    return {
+    sanitized = {
         'id': cam_id,
         'name': cam.get('name') or cam_id,
         'rtsp_url': rtsp_url.strip(),
         'enabled': bool(cam.get('enabled', True))
     }
+    substream_url = (cam.get('substream_url') or cam.get('rtsp_sub') or '').strip()
+    if substream_url:
+        sanitized['substream_url'] = substream_url
+    if isinstance(cam.get('motion'), dict) and cam['motion']:
+        sanitized['motion'] = deepcopy(cam['motion'])
+    return sanitized
 
 
 def _ensure_file() -> None:
@@ -46,18 +52,22 @@ def _ensure_file() -> None:
         )
 
 
-def _write_cameras(cameras: List[Dict]) -> None:
+def _serialize_camera(cam: Dict) -> Dict:
     data = {
-        'cameras': [
-            {
-                'id': cam['id'],
-                'name': cam.get('name', cam['id']),
-                'rtsp': cam.get('rtsp_url', ''),
-                'enabled': bool(cam.get('enabled', True))
-            }
-            for cam in cameras
-        ]
+        'id': cam['id'],
+        'name': cam.get('name', cam['id']),
+        'rtsp': cam.get('rtsp_url', ''),
+        'enabled': bool(cam.get('enabled', True))
     }
+    if cam.get('substream_url'):
+        data['rtsp_sub'] = cam['substream_url']
+    if cam.get('motion'):
+        data['motion'] = cam['motion']
+    return data
+
+
+def _write_cameras(cameras: List[Dict]) -> None:
+    data = {'cameras': [_serialize_camera(cam) for cam in cameras]}
     CAMERAS_FILE.write_text(json.dumps(data, indent=4, ensure_ascii=False), encoding='utf-8')
 
 
@@ -113,6 +123,16 @@ def update_camera(camera_id: str, data: Dict) -> Optional[Dict]:
                 cam['rtsp_url'] = data['rtsp_url'].strip()
             if 'enabled' in data:
                 cam['enabled'] = bool(data['enabled'])
+            if 'substream_url' in data:
+                if data['substream_url']:
+                    cam['substream_url'] = data['substream_url'].strip()
+                else:
+                    cam.pop('substream_url', None)
+            if 'motion' in data:
+                if data['motion']:
+                    cam['motion'] = deepcopy(data['motion'])
+                else:
+                    cam.pop('motion', None)
             updated = cam
             break
     if not updated:
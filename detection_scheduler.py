@@ -0,0 +1,188 @@
+"""
+Agendador adaptativo da deteccao por camera.
+
+Em vez de um ``process_interval`` fixo para todas as cameras, cada camera
+recebe um intervalo proprio a partir de:
+
+* atividade recente (media movel de movimento);
+* tempo desde o ultimo evento de pessoa (mantem a camera "quente" por
+  ``person_hold`` segundos);
+* custo medido de cada rodada de deteccao da camera.
+
+A atividade define o intervalo desejado entre ``process_interval`` (mais
+rapido) e ``detection_max_interval`` (mais lento). Se a soma do custo das
+cameras passar de ``detection_cpu_budget`` (segundos de CPU por segundo,
+ou seja, nucleos), todas as cameras desaceleram na mesma proporcao. Quando
+o uso de CPU do host passa de ``cpu_high_watermark`` o orcamento tambem
+encolhe.
+"""
+
+import logging
+import threading
+import time
+
+from config import PERFORMANCE
+from status_aggregator import get_system_sampler
+
+logger = logging.getLogger(__name__)
+
+# Custo assumido antes da primeira medicao de uma camera
+DEFAULT_COST = 0.05
+
+
+class CameraSchedule:
+    def __init__(self, interval):
+        self.interval = interval
+        self.desired_interval = interval
+        self.activity = 0.0
+        self.last_person = 0.0
+        self.cost = None
+        self.rate = 0.0
+        self.last_run = None
+
+        self.runs = 0
+        self.frames_skipped = 0
+        self.throttled_runs = 0
+
+    def as_dict(self):
+        return {
+            'interval': round(self.interval, 3),
+            'desired_interval': round(self.desired_interval, 3),
+            'effective_rate': round(self.rate, 3),
+            'activity': round(self.activity, 3),
+            'cost_ms': round((self.cost or 0.0) * 1000, 1),
+            'runs': self.runs,
+            'frames_skipped': self.frames_skipped,
+            'throttled_runs': self.throttled_runs
+        }
+
+
+class DetectionScheduler:
+    def __init__(self, settings=None, sampler=None, rebalance_interval=1.0):
+        self.settings = settings or PERFORMANCE
+        self.sampler = sampler or get_system_sampler()
+        self.rebalance_interval = rebalance_interval
+
+        self._lock = threading.Lock()
+        self._cameras = {}
+        self._last_rebalance = 0.0
+
+        self.load_factor = 1.0
+        self.scale = 1.0
+        self.demand = 0.0
+
+    @property
+    def min_interval(self):
+        return max(0.05, float(self.settings.get('process_interval', 0.5)))
+
+    @property
+    def max_interval(self):
+        return max(self.min_interval, float(self.settings.get('detection_max_interval', 5.0)))
+
+    @property
+    def cpu_budget(self):
+        return max(0.01, float(self.settings.get('detection_cpu_budget', 1.0)))
+
+    def _camera(self, camera_id):
+        state = self._cameras.get(camera_id)
+        if state is None:
+            state = self._cameras[camera_id] = CameraSchedule(self.min_interval)
+        return state
+
+    def interval_for(self, camera_id):
+        with self._lock:
+            return self._camera(camera_id).interval
+
+    def report(self, camera_id, duration, motion, person, frames_skipped=0):
+        """Registra uma rodada de deteccao e devolve o intervalo ate a proxima."""
+        now = time.time()
+        with self._lock:
+            state = self._camera(camera_id)
+            smoothing = float(self.settings.get('activity_smoothing', 0.2))
+            state.activity += smoothing * ((1.0 if motion or person else 0.0) - state.activity)
+            if person:
+                state.last_person = now
+            state.cost = duration if state.cost is None else state.cost + 0.2 * (duration - state.cost)
+
+            if state.last_run is not None:
+                elapsed = max(1e-3, now - state.last_run)
+                state.rate += 0.2 * (1.0 / elapsed - state.rate)
+            state.last_run = now
+            state.runs += 1
+            state.frames_skipped += frames_skipped
+            if state.interval > state.desired_interval + 1e-6:
+                state.throttled_runs += 1
+
+            if now - self._last_rebalance >= self.rebalance_interval:
+                self._rebalance(now)
+            return state.interval
+
+    def remove(self, camera_id):
+        with self._lock:
+            self._cameras.pop(camera_id, None)
+
+    def _urgency(self, state, now):
+        """0 = camera ociosa, 1 = entrada movimentada ou pessoa recente."""
+        hold = float(self.settings.get('person_hold', 30.0))
+        person = 0.0
+        if state.last_person and hold > 0:
+            person = max(0.0, 1.0 - (now - state.last_person) / hold)
+        return min(1.0, max(state.activity, person))
+
+    def _update_load_factor(self):
+        sample = self.sampler.sample if self.sampler is not None else {}
+        if not sample.get('sampled_at'):
+            return
+        watermark = float(self.settings.get('cpu_high_watermark', 85.0))
+        cpu = float(sample.get('cpu_percent') or 0.0)
+        target = 1.0
+        if cpu > watermark:
+            target = max(0.1, (100.0 - cpu) / max(1.0, 100.0 - watermark))
+        # Suaviza para nao oscilar com a propria carga da deteccao
+        self.load_factor += 0.5 * (target - self.load_factor)
+
+    def _rebalance(self, now):
+        self._last_rebalance = now
+        self._update_load_factor()
+
+        span = self.max_interval - self.min_interval
+        demand = 0.0
+        for state in self._cameras.values():
+            state.desired_interval = self.max_interval - span * self._urgency(state, now)
+            demand += (state.cost if state.cost is not None else DEFAULT_COST) / state.desired_interval
+
+        budget = self.cpu_budget * self.load_factor
+        self.demand = demand
+        self.scale = min(1.0, budget / demand) if demand > 0 else 1.0
+        for state in self._cameras.values():
+            state.interval = min(self.max_interval, state.desired_interval / self.scale)
+
+    def get_camera_stats(self, camera_id):
+        with self._lock:
+            state = self._cameras.get(camera_id)
+            return state.as_dict() if state else None
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'cameras': len(self._cameras),
+                'cpu_budget': self.cpu_budget,
+                'load_factor': round(self.load_factor, 3),
+                'demand': round(self.demand, 3),
+                'scale': round(self.scale, 3),
+                'min_interval': self.min_interval,
+                'max_interval': self.max_interval
+            }
+
+
+_detection_scheduler = None
+_detection_scheduler_lock = threading.Lock()
+
+
+def get_detection_scheduler():
+    global _detection_scheduler
+    if _detection_scheduler is None:
+        with _detection_scheduler_lock:
+            if _detection_scheduler is None:
+                _detection_scheduler = DetectionScheduler()
+    return _detection_scheduler
@@ -0,0 +1,338 @@
+"""
+Pool de processos para a analise de movimento das cameras.
+
+Cada camera e atribuida a um processo (shard). O frame vai para o worker
+por um segmento de ``multiprocessing.shared_memory`` exclusivo da camera e
+somente uma mensagem pequena (nome do segmento, formato, sequencia) passa
+pela fila; o worker devolve ``(camera, sequencia, movimento, stats)``.
+Um segmento fica reservado ate a resposta do worker chegar, mesmo que quem
+pediu ja tenha desistido por timeout; o frame seguinte usa outro segmento
+da camera em vez de sobrescrever o que o worker ainda esta lendo.
+Assim a subtracao de fundo e o filtro de contornos rodam fora do GIL do
+processo web. A inferencia YOLO continua no motor compartilhado, que ja
+agrupa os frames de todas as cameras.
+"""
+
+import itertools
+import logging
+import multiprocessing as mp
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import resource_tracker, shared_memory, spawn
+
+import numpy as np
+
+from config import PERFORMANCE
+
+logger = logging.getLogger(__name__)
+
+# Segmentos por camera: um em uso pelo worker e um livre para o proximo frame
+SEGMENTS_PER_CAMERA = 2
+
+
+def _discard_segment(segment):
+    segment.close()
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+WORKER_PREFIX = 'detection-worker-'
+
+_get_preparation_data = spawn.get_preparation_data
+
+
+def _preparation_data(name):
+    """
+    Dados de preparo do filho sem o script principal, so para os workers.
+
+    Com spawn/forkserver o filho reexecutaria o ``__main__`` (app.py) como
+    ``__mp_main__``, subindo cameras e servidores dentro do worker; o worker
+    so precisa deste modulo, importado pelo nome. O filtro vale apenas para
+    processos com o nome dos workers e nao mexe no ``__main__`` do processo,
+    entao pode rodar a qualquer momento (inclusive ao reiniciar um shard com
+    as outras threads ativas).
+    """
+    data = _get_preparation_data(name)
+    if name.startswith(WORKER_PREFIX):
+        data.pop('init_main_from_path', None)
+        data.pop('init_main_from_name', None)
+    return data
+
+
+spawn.get_preparation_data = _preparation_data
+
+
+def _worker_main(requests, results):
+    import cv2
+
+    from motion import MotionDetector
+
+    # Cada processo ja e um shard; evita o pool de threads interno do OpenCV
+    cv2.setNumThreads(1)
+
+    detectors = {}
+    segments = {}
+    settings_seen = {}
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+
+        kind, camera_id = message[0], message[1]
+        if kind == 'release':
+            detectors.pop(camera_id, None)
+            settings_seen.pop(camera_id, None)
+            segment = segments.pop(camera_id, None)
+            if segment is not None:
+                segment.close()
+            continue
+
+        _, _, sequence, shm_name, shape, dtype, settings = message
+        try:
+            segment = segments.get(camera_id)
+            if segment is None or segment.name != shm_name:
+                if segment is not None:
+                    segment.close()
+                segment = shared_memory.SharedMemory(name=shm_name)
+                segments[camera_id] = segment
+
+            detector = detectors.get(camera_id)
+            if detector is None:
+                detector = detectors[camera_id] = MotionDetector(settings)
+                settings_seen[camera_id] = settings
+            elif settings_seen.get(camera_id) != settings:
+                detector.configure(settings)
+                settings_seen[camera_id] = settings
+
+            frame = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+            motion = detector.detect(frame)
+            del frame
+            results.put((camera_id, sequence, motion, detector.get_stats(), None))
+        except Exception as exc:
+            results.put((camera_id, sequence, False, None, str(exc)))
+
+    for segment in segments.values():
+        segment.close()
+
+
+class _Shard:
+    def __init__(self, index, context, results):
+        self.index = index
+        self.requests = context.Queue()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(self.requests, results),
+            name=f'{WORKER_PREFIX}{index}',
+            daemon=True
+        )
+        self.process.start()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        try:
+            self.requests.put(None)
+        except Exception:
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class DetectionWorkerPool:
+    def __init__(self, workers, timeout=2.0):
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+
+        # Nada de fork: o processo web ja tem threads (captura, Flask, alertas)
+        # e um fork pode herdar locks presos delas. O forkserver parte de um
+        # processo limpo que so carrega este modulo.
+        start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        self._context = mp.get_context(start_method)
+        if start_method == 'forkserver':
+            self._context.set_forkserver_preload([__name__])
+        self._results = self._context.Queue()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        self._pending = {}
+        self._segments = {}
+        # (camera, sequencia) -> segmento enviado e ainda sem resposta do worker
+        self._in_flight = {}
+        self._assignments = {}
+        self._shards = []
+        self._reader = None
+        self._running = False
+
+        self.frames_total = 0
+        self.errors_total = 0
+        self.timeouts_total = 0
+        self.restarts = 0
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            # Workers herdam o resource_tracker do pai; sem isso cada um
+            # inicia o proprio e apaga os segmentos ao terminar.
+            resource_tracker.ensure_running()
+            self._shards = [_Shard(i, self._context, self._results) for i in range(self.workers)]
+            self._running = True
+        self._reader = threading.Thread(target=self._read_results, name='detection-results', daemon=True)
+        self._reader.start()
+        logger.info('Pool de deteccao iniciado com %s processos', self.workers)
+
+    def _read_results(self):
+        while self._running:
+            try:
+                message = self._results.get(timeout=1.0)
+            except Exception:
+                continue
+            camera_id, sequence, motion, stats, error = message
+            with self._lock:
+                future = self._pending.pop((camera_id, sequence), None)
+                self._finish_segment(camera_id, self._in_flight.pop((camera_id, sequence), None))
+            if future is None:
+                continue
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result({'motion': motion, 'stats': stats})
+
+    def _shard_for(self, camera_id):
+        index = self._assignments.get(camera_id)
+        if index is None:
+            loads = [0] * len(self._shards)
+            for assigned in self._assignments.values():
+                loads[assigned] += 1
+            index = loads.index(min(loads))
+            self._assignments[camera_id] = index
+
+        shard = self._shards[index]
+        if not shard.alive():
+            logger.warning('Worker de deteccao %s parou; reiniciando', index)
+            # O worker morto nao vai responder: libera os segmentos que ele segurava
+            for key in [key for key in self._in_flight if self._assignments.get(key[0]) == index]:
+                self._finish_segment(key[0], self._in_flight.pop(key))
+            shard = self._shards[index] = _Shard(index, self._context, self._results)
+            self.restarts += 1
+        return shard
+
+    def _finish_segment(self, camera_id, segment):
+        """Resposta recebida: apaga o segmento se ele foi trocado ou a camera saiu."""
+        if segment is not None and segment not in self._segments.get(camera_id, ()):
+            _discard_segment(segment)
+
+    def _segment_for(self, camera_id, nbytes):
+        segments = self._segments.setdefault(camera_id, [])
+        busy = [segment for key, segment in self._in_flight.items() if key[0] == camera_id]
+        for segment in list(segments):
+            if any(segment is used for used in busy):
+                continue
+            if segment.size >= nbytes:
+                return segment
+            # Frame cresceu: o segmento livre e pequeno demais
+            segments.remove(segment)
+            _discard_segment(segment)
+        if len(segments) >= SEGMENTS_PER_CAMERA:
+            raise RuntimeError('worker ainda processando os frames anteriores')
+        segment = shared_memory.SharedMemory(create=True, size=nbytes)
+        segments.append(segment)
+        return segment
+
+    def analyze(self, camera_id, frame, settings, timeout=None):
+        """Envia o frame ao worker da camera e espera o resultado de movimento."""
+        if not self._running:
+            raise RuntimeError('Pool de deteccao parado')
+
+        future = Future()
+        sequence = next(self._sequence)
+        with self._lock:
+            shard = self._shard_for(camera_id)
+            segment = self._segment_for(camera_id, frame.nbytes)
+            view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=segment.buf)
+            np.copyto(view, frame)
+            del view
+            self._pending[(camera_id, sequence)] = future
+            self._in_flight[(camera_id, sequence)] = segment
+
+        shard.requests.put(
+            ('analyze', camera_id, sequence, segment.name, frame.shape, frame.dtype.str, settings)
+        )
+        self.frames_total += 1
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            self.timeouts_total += 1
+            raise
+        except Exception:
+            self.errors_total += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop((camera_id, sequence), None)
+
+    def shard_of(self, camera_id):
+        return self._assignments.get(camera_id)
+
+    def release(self, camera_id):
+        with self._lock:
+            index = self._assignments.pop(camera_id, None)
+            segments = self._segments.pop(camera_id, [])
+            if index is not None and index < len(self._shards):
+                self._shards[index].requests.put(('release', camera_id))
+            busy = [segment for key, segment in self._in_flight.items() if key[0] == camera_id]
+            for segment in segments:
+                # Os que o worker ainda le sao apagados quando a resposta chegar
+                if not any(segment is used for used in busy):
+                    _discard_segment(segment)
+
+    def stop(self):
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            shards, self._shards = self._shards, []
+            segments = [segment for owned in self._segments.values() for segment in owned]
+            segments += [segment for segment in self._in_flight.values() if segment not in segments]
+            self._segments = {}
+            self._in_flight.clear()
+            self._assignments.clear()
+        for shard in shards:
+            shard.stop()
+        for segment in segments:
+            _discard_segment(segment)
+
+    def get_stats(self):
+        loads = {}
+        for index in self._assignments.values():
+            loads[index] = loads.get(index, 0) + 1
+        return {
+            'workers': self.workers,
+            'alive': sum(1 for shard in self._shards if shard.alive()),
+            'cameras_per_worker': [loads.get(i, 0) for i in range(len(self._shards))],
+            'frames': self.frames_total,
+            'errors': self.errors_total,
+            'timeouts': self.timeouts_total,
+            'restarts': self.restarts
+        }
+
+
+_detection_pool = None
+_detection_pool_lock = threading.Lock()
+
+
+def get_detection_pool():
+    """Retorna o pool global, ou None quando PERFORMANCE['detection_workers'] e 0."""
+    global _detection_pool
+    workers = int(PERFORMANCE.get('detection_workers') or 0)
+    if workers <= 0:
+        return None
+    with _detection_pool_lock:
+        if _detection_pool is None:
+            _detection_pool = DetectionWorkerPool(workers, PERFORMANCE.get('detection_worker_timeout', 2.0))
+            _detection_pool.start()
+    return _detection_pool
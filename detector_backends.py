@@ -0,0 +1,268 @@
+"""
+Backends de deteccao usados pelo motor de inferencia.
+
+``YOLO['backend']`` escolhe entre:
+
+* ``ultralytics``: carrega o ``.pt`` pelo ultralytics (padrao, CPU ou GPU);
+* ``onnxruntime``: executa o modelo exportado para ONNX no ONNX Runtime,
+  opcionalmente quantizado em INT8 e usando o provider OpenVINO quando
+  estiver instalado;
+* ``opencv``: executa o mesmo ONNX pelo modulo DNN do OpenCV, sem
+  dependencias extras.
+
+A exportacao para ONNX e feita uma unica vez pelo ultralytics e guardada em
+``YOLO['export_dir']``; se ``YOLO['model']`` ja apontar para um ``.onnx`` ele
+e usado diretamente. O ONNX e exportado com o eixo de lote dinamico e os
+backends ONNX rodam um unico forward por lote (modelos ``.onnx`` externos
+com lote fixo caem para um forward por frame). Todo backend devolve, por
+frame, um array ``N x 5`` com ``x1, y1, x2, y2, confianca`` nas coordenadas
+do frame recebido.
+"""
+
+import logging
+import os
+import shutil
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMPTY = np.zeros((0, 5), dtype=np.float32)
+
+
+def letterbox(frame, size, color=114):
+    """Redimensiona mantendo a proporcao e completa ate ``size x size``."""
+    height, width = frame.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width, new_height = int(round(width * ratio)), int(round(height * ratio))
+    pad_x = (size - new_width) / 2
+    pad_y = (size - new_height) / 2
+
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color, color, color))
+    return frame, ratio, (left, top)
+
+
+def postprocess(output, ratio, padding, shape, confidence, classes, iou):
+    """Converte a saida ``(4 + classes) x ancoras`` do YOLOv8 em caixas do frame original."""
+    predictions = output[0] if output.ndim == 3 else output
+    if predictions.shape[0] < predictions.shape[1]:
+        predictions = predictions.T
+
+    scores = predictions[:, 4:]
+    if classes:
+        class_scores = scores[:, classes]
+    else:
+        class_scores = scores
+    best = class_scores.max(axis=1)
+    keep = best >= confidence
+    if not np.any(keep):
+        return EMPTY
+
+    boxes = predictions[keep, :4]
+    best = best[keep]
+    xywh = np.column_stack((boxes[:, 0] - boxes[:, 2] / 2, boxes[:, 1] - boxes[:, 3] / 2, boxes[:, 2], boxes[:, 3]))
+    indices = cv2.dnn.NMSBoxes(xywh.tolist(), best.tolist(), confidence, iou)
+    if len(indices) == 0:
+        return EMPTY
+    indices = np.asarray(indices).reshape(-1)
+
+    selected = xywh[indices]
+    left, top = padding
+    height, width = shape[:2]
+    x1 = np.clip((selected[:, 0] - left) / ratio, 0, width)
+    y1 = np.clip((selected[:, 1] - top) / ratio, 0, height)
+    x2 = np.clip((selected[:, 0] + selected[:, 2] - left) / ratio, 0, width)
+    y2 = np.clip((selected[:, 1] + selected[:, 3] - top) / ratio, 0, height)
+    return np.column_stack((x1, y1, x2, y2, best[indices])).astype(np.float32)
+
+
+def export_onnx(model_name, export_dir, imgsz):
+    """Exporta ``model_name`` para ONNX uma vez e reutiliza o arquivo em cache."""
+    if model_name.endswith('.onnx'):
+        return model_name
+
+    stem = os.path.splitext(os.path.basename(model_name))[0]
+    # Nome proprio para nao reaproveitar exportacoes antigas com lote fixo
+    target = os.path.join(export_dir, f'{stem}_{imgsz}_dynamic.onnx')
+    source_mtime = os.path.getmtime(model_name) if os.path.exists(model_name) else 0
+    if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+        return target
+
+    from ultralytics import YOLO as YOLOModel
+
+    os.makedirs(export_dir, exist_ok=True)
+    logger.info('Exportando %s para ONNX (%spx)', model_name, imgsz)
+    exported = YOLOModel(model_name).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=False)
+    shutil.move(str(exported), target)
+    return target
+
+
+def quantize_onnx(onnx_path):
+    """Gera (uma vez) a versao INT8 com quantizacao dinamica do ONNX Runtime."""
+    target = onnx_path.replace('.onnx', '.int8.onnx')
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(onnx_path):
+        return target
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    logger.info('Quantizando %s para INT8', onnx_path)
+    quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+    return target
+
+
+class UltralyticsBackend:
+    name = 'ultralytics'
+
+    def __init__(self, model_name, device, config):
+        from ultralytics import YOLO as YOLOModel
+
+        self.model = YOLOModel(model_name)
+        self.device = 'cpu'
+        if device == 'cuda':
+            try:
+                self.model.to('cuda')
+                self.device = 'cuda'
+            except Exception as gpu_err:
+                logger.warning('Falha ao usar GPU no motor de inferencia: %s', gpu_err)
+        self.model_path = model_name
+        self.config = config
+
+    def predict(self, frames):
+        results = self.model(
+            frames,
+            conf=self.config.get('confidence', 0.5),
+            classes=self.config.get('classes', [0]),
+            verbose=False
+        )
+        outputs = []
+        for result in results:
+            boxes = getattr(result, 'boxes', None)
+            if boxes is None or len(boxes) == 0:
+                outputs.append(EMPTY)
+                continue
+            xyxy = boxes.xyxy.cpu().numpy()
+            conf = boxes.conf.cpu().numpy()
+            outputs.append(np.column_stack((xyxy, conf)).astype(np.float32))
+        return outputs
+
+
+class _OnnxBackend(ABC):
+    def __init__(self, model_name, device, config):
+        self.config = config
+        self.imgsz = int(config.get('imgsz', 640))
+        self.onnx_path = export_onnx(model_name, config.get('export_dir', 'models'), self.imgsz)
+        self.model_path = self.onnx_path
+        self.device = 'cpu'
+        # False quando o modelo so aceita lote 1
+        self.batched = True
+
+    def _postprocess(self, output, ratio, padding, shape):
+        return postprocess(
+            output,
+            ratio,
+            padding,
+            shape,
+            self.config.get('confidence', 0.5),
+            self.config.get('classes', [0]),
+            self.config.get('nms_iou', 0.45)
+        )
+
+    @abstractmethod
+    def _forward(self, blob):
+        """Recebe ``N x 3 x imgsz x imgsz`` e devolve ``N x (4 + classes) x ancoras``."""
+
+    def _forward_batch(self, images):
+        if self.batched and len(images) > 1:
+            return list(self._forward(cv2.dnn.blobFromImages(images, 1 / 255.0, swapRB=True)))
+        return [self._forward(cv2.dnn.blobFromImage(image, 1 / 255.0, swapRB=True))[0] for image in images]
+
+    def predict(self, frames):
+        if not frames:
+            return []
+        letterboxed = [letterbox(frame, self.imgsz) for frame in frames]
+        raw = self._forward_batch([image for image, _, _ in letterboxed])
+        return [
+            self._postprocess(output, ratio, padding, frame.shape)
+            for output, (_, ratio, padding), frame in zip(raw, letterboxed, frames)
+        ]
+
+
+class OnnxRuntimeBackend(_OnnxBackend):
+    name = 'onnxruntime'
+
+    def __init__(self, model_name, device, config):
+        super().__init__(model_name, device, config)
+        import onnxruntime as ort
+
+        if config.get('quantize') == 'int8':
+            self.model_path = quantize_onnx(self.onnx_path)
+
+        available = ort.get_available_providers()
+        preferred = config.get('providers') or ['OpenVINOExecutionProvider', 'CPUExecutionProvider']
+        if device == 'cuda':
+            preferred = ['CUDAExecutionProvider'] + list(preferred)
+        providers = [provider for provider in preferred if provider in available] or ['CPUExecutionProvider']
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = int(config.get('intra_op_threads') or 0)
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.session = ort.InferenceSession(self.model_path, sess_options=options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Eixo de lote dinamico vem como nome simbolico ('batch') em vez de inteiro
+        self.batched = not isinstance(model_input.shape[0], int)
+        self.device = self.session.get_providers()[0]
+
+    def _forward(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenCVDnnBackend(_OnnxBackend):
+    name = 'opencv'
+
+    def __init__(self, model_name, device, config):
+        super().__init__(model_name, device, config)
+        self.net = cv2.dnn.readNetFromONNX(self.onnx_path)
+        if device == 'cuda':
+            try:
+                self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+                self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+                self.device = 'cuda'
+            except Exception as gpu_err:
+                logger.warning('OpenCV DNN sem suporte a CUDA: %s', gpu_err)
+
+    def _forward(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward()
+
+    def _forward_batch(self, images):
+        try:
+            return super()._forward_batch(images)
+        except cv2.error as exc:
+            if not self.batched or len(images) < 2:
+                raise
+            # O DNN nao expoe o formato da entrada; descobre o lote fixo na primeira falha
+            logger.warning('Modelo ONNX sem lote dinamico no OpenCV DNN; um forward por frame: %s', exc)
+            self.batched = False
+            return super()._forward_batch(images)
+
+
+def create_backend(name, model_name, device, config):
+    backends = {
+        'ultralytics': UltralyticsBackend,
+        'onnxruntime': OnnxRuntimeBackend,
+        'opencv': OpenCVDnnBackend
+    }
+    backend_class = backends.get(name)
+    if backend_class is None:
+        raise ValueError(f'Backend de deteccao desconhecido: {name}')
+    return backend_class(model_name, device, config)
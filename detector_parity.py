@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Confere se dois backends de deteccao produzem as mesmas caixas.
+
+Roda os backends sobre as mesmas imagens (ou frames de um video), casa as
+caixas por IoU e falha se alguma deteccao ficar sem par ou se a confianca
+divergir mais que a tolerancia. Tambem mostra o tempo medio por frame.
+
+``--check-mapping`` nao precisa de modelo: monta saidas sinteticas do YOLO
+para caixas conhecidas em frames de tamanhos variados, passa pelo
+letterbox, pelo caminho em lote dos backends ONNX e pelo pos-processamento,
+e confere se as caixas voltam as coordenadas originais.
+
+Uso:
+    python detector_parity.py imagens/*.jpg --backends ultralytics onnxruntime
+    python detector_parity.py video.mp4 --frames 50 --backends onnxruntime opencv
+    python detector_parity.py --check-mapping
+"""
+
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from config import PERFORMANCE, YOLO
+from detector_backends import _OnnxBackend, create_backend, letterbox
+
+
+def load_frames(sources, max_frames):
+    frames = []
+    for source in sources:
+        image = cv2.imread(source)
+        if image is not None:
+            frames.append(image)
+            continue
+        capture = cv2.VideoCapture(source)
+        while len(frames) < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+    return frames[:max_frames]
+
+
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare(reference, candidate, min_iou, conf_tolerance):
+    """Retorna (pares, sem par na referencia, sem par no candidato, maior diferenca de confianca)."""
+    unmatched = list(range(len(candidate)))
+    matched = 0
+    missing = 0
+    worst_conf = 0.0
+    for box in reference:
+        best, best_iou = None, min_iou
+        for index in unmatched:
+            iou = box_iou(box, candidate[index])
+            if iou >= best_iou:
+                best, best_iou = index, iou
+        if best is None:
+            # Caixas no limiar de confianca podem sumir em um dos backends
+            if box[4] >= YOLO.get('confidence', 0.5) + conf_tolerance:
+                missing += 1
+            continue
+        unmatched.remove(best)
+        matched += 1
+        worst_conf = max(worst_conf, abs(box[4] - candidate[best][4]))
+    extra = sum(1 for index in unmatched if candidate[index][4] >= YOLO.get('confidence', 0.5) + conf_tolerance)
+    return matched, missing, extra, worst_conf
+
+
+def run_backend(name, frames):
+    device = 'cuda' if PERFORMANCE.get('use_gpu') else 'cpu'
+    backend = create_backend(name, YOLO.get('model', 'yolov8n.pt'), device, YOLO)
+    backend.predict(frames[:1])  # aquecimento
+    started = time.perf_counter()
+    outputs = [backend.predict([frame])[0] for frame in frames]
+    elapsed = (time.perf_counter() - started) / max(len(frames), 1)
+    return backend, outputs, elapsed
+
+
+class _SyntheticBackend(_OnnxBackend):
+    """Backend ONNX sem modelo: o forward devolve as caixas esperadas de cada imagem."""
+
+    name = 'synthetic'
+
+    def __init__(self, imgsz, boxes_by_frame):
+        self.config = dict(YOLO, classes=[0], confidence=0.5, nms_iou=0.45)
+        self.imgsz = imgsz
+        self.batched = True
+        self.model_path = '(sintetico)'
+        self.device = 'cpu'
+        self.boxes_by_frame = boxes_by_frame
+        self.forward_calls = 0
+
+    def _forward(self, blob):
+        self.forward_calls += 1
+        outputs = np.zeros((blob.shape[0], 6, 32), dtype=np.float32)
+        for index, boxes in enumerate(self.boxes_by_frame[:blob.shape[0]]):
+            for anchor, (cx, cy, w, h) in enumerate(boxes):
+                outputs[index, :4, anchor] = (cx, cy, w, h)
+                outputs[index, 4, anchor] = 0.9
+            # Ancora de outra classe que o filtro de classes precisa ignorar
+            outputs[index, :4, -1] = (10, 10, 5, 5)
+            outputs[index, 5, -1] = 0.99
+        return outputs
+
+
+def check_mapping(imgsz=640, tolerance=1.0):
+    """Confere letterbox + lote + pos-processamento com caixas conhecidas."""
+    cases = [
+        ((720, 1280, 3), [(100, 200, 300, 500), (900, 50, 1270, 700)]),
+        ((480, 640, 3), [(0, 0, 320, 240)]),
+        ((1080, 810, 3), [(400, 300, 800, 1000)]),
+        ((300, 300, 3), [])
+    ]
+    frames, boxes_by_frame = [], []
+    for shape, boxes in cases:
+        frame = np.zeros(shape, dtype=np.uint8)
+        image, ratio, (left, top) = letterbox(frame, imgsz)
+        if image.shape[:2] != (imgsz, imgsz):
+            print(f'letterbox de {shape[:2]} gerou {image.shape[:2]}')
+            return 1
+        frames.append(frame)
+        boxes_by_frame.append([
+            (((x1 + x2) / 2) * ratio + left, ((y1 + y2) / 2) * ratio + top, (x2 - x1) * ratio, (y2 - y1) * ratio)
+            for x1, y1, x2, y2 in boxes
+        ])
+
+    backend = _SyntheticBackend(imgsz, boxes_by_frame)
+    outputs = backend.predict(frames)
+    ok = backend.forward_calls == 1 and len(outputs) == len(frames)
+    if not ok:
+        print(f'Esperado 1 forward para {len(frames)} frames, houve {backend.forward_calls}')
+    for (shape, expected), output in zip(cases, outputs):
+        found = sorted(output[:, :4].tolist())
+        wanted = sorted([list(map(float, box)) for box in expected])
+        if len(found) != len(wanted) or any(
+            abs(a - b) > tolerance for box_a, box_b in zip(found, wanted) for a, b in zip(box_a, box_b)
+        ):
+            ok = False
+            print(f'  {shape[1]}x{shape[0]}: esperado {wanted}, obtido {found}')
+    print(f'Mapeamento letterbox/pos-processamento em lote: {"OK" if ok else "DIVERGENTE"}')
+    return 0 if ok else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paridade de caixas entre backends de deteccao')
+    parser.add_argument('sources', nargs='*', help='imagens ou videos de teste')
+    parser.add_argument('--backends', nargs=2, default=['ultralytics', 'onnxruntime'],
+                        metavar=('REFERENCIA', 'CANDIDATO'))
+    parser.add_argument('--frames', type=int, default=30, help='maximo de frames avaliados')
+    parser.add_argument('--min-iou', type=float, default=0.7)
+    parser.add_argument('--conf-tolerance', type=float, default=0.05)
+    parser.add_argument('--check-mapping', action='store_true',
+                        help='so confere o mapeamento de coordenadas, sem modelo')
+    args = parser.parse_args()
+
+    if args.check_mapping:
+        return check_mapping(int(YOLO.get('imgsz', 640)))
+    if not args.sources:
+        parser.error('informe imagens ou videos, ou use --check-mapping')
+
+    frames = load_frames(args.sources, args.frames)
+    if not frames:
+        print('Nenhum frame carregado')
+        return 1
+
+    results = {}
+    for name in args.backends:
+        backend, outputs, elapsed = run_backend(name, frames)
+        results[name] = outputs
+        total = sum(len(output) for output in outputs)
+        print(f'{name}: {backend.model_path} em {backend.device} | {elapsed * 1000:.1f} ms/frame | {total} caixas')
+
+    reference, candidate = (results[name] for name in args.backends)
+    ok = True
+    totals = np.zeros(3, dtype=int)
+    worst_conf = 0.0
+    for index, (ref_boxes, cand_boxes) in enumerate(zip(reference, candidate)):
+        matched, missing, extra, conf_delta = compare(
+            ref_boxes.tolist(), cand_boxes.tolist(), args.min_iou, args.conf_tolerance
+        )
+        totals += (matched, missing, extra)
+        worst_conf = max(worst_conf, conf_delta)
+        if missing or extra:
+            ok = False
+            print(f'  frame {index}: {matched} pares, {missing} sem par, {extra} extras')
+
+    ok = ok and worst_conf <= args.conf_tolerance
+    print(f'Pares: {totals[0]} | sem par: {totals[1]} | extras: {totals[2]} | '
+          f'maior diferenca de confianca: {worst_conf:.3f} {"OK" if ok else "DIVERGENTE"}')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Canal de eventos em tempo real (Server-Sent Events) para o dashboard.
+
+Cada evento e serializado uma unica vez no formato SSE e guardado num
+historico curto; os clientes conectados apenas acompanham um cursor sobre
+esse historico. Publicar custa o mesmo com um ou cem clientes, e um cliente
+que reconecta com ``Last-Event-ID`` recebe o que perdeu enquanto o evento
+ainda estiver no historico.
+
+Tipos publicados:
+
+* ``status``: snapshot completo do ``/status`` quando a versao muda;
+* ``detection``: transicoes de movimento/pessoa de uma camera;
+* ``connection``: camera conectou ou caiu;
+* ``alert``: alerta disparado pelo ``AlertManager``.
+"""
+
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from config import EVENTS
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event_id, event, data):
+    """Monta a mensagem SSE; ``data`` pode ser um JSON ja serializado."""
+    payload = data if isinstance(data, str) else json.dumps(data, default=str)
+    lines = ''.join(f'data: {line}\n' for line in payload.split('\n'))
+    prefix = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{prefix}event: {event}\n{lines}\n'
+
+
+class EventHub:
+    def __init__(self, history=200, heartbeat=15.0, retry_ms=3000):
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=max(1, int(history)))
+        self._last_id = 0
+
+        self.subscribers = 0
+        self.connections_total = 0
+        self.published_total = 0
+
+    def configure(self, settings):
+        self.heartbeat = float(settings.get('heartbeat', self.heartbeat))
+        self.retry_ms = int(settings.get('retry_ms', self.retry_ms))
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event, data):
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, format_event(self._last_id, event, data)))
+            self.published_total += 1
+            self._cond.notify_all()
+        return self._last_id
+
+    def _pending_after(self, cursor):
+        missing = self._last_id - cursor
+        if missing <= 0:
+            return []
+        size = len(self._events)
+        return list(itertools.islice(self._events, max(0, size - missing), size))
+
+    def _resolve_cursor(self, last_event_id):
+        try:
+            cursor = int(last_event_id)
+        except (TypeError, ValueError):
+            return self._last_id
+        # ID maior que o atual vem de antes de um reinicio do servidor
+        return cursor if 0 <= cursor <= self._last_id else self._last_id
+
+    def resolve_cursor(self, last_event_id=None):
+        with self._cond:
+            return self._resolve_cursor(last_event_id)
+
+    def read_after(self, cursor, timeout=None):
+        """Eventos ``(id, mensagem)`` depois de ``cursor``, esperando ate ``timeout``."""
+        with self._cond:
+            pending = self._pending_after(cursor)
+            if not pending and timeout:
+                self._cond.wait(timeout=timeout)
+                pending = self._pending_after(cursor)
+            return pending
+
+    def stream(self, last_event_id=None, initial=None):
+        """Gerador SSE para um cliente.
+
+        ``initial`` (mensagem ja formatada) e enviado primeiro, para que um
+        cliente novo nao dependa do historico para montar a tela.
+        """
+        with self._cond:
+            cursor = self._resolve_cursor(last_event_id)
+            self.subscribers += 1
+            self.connections_total += 1
+
+        try:
+            yield f'retry: {self.retry_ms}\n\n'
+            if initial:
+                yield initial
+            while True:
+                pending = self.read_after(cursor, timeout=self.heartbeat)
+                if pending:
+                    cursor = pending[-1][0]
+                    yield ''.join(message for _, message in pending)
+                else:
+                    # Comentario SSE: mantem proxies abertos e detecta cliente que saiu
+                    yield f': ping {int(time.time())}\n\n'
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+    def get_stats(self):
+        return {
+            'subscribers': self.subscribers,
+            'connections': self.connections_total,
+            'published': self.published_total,
+            'last_id': self._last_id,
+            'heartbeat': self.heartbeat
+        }
+
+
+_event_hub = EventHub(
+    history=EVENTS.get('history', 200),
+    heartbeat=EVENTS.get('heartbeat', 15.0),
+    retry_ms=EVENTS.get('retry_ms', 3000)
+)
+
+
+def get_event_hub():
+    return _event_hub
+
+
+def publish_event(event, data):
+    if not EVENTS.get('enabled', True):
+        return None
+    try:
+        return _event_hub.publish(event, data)
+    except Exception as exc:
+        logger.error('Erro ao publicar evento %s: %s', event, exc)
+        return None
@@ -0,0 +1,214 @@
+"""
+Hub de difusao de JPEG por camera.
+
+Cada frame capturado e codificado uma unica vez, recebe um numero de
+sequencia crescente e os mesmos bytes sao entregues a todos os clientes
+conectados ao ``/video_feed``. Com ``max_fps`` o codificador pula os frames
+que chegam antes do intervalo minimo (perfis de miniatura).
+
+Cada cliente recebe sempre o JPEG mais recente: se ficou para tras, os
+intermediarios sao pulados (e contados em ``frames_dropped``). Um cliente
+pode ter fps proprio, e a entrega termina quando a escrita fica bloqueada
+mais que ``stall_timeout`` ou quando a camera nao captura frame novo por
+``idle_timeout`` segundos. Os quadros de "reconectando" publicados com a
+camera fora do ar (``notify_frame(captured=False)``) sao entregues, mas nao
+contam como atividade: quem assiste uma camera morta e encerrado.
+"""
+
+import itertools
+import logging
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BYTES_SENT = metrics.counter('mjpeg_bytes_sent_total', 'Bytes de JPEG entregues aos clientes', ('view',))
+FRAMES_SKIPPED = metrics.counter(
+    'mjpeg_frames_skipped_total', 'Frames codificados que clientes lentos ou limitados nao receberam', ('view',)
+)
+CLIENTS_CLOSED = metrics.counter('mjpeg_clients_closed_total', 'Clientes encerrados pelo servidor', ('view', 'reason'))
+
+_subscriber_ids = itertools.count(1)
+
+
+class Subscriber:
+    def __init__(self, client=None, max_fps=0):
+        self.id = next(_subscriber_ids)
+        self.client = client
+        self.max_fps = max_fps
+        self.connected_at = time.time()
+        self.last_sent = None
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'client': self.client,
+            'max_fps': self.max_fps,
+            'connected_at': self.connected_at,
+            'last_sent': self.last_sent,
+            'frames_sent': self.frames_sent,
+            'frames_dropped': self.frames_dropped,
+            'bytes_sent': self.bytes_sent
+        }
+
+
+class FrameBroadcaster:
+    def __init__(self, render, name='camera', keepalive_interval=5.0, max_fps=0):
+        self._render = render
+        self.name = name
+        self.keepalive_interval = keepalive_interval
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+
+        self._cond = threading.Condition()
+        self._source_seq = 0
+        self._encoder = None
+        # Sequencia so dos frames reais da camera (sem os placeholders)
+        self.captured_seq = 0
+
+        self.sequence = 0
+        self.jpeg = None
+        self.encoded_at = 0.0
+        self.subscribers = 0
+        self._clients = {}
+        # Clientes atendidos por um repasse (servidor assincrono) que conta como um so assinante
+        self.relayed_viewers = 0
+        self.frames_encoded = 0
+        self.encode_seconds = 0.0
+        self.bytes_encoded = 0
+
+    def notify_frame(self, captured=True):
+        with self._cond:
+            self._source_seq += 1
+            if captured:
+                self.captured_seq += 1
+            self._cond.notify_all()
+
+    def latest(self):
+        with self._cond:
+            return self.sequence, self.jpeg
+
+    def _ensure_encoder(self):
+        if self._encoder is not None and self._encoder.is_alive():
+            return
+        self._encoder = threading.Thread(
+            target=self._encoder_loop,
+            name=f'broadcast-{self.name}',
+            daemon=True
+        )
+        self._encoder.start()
+
+    def _encoder_loop(self):
+        last_source = None
+        while True:
+            with self._cond:
+                while self.subscribers > 0 and self._source_seq == last_source:
+                    self._cond.wait(timeout=1.0)
+                if self.subscribers == 0:
+                    self._encoder = None
+                    return
+                last_source = self._source_seq
+
+            started = time.perf_counter()
+            try:
+                jpeg = self._render()
+            except Exception as exc:
+                logger.error('Erro ao codificar frame de %s: %s', self.name, exc)
+                time.sleep(0.1)
+                continue
+
+            if not jpeg:
+                continue
+
+            with self._cond:
+                self.sequence += 1
+                self.jpeg = jpeg
+                self.encoded_at = time.time()
+                self.frames_encoded += 1
+                self.encode_seconds += time.perf_counter() - started
+                self.bytes_encoded += len(jpeg)
+                self._cond.notify_all()
+
+            if self.min_interval:
+                time.sleep(max(0.0, self.min_interval - (time.perf_counter() - started)))
+
+    def subscribe(self, client=None, max_fps=0, idle_timeout=None, stall_timeout=None):
+        subscriber = Subscriber(client, max_fps)
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        with self._cond:
+            self.subscribers += 1
+            self._clients[subscriber.id] = subscriber
+            self._ensure_encoder()
+            last_seq = 0
+            last_captured = self.captured_seq
+        last_live = time.monotonic()
+        reason = None
+
+        try:
+            while True:
+                if min_interval and subscriber.last_sent is not None:
+                    # Limite do cliente: frames codificados durante a espera sao pulados
+                    wait = subscriber.last_sent + min_interval - time.time()
+                    if wait > 0:
+                        time.sleep(wait)
+                with self._cond:
+                    deadline = time.monotonic() + self.keepalive_interval
+                    while self.sequence <= last_seq:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(timeout=remaining)
+                    seq, jpeg, captured = self.sequence, self.jpeg, self.captured_seq
+
+                now = time.monotonic()
+                if captured != last_captured:
+                    last_captured = captured
+                    last_live = now
+                elif idle_timeout and now - last_live > idle_timeout:
+                    reason = 'idle'
+                    return
+                if jpeg is None:
+                    continue
+                if seq > last_seq and last_seq and seq - last_seq > 1:
+                    subscriber.frames_dropped += seq - last_seq - 1
+                    FRAMES_SKIPPED.inc(seq - last_seq - 1, view=self.name)
+                # Sem frame novo dentro do intervalo: reenvia o ultimo para
+                # detectar clientes desconectados.
+                last_seq = seq
+                yield jpeg
+                # O gerador so volta depois que o servidor escreveu o frame
+                blocked = time.monotonic() - now
+                subscriber.frames_sent += 1
+                subscriber.bytes_sent += len(jpeg)
+                subscriber.last_sent = time.time()
+                BYTES_SENT.inc(len(jpeg), view=self.name)
+                if stall_timeout and blocked > stall_timeout:
+                    reason = 'stalled'
+                    return
+        finally:
+            if reason:
+                CLIENTS_CLOSED.inc(view=self.name, reason=reason)
+                logger.info('Cliente %s de %s encerrado (%s)', subscriber.client or subscriber.id, self.name, reason)
+            with self._cond:
+                self.subscribers -= 1
+                self._clients.pop(subscriber.id, None)
+                self._cond.notify_all()
+
+    def get_clients(self):
+        with self._cond:
+            return [subscriber.as_dict() for subscriber in self._clients.values()]
+
+    def get_stats(self):
+        return {
+            'subscribers': self.subscribers,
+            'relayed_viewers': self.relayed_viewers,
+            'sequence': self.sequence,
+            'frames_encoded': self.frames_encoded,
+            'avg_encode_ms': round(self.encode_seconds / self.frames_encoded * 1000, 2) if self.frames_encoded else 0.0,
+            'bytes_encoded': self.bytes_encoded,
+            'encoded_at': self.encoded_at
+        }
@@ -0,0 +1,53 @@
+"""
+Slot do ultimo frame capturado.
+
+A thread de captura publica o array retornado pelo decoder sem copiar; o
+array e marcado como somente leitura e os consumidores (deteccao, gravacao,
+codificador JPEG) recebem apenas uma referencia. Quem precisar desenhar
+sobre o frame faz a propria copia. O array antigo e liberado pelo contador
+de referencias do Python quando o ultimo consumidor o solta.
+"""
+
+import threading
+import time
+
+
+class FrameSlot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._published = threading.Condition(self._lock)
+        self._frame = None
+        self._sequence = 0
+        self._timestamp = 0.0
+
+    def publish(self, frame, timestamp=None):
+        """Publica ``frame`` sem copiar. O chamador nao deve altera-lo depois."""
+        if frame is not None:
+            frame.flags.writeable = False
+        with self._lock:
+            self._frame = frame
+            self._sequence += 1
+            self._timestamp = timestamp or time.time()
+            self._published.notify_all()
+            return self._sequence
+
+    def get(self):
+        """Retorna (sequencia, frame somente leitura, timestamp)."""
+        with self._lock:
+            return self._sequence, self._frame, self._timestamp
+
+    def wait_newer(self, sequence, timeout=None):
+        """Como ``get``, mas espera ate haver frame com sequencia maior que ``sequence``."""
+        with self._lock:
+            self._published.wait_for(lambda: self._sequence > sequence, timeout=timeout)
+            return self._sequence, self._frame, self._timestamp
+
+    @property
+    def frame(self):
+        with self._lock:
+            return self._frame
+
+    @property
+    def sequence(self):
+        with self._lock:
+            return self._sequence
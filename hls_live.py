@@ -0,0 +1,198 @@
+"""
+Ao vivo em HLS (segmentos fMP4) gerado sob demanda pelo ffmpeg.
+
+O primeiro pedido do playlist de uma camera inicia um ffmpeg que copia o
+H.264/H.265 da camera (sem recodificar) para segmentos fMP4 curtos numa
+pasta temporaria, com uma janela deslizante de poucos segmentos. O player
+baixa so os segmentos novos, em vez de um JPEG inteiro por frame como no
+MJPEG. Quando ninguem pede o playlist por ``idle_timeout`` segundos o
+ffmpeg e encerrado e a pasta apagada.
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+from config import HLS, RECORDING
+from recording_utils import get_recordings_base_path
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_NAME = 'index.m3u8'
+
+
+class HlsSession:
+    def __init__(self, camera_id, source_url, settings):
+        self.camera_id = camera_id
+        self.source_url = source_url
+        self.settings = settings
+        self.directory = os.path.join(get_recordings_base_path(), '.live', str(camera_id))
+        self.process = None
+        self.started_at = None
+        self.last_access = time.time()
+
+    @property
+    def playlist_path(self):
+        return os.path.join(self.directory, PLAYLIST_NAME)
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def build_command(self):
+        ffmpeg = RECORDING.get('ffmpeg_path') or 'ffmpeg'
+        segment_seconds = max(1, int(self.settings.get('segment_seconds', 2)))
+        command = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin']
+        if self.source_url.startswith('rtsp://'):
+            command += ['-rtsp_transport', 'tcp']
+        elif os.path.isfile(self.source_url):
+            command += ['-re', '-stream_loop', '-1']
+        command += [
+            '-i', self.source_url,
+            '-map', '0:v:0',
+            '-an',
+            '-c', 'copy',
+            '-f', 'hls',
+            '-hls_time', str(segment_seconds),
+            '-hls_list_size', str(max(2, int(self.settings.get('playlist_size', 6)))),
+            '-hls_flags', 'delete_segments+independent_segments+omit_endlist',
+            '-hls_segment_type', 'fmp4',
+            '-hls_fmp4_init_filename', 'init.mp4',
+            '-hls_segment_filename', os.path.join(self.directory, 'seg_%05d.m4s'),
+            self.playlist_path
+        ]
+        return command
+
+    def start(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+        logger.info('Iniciando HLS ao vivo de %s', self.camera_id)
+        self.process = subprocess.Popen(
+            self.build_command(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self.started_at = time.time()
+
+    def stop(self):
+        process, self.process = self.process, None
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def wait_for_playlist(self, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if os.path.exists(self.playlist_path):
+                return True
+            if not self.alive:
+                return False
+            time.sleep(0.2)
+        return os.path.exists(self.playlist_path)
+
+
+class HlsLiveManager:
+    def __init__(self, settings=None):
+        self.settings = settings or HLS
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    @property
+    def enabled(self):
+        return bool(self.settings.get('enabled', False))
+
+    def open(self, camera_id, source_url):
+        """Garante o ffmpeg da camera e retorna a sessao (ou None se falhar)."""
+        ffmpeg = RECORDING.get('ffmpeg_path') or 'ffmpeg'
+        if shutil.which(ffmpeg) is None and not os.path.isfile(ffmpeg):
+            logger.error('ffmpeg nao encontrado (%s); HLS ao vivo indisponivel', ffmpeg)
+            return None
+
+        with self._lock:
+            session = self._sessions.get(camera_id)
+            if session is not None and session.source_url != source_url:
+                session.stop()
+                session = None
+            if session is None or not session.alive:
+                if session is not None:
+                    session.stop()
+                session = HlsSession(camera_id, source_url, self.settings)
+                try:
+                    session.start()
+                except OSError as exc:
+                    logger.error('Erro ao iniciar HLS de %s: %s', camera_id, exc)
+                    return None
+                self._sessions[camera_id] = session
+            session.last_access = time.time()
+            self._ensure_reaper()
+
+        # O primeiro segmento leva ate um GOP para aparecer
+        if not session.wait_for_playlist(float(self.settings.get('start_timeout', 10))):
+            return None
+        return session
+
+    def touch(self, camera_id):
+        with self._lock:
+            session = self._sessions.get(camera_id)
+            if session is not None:
+                session.last_access = time.time()
+            return session
+
+    def stop(self, camera_id):
+        with self._lock:
+            session = self._sessions.pop(camera_id, None)
+        if session is not None:
+            session.stop()
+
+    def _ensure_reaper(self):
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, name='hls-reaper', daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(5)
+            idle_timeout = float(self.settings.get('idle_timeout', 30))
+            now = time.time()
+            with self._lock:
+                idle = [
+                    camera_id for camera_id, session in self._sessions.items()
+                    if now - session.last_access > idle_timeout or not session.alive
+                ]
+                sessions = [self._sessions.pop(camera_id) for camera_id in idle]
+                if not self._sessions:
+                    self._reaper = None
+            for session in sessions:
+                logger.info('Encerrando HLS ao vivo de %s (sem clientes)', session.camera_id)
+                session.stop()
+            if self._reaper is None:
+                return
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                camera_id: {
+                    'alive': session.alive,
+                    'started_at': session.started_at,
+                    'last_access': session.last_access
+                }
+                for camera_id, session in self._sessions.items()
+            }
+
+
+_hls_manager = HlsLiveManager()
+
+
+def get_hls_manager():
+    return _hls_manager
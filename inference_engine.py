@@ -0,0 +1,267 @@
+"""
+Motor de inferencia YOLO compartilhado por todas as cameras.
+
+Cada CameraStream envia frames para uma fila unica; um worker agrupa os
+pedidos pendentes em um unico forward em lote e devolve o resultado para
+cada camera no formato de ``detections_data``.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from config import YOLO, PERFORMANCE
+from detector_backends import create_backend
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SECONDS = metrics.histogram('inference_batch_seconds', 'Tempo do forward do YOLO por lote', ('backend',))
+QUEUE_WAIT_SECONDS = metrics.histogram('inference_queue_wait_seconds', 'Tempo dos frames na fila do motor de inferencia')
+INFERENCE_FRAMES = metrics.counter('inference_frames_total', 'Frames processados pelo YOLO', ('backend',))
+INFERENCE_ERRORS = metrics.counter('inference_errors_total', 'Lotes do YOLO que falharam', ('backend',))
+QUEUE_DEPTH = metrics.gauge('inference_queue_depth', 'Frames aguardando o motor de inferencia')
+
+
+def percentile_ms(values, percent):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 2)
+
+
+class InferenceRequest:
+    __slots__ = ('frame', 'scale', 'future', 'submitted_at')
+
+    def __init__(self, frame, scale):
+        self.frame = frame
+        self.scale = scale
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+
+
+class InferenceEngine:
+    def __init__(self, config_source=None, performance_source=None):
+        self.config = config_source or YOLO
+        self.performance = performance_source or PERFORMANCE
+        self.backend = None
+        self.backend_name = None
+        self.model_path = None
+        self.model_device = None
+        self._loaded_key = None
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._loader = None
+        self.state = 'idle'
+
+        self.batches_total = 0
+        self.frames_total = 0
+        self.errors_total = 0
+        self._latencies = deque(maxlen=256)
+        self._batch_sizes = deque(maxlen=256)
+
+    @property
+    def model_name(self):
+        return self.config.get('model', 'yolov8n.pt')
+
+    @property
+    def backend_setting(self):
+        return self.config.get('backend', 'ultralytics')
+
+    @property
+    def max_batch_size(self):
+        return max(1, int(self.config.get('batch_size', 8)))
+
+    @property
+    def max_wait(self):
+        return max(0.0, float(self.config.get('batch_max_wait', 0.02)))
+
+    @property
+    def use_gpu(self):
+        return self.performance.get('use_gpu', False)
+
+    @property
+    def available(self):
+        return self.backend is not None
+
+    def refresh_from_config(self, config_source=None, background=False):
+        """
+        Carrega o modelo se backend/modelo/dispositivo mudaram. Com
+        ``background=True`` o carregamento roda em outra thread e as cameras
+        seguem so com deteccao de movimento ate ``available`` ficar True.
+        """
+        if config_source is not None:
+            self.config = config_source
+
+        if background:
+            if self._loader is not None and self._loader.is_alive():
+                return
+            self._loader = threading.Thread(target=self.refresh_from_config, name='inference-loader', daemon=True)
+            self._loader.start()
+            return
+
+        device = 'cuda' if self.use_gpu else 'cpu'
+        key = (
+            self.backend_setting,
+            self.model_name,
+            device,
+            self.config.get('imgsz', 640),
+            self.config.get('quantize')
+        )
+        with self._lock:
+            if self.backend is not None and self._loaded_key == key:
+                return
+            self._load_model(self.backend_setting, self.model_name, device)
+            self._loaded_key = key
+
+    def _load_model(self, backend_name, model_path, device):
+        self.state = 'loading'
+        try:
+            backend = create_backend(backend_name, model_path, device, self.config)
+            self.backend = backend
+            self.backend_name = backend.name
+            self.model_path = backend.model_path
+            self.model_device = backend.device
+            self.state = 'ready'
+            logger.info('Modelo YOLO %s carregado no motor compartilhado (%s)', backend.model_path, backend.name)
+        except Exception as exc:
+            logger.error('Erro ao carregar modelo YOLO %s: %s', model_path, exc)
+            self.state = 'error'
+            self.backend = None
+            self.backend_name = None
+            self.model_path = None
+            self.model_device = None
+
+    def submit(self, frame, scale=(1.0, 1.0)):
+        request = InferenceRequest(frame, scale)
+        if self.backend is None:
+            request.future.set_result([])
+            return request.future
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def infer(self, frame, scale=(1.0, 1.0), timeout=None):
+        future = self.submit(frame, scale)
+        return future.result(timeout=timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._worker_loop, name='inference-engine', daemon=True)
+            self._worker.start()
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        max_batch = self.max_batch_size
+        while len(batch) < max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker_loop(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._run_batch(batch)
+            except Exception as exc:  # pragma: no cover - protecao do worker
+                logger.error('Erro inesperado no motor de inferencia: %s', exc)
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+
+    def _run_batch(self, batch):
+        backend = self.backend
+        if backend is None:
+            for request in batch:
+                request.future.set_result([])
+            return
+
+        started = time.monotonic()
+        if metrics.metrics_enabled():
+            for request in batch:
+                QUEUE_WAIT_SECONDS.observe(started - request.submitted_at)
+        try:
+            with BATCH_SECONDS.time(backend=backend.name):
+                results = backend.predict([request.frame for request in batch])
+        except Exception as exc:
+            self.errors_total += 1
+            INFERENCE_ERRORS.inc(backend=backend.name)
+            logger.error('Erro na inferencia em lote (%s frames): %s', len(batch), exc)
+            for request in batch:
+                request.future.set_exception(exc)
+            return
+
+        finished = time.monotonic()
+        self.batches_total += 1
+        self.frames_total += len(batch)
+        INFERENCE_FRAMES.inc(len(batch), backend=backend.name)
+        self._batch_sizes.append(len(batch))
+        self._latencies.append(finished - started)
+
+        for request, result in zip(batch, results):
+            request.future.set_result(self._to_detections(result, request.scale))
+
+    @staticmethod
+    def _to_detections(boxes, scale):
+        scale_x, scale_y = scale
+        return [
+            {
+                'bbox': (int(x1 * scale_x), int(y1 * scale_y), int(x2 * scale_x), int(y2 * scale_y)),
+                'confidence': float(confidence)
+            }
+            for x1, y1, x2, y2, confidence in boxes.tolist()
+        ]
+
+    def get_stats(self):
+        batch_sizes = list(self._batch_sizes)
+        latencies = list(self._latencies)
+        return {
+            'state': self.state,
+            'backend': self.backend_name,
+            'model': self.model_path,
+            'device': self.model_device,
+            'available': self.available,
+            'queue_depth': self._queue.qsize(),
+            'batches': self.batches_total,
+            'frames': self.frames_total,
+            'errors': self.errors_total,
+            'avg_batch_size': round(sum(batch_sizes) / len(batch_sizes), 2) if batch_sizes else 0.0,
+            'avg_batch_latency_ms': round(1000 * sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'p50_batch_latency_ms': percentile_ms(latencies, 50),
+            'p95_batch_latency_ms': percentile_ms(latencies, 95),
+            'max_batch_size': self.max_batch_size,
+            'max_wait': self.max_wait
+        }
+
+
+# Instancia global do motor de inferencia
+inference_engine = InferenceEngine()
+
+
+def get_inference_engine():
+    return inference_engine
+
+
+def _collect_metrics():
+    QUEUE_DEPTH.set(inference_engine._queue.qsize())
+
+
+metrics.register_collector(_collect_metrics)
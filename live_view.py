@@ -0,0 +1,153 @@
+"""
+Perfis de visualizacao ao vivo do ``/video_feed``.
+
+Cada pedido e reduzido a um ``ViewSpec`` (largura, qualidade JPEG, fps
+maximo e se pode usar o sub-stream). Pedidos com o mesmo ``ViewSpec``
+compartilham um unico ``FrameBroadcaster`` na camera: o frame e reduzido e
+codificado uma vez por perfil, nao por cliente. Parametros avulsos sao
+arredondados para que variacoes pequenas nao criem novos codificadores.
+
+O ``SubstreamReader`` le o sub-stream RTSP (resolucao menor) da camera so
+enquanto algum perfil que o usa tem clientes; a conexao passa pelo mesmo
+agendador de reconexao das cameras.
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+
+from config import CAMERA_DEFAULTS, LIVE_VIEWS
+from frame_slot import FrameSlot
+from reconnect_scheduler import get_reconnect_scheduler
+
+logger = logging.getLogger(__name__)
+
+ViewSpec = namedtuple('ViewSpec', ('width', 'quality', 'max_fps', 'substream'))
+
+# Resolucao e taxa originais, qualidade padrao do OpenCV
+NATIVE_VIEW = ViewSpec(0, 95, 0, False)
+
+WIDTH_STEP = 32
+QUALITY_STEP = 5
+
+
+def _as_int(value, default):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def resolve_view(profile=None, width=None, quality=None, max_fps=None):
+    """Combina o perfil nomeado com os parametros avulsos da URL."""
+    profiles = LIVE_VIEWS.get('profiles') or {}
+    name = profile or LIVE_VIEWS.get('default_profile', 'full')
+    base = profiles.get(name) or profiles.get(LIVE_VIEWS.get('default_profile', 'full')) or {}
+
+    width = _as_int(width, _as_int(base.get('width'), NATIVE_VIEW.width))
+    quality = _as_int(quality, _as_int(base.get('quality'), NATIVE_VIEW.quality))
+    max_fps = _as_int(max_fps, _as_int(base.get('max_fps'), NATIVE_VIEW.max_fps))
+
+    max_width = _as_int(LIVE_VIEWS.get('max_width'), 1920)
+    width = 0 if width <= 0 else min(max_width, max(WIDTH_STEP * 2, round(width / WIDTH_STEP) * WIDTH_STEP))
+    quality = min(95, max(10, round(quality / QUALITY_STEP) * QUALITY_STEP))
+    max_fps = min(_as_int(LIVE_VIEWS.get('max_fps'), 30), max(0, max_fps))
+    return ViewSpec(width, quality, max_fps, bool(base.get('substream')))
+
+
+class SubstreamReader:
+    def __init__(self, camera_id, url, wanted, on_frame, settings=None):
+        self.camera_id = f'{camera_id}/sub'
+        self.url = url
+        self.settings = settings or CAMERA_DEFAULTS
+        self._wanted = wanted
+        self._on_frame = on_frame
+
+        self.frame_slot = FrameSlot()
+        self.cap = None
+        self.running = False
+        self.connected = False
+        self.frames_read = 0
+        self._thread = None
+        self.reconnect_scheduler = get_reconnect_scheduler()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._read_loop, name=f'substream-{self.camera_id}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        self.reconnect_scheduler.cancel(self.camera_id)
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        self._thread = None
+        self._release()
+
+    def _create_capture(self):
+        open_timeout = int(float(self.settings.get('open_timeout', 5)) * 1000)
+        read_timeout = int(float(self.settings.get('read_timeout', 5)) * 1000)
+        cap = cv2.VideoCapture(
+            self.url,
+            cv2.CAP_ANY,
+            [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, open_timeout, cv2.CAP_PROP_READ_TIMEOUT_MSEC, read_timeout]
+        )
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _attach_capture(self, cap):
+        """Chamado pelo agendador quando a conexao abre."""
+        if not self.running or self.cap is not None or not self._wanted():
+            return False
+        self.cap = cap
+        return True
+
+    def _release(self):
+        cap, self.cap = self.cap, None
+        if cap is not None:
+            cap.release()
+        self.connected = False
+
+    def _read_loop(self):
+        while self.running:
+            if not self._wanted():
+                # Sem clientes nos perfis do sub-stream: nada de decodificar
+                if self.cap is not None:
+                    self.reconnect_scheduler.cancel(self.camera_id)
+                    self._release()
+                time.sleep(1.0)
+                continue
+
+            cap = self.cap
+            if cap is None or not cap.isOpened():
+                if cap is not None:
+                    self._release()
+                    self.reconnect_scheduler.mark_disconnected(self.camera_id, 'stream fechado')
+                self.reconnect_scheduler.request(self)
+                time.sleep(0.5)
+                continue
+
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                logger.warning('Sub-stream de %s sem frames; reconectando', self.camera_id)
+                self._release()
+                self.reconnect_scheduler.mark_disconnected(self.camera_id, 'sem frames')
+                continue
+
+            self.connected = True
+            self.frames_read += 1
+            self.frame_slot.publish(frame)
+            self._on_frame()
+
+    def get_stats(self):
+        return {
+            'url': self.url,
+            'connected': self.connected,
+            'frames': self.frames_read,
+            'connection': self.reconnect_scheduler.get_state(self.camera_id)
+        }
@@ -0,0 +1,246 @@
+"""
+Instrumentacao do pipeline exportada em ``/metrics`` (formato texto do
+Prometheus).
+
+Cada modulo declara seus contadores, medidores e histogramas no registro
+global e mede os pontos quentes (leitura da camera, movimento, YOLO,
+``imencode``, alertas, ``VideoWriter.write``). Com ``METRICS['enabled']``
+desligado, ``inc``/``observe`` retornam logo e ``time()`` devolve um
+contexto vazio compartilhado: nada e medido nem alocado.
+
+Valores que ja existem em outros objetos (viewers, fila do YOLO, estado
+da conexao) sao lidos so na hora da coleta, por funcoes registradas com
+``register_collector``.
+"""
+
+import bisect
+import logging
+import threading
+import time
+
+from config import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Segundos; cobre de leituras de frame (~1 ms) ate inferencias lentas em CPU
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def metrics_enabled():
+    return bool(METRICS.get('enabled'))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('histogram', 'key', 'started')
+
+    def __init__(self, histogram, key):
+        self.histogram = histogram
+        self.key = key
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram._observe(self.key, time.perf_counter() - self.started)
+        return False
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.label_names)
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not metrics_enabled():
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not metrics_enabled():
+            return
+        self._observe(self._key(labels), value)
+
+    def time(self, **labels):
+        """Contexto que mede o bloco em segundos (vazio se desligado)."""
+        if not metrics_enabled():
+            return _NULL_TIMER
+        return _Timer(self, self._key(labels))
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # contagem por faixa (+Inf no fim), soma, total
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, namespace='invis'):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def _get_or_create(self, cls, name, documentation, labels, **kwargs):
+        full_name = f'{self.namespace}_{name}' if self.namespace else name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, documentation, labels, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'Metrica {full_name} ja registrada como {metric.kind}')
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._get_or_create(Counter, name, documentation, labels)
+
+    def gauge(self, name, documentation, labels=()):
+        return self._get_or_create(Gauge, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=None):
+        return self._get_or_create(
+            Histogram, name, documentation, labels,
+            buckets=buckets or METRICS.get('buckets') or DEFAULT_BUCKETS
+        )
+
+    def register_collector(self, collector):
+        """``collector()`` e chamado a cada coleta para atualizar medidores."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = sorted(self._metrics.items())
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as exc:
+                logger.warning('Erro no coletor de metricas %s: %s', getattr(collector, '__name__', collector), exc)
+        lines = []
+        for _, metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Registro global das metricas
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry():
+    return _registry
+
+
+def counter(name, documentation, labels=()):
+    return _registry.counter(name, documentation, labels)
+
+
+def gauge(name, documentation, labels=()):
+    return _registry.gauge(name, documentation, labels)
+
+
+def histogram(name, documentation, labels=(), buckets=None):
+    return _registry.histogram(name, documentation, labels, buckets)
+
+
+def register_collector(collector):
+    _registry.register_collector(collector)
@@ -0,0 +1,184 @@
+"""
+Deteccao de movimento por camera.
+
+O frame e reduzido para uma largura de trabalho e convertido para tons de
+cinza antes da subtracao de fundo, e as mascaras de ROI/exclusao da camera
+sao aplicadas sobre o resultado. ``min_area`` continua expresso em pixels
+do frame original e e convertido para a escala de trabalho.
+
+Mascaras sao poligonos em coordenadas normalizadas (0 a 1), por exemplo::
+
+    "motion": {
+        "backend": "frame_diff",
+        "roi": [[[0.0, 0.4], [1.0, 0.4], [1.0, 1.0], [0.0, 1.0]]],
+        "exclude": [[[0.8, 0.0], [1.0, 0.0], [1.0, 0.2], [0.8, 0.2]]]
+    }
+"""
+
+import logging
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('mog2', 'frame_diff')
+
+
+def _normalize_polygons(value):
+    polygons = []
+    for polygon in value or []:
+        try:
+            points = [(float(x), float(y)) for x, y in polygon]
+        except (TypeError, ValueError):
+            logger.warning('Poligono de movimento invalido ignorado: %s', polygon)
+            continue
+        if len(points) >= 3:
+            polygons.append(points)
+    return polygons
+
+
+class MotionDetector:
+    def __init__(self, config, camera_config=None):
+        self._subtractor = None
+        self._previous = None
+        self._mask = None
+        self._mask_shape = None
+        self._signature = None
+
+        self.frames_processed = 0
+        self.total_time = 0.0
+        self.last_area = 0.0
+
+        self.configure(config, camera_config)
+
+    def configure(self, config, camera_config=None):
+        settings = dict(config or {})
+        settings.update(camera_config or {})
+
+        backend = settings.get('backend', 'mog2')
+        if backend not in BACKENDS:
+            logger.warning('Backend de movimento desconhecido "%s", usando mog2', backend)
+            backend = 'mog2'
+
+        self.enabled = settings.get('enabled', True)
+        self.backend = backend
+        self.min_area = float(settings.get('min_area', 500))
+        self.working_width = int(settings.get('working_width') or 0)
+        blur_kernel = int(settings.get('blur_kernel') or 0)
+        self.blur_kernel = blur_kernel | 1 if blur_kernel > 1 else 0
+        self.diff_threshold = int(settings.get('diff_threshold', 25))
+        self.roi = _normalize_polygons(settings.get('roi'))
+        self.exclude = _normalize_polygons(settings.get('exclude'))
+
+        signature = (
+            backend,
+            self.working_width,
+            settings.get('history', 500),
+            settings.get('var_threshold', 16),
+            settings.get('detect_shadows', True)
+        )
+        if signature != self._signature:
+            self._signature = signature
+            self._previous = None
+            self._subtractor = None
+            if backend == 'mog2':
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                    history=signature[2],
+                    varThreshold=signature[3],
+                    detectShadows=signature[4]
+                )
+        # Mascara e refeita no proximo frame com os poligonos atuais
+        self._mask_shape = None
+
+    def _working_scale(self, frame):
+        width = frame.shape[1]
+        if self.working_width and width > self.working_width:
+            return self.working_width / float(width)
+        return 1.0
+
+    def _build_mask(self, shape):
+        height, width = shape[:2]
+        if not self.roi and not self.exclude:
+            return None
+
+        size = np.array([width, height], dtype=np.float32)
+        if self.roi:
+            mask = np.zeros((height, width), dtype=np.uint8)
+            polygons = [np.round(np.array(p, dtype=np.float32) * size).astype(np.int32) for p in self.roi]
+            cv2.fillPoly(mask, polygons, 255)
+        else:
+            mask = np.full((height, width), 255, dtype=np.uint8)
+        if self.exclude:
+            polygons = [np.round(np.array(p, dtype=np.float32) * size).astype(np.int32) for p in self.exclude]
+            cv2.fillPoly(mask, polygons, 0)
+        return mask
+
+    def _prepare(self, frame, scale):
+        if scale < 1.0:
+            width = max(1, int(round(frame.shape[1] * scale)))
+            height = max(1, int(round(frame.shape[0] * scale)))
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self.blur_kernel > 1:
+            gray = cv2.GaussianBlur(gray, (self.blur_kernel, self.blur_kernel), 0)
+        return gray
+
+    def _foreground(self, gray):
+        if self.backend == 'frame_diff':
+            previous = self._previous
+            self._previous = gray
+            if previous is None or previous.shape != gray.shape:
+                return None
+            delta = cv2.absdiff(previous, gray)
+            _, fg_mask = cv2.threshold(delta, self.diff_threshold, 255, cv2.THRESH_BINARY)
+            return cv2.dilate(fg_mask, None, iterations=2)
+
+        fg_mask = self._subtractor.apply(gray)
+        # Sombras do MOG2 (valor 127) nao contam como movimento
+        _, fg_mask = cv2.threshold(fg_mask, 200, 255, cv2.THRESH_BINARY)
+        return fg_mask
+
+    def detect(self, frame):
+        """Retorna True se houver movimento acima de ``min_area`` no frame."""
+        if not self.enabled or frame is None:
+            return False
+
+        started = time.perf_counter()
+        scale = self._working_scale(frame)
+        gray = self._prepare(frame, scale)
+
+        if self._mask_shape != gray.shape:
+            self._mask = self._build_mask(gray.shape)
+            self._mask_shape = gray.shape
+
+        fg_mask = self._foreground(gray)
+        motion = False
+        largest = 0.0
+        if fg_mask is not None:
+            if self._mask is not None:
+                fg_mask = cv2.bitwise_and(fg_mask, self._mask)
+            contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            min_area = self.min_area * scale * scale
+            for contour in contours:
+                area = cv2.contourArea(contour)
+                if area > largest:
+                    largest = area
+                if area >= min_area:
+                    motion = True
+
+        self.last_area = largest / (scale * scale)
+        self.frames_processed += 1
+        self.total_time += time.perf_counter() - started
+        return motion
+
+    def get_stats(self):
+        return {
+            'backend': self.backend,
+            'working_width': self.working_width,
+            'masked': bool(self.roi or self.exclude),
+            'frames_processed': self.frames_processed,
+            'avg_ms': round(self.total_time / self.frames_processed * 1000, 2) if self.frames_processed else 0.0,
+            'last_area': round(self.last_area, 1)
+        }
@@ -0,0 +1,219 @@
+"""
+Agendador central de conexoes das cameras.
+
+As threads de captura nao abrem mais o ``cv2.VideoCapture`` nem dormem entre
+tentativas: elas pedem uma conexao e seguem publicando o placeholder. As
+aberturas rodam em paralelo num pool pequeno, com timeout de abertura e de
+leitura no proprio FFmpeg. Falhas seguidas aumentam o intervalo (backoff
+exponencial com jitter) e, depois de ``reconnect_attempts`` falhas, o
+circuito abre e a camera fica estacionada por ``circuit_park_seconds`` antes
+de uma nova tentativa.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import CAMERA_DEFAULTS
+from status_aggregator import notify_status_change
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CONNECT_ATTEMPTS = metrics.counter(
+    'camera_connect_attempts_total', 'Tentativas de (re)conexao por camera e resultado', ('camera', 'result')
+)
+
+
+class ConnectionState:
+    def __init__(self):
+        self.status = 'idle'
+        self.token = 0
+        self.failures = 0
+        self.attempts = 0
+        self.next_attempt = None
+        self.last_error = None
+        self.last_attempt = None
+        self.connected_at = None
+
+    def as_dict(self):
+        return {
+            'status': self.status,
+            'failures': self.failures,
+            'attempts': self.attempts,
+            'next_attempt': self.next_attempt,
+            'last_error': self.last_error,
+            'last_attempt': self.last_attempt,
+            'connected_at': self.connected_at
+        }
+
+
+class ReconnectScheduler:
+    def __init__(self, settings=None):
+        self.settings = settings or CAMERA_DEFAULTS
+        self._cond = threading.Condition()
+        self._states = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._executor = None
+        self._thread = None
+
+    @property
+    def base_delay(self):
+        return max(0.1, float(self.settings.get('reconnect_delay', 2)))
+
+    @property
+    def max_delay(self):
+        return float(self.settings.get('reconnect_max_delay', 60))
+
+    @property
+    def circuit_threshold(self):
+        return max(1, int(self.settings.get('reconnect_attempts', 5)))
+
+    @property
+    def park_seconds(self):
+        return float(self.settings.get('circuit_park_seconds', 300))
+
+    def _ensure_running(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        workers = max(1, int(self.settings.get('connect_workers', 8)))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='camera-connect')
+        self._thread = threading.Thread(target=self._run, name='reconnect-scheduler', daemon=True)
+        self._thread.start()
+
+    def request(self, stream):
+        """Pede uma conexao para ``stream``; ignora se ja houver uma pendente."""
+        with self._cond:
+            self._ensure_running()
+            state = self._states.setdefault(stream.camera_id, ConnectionState())
+            if state.status in ('scheduled', 'connecting', 'backoff', 'parked'):
+                return
+            self._schedule(stream, state, 0.0, 'scheduled')
+
+    def reset(self, stream):
+        """Fecha o circuito e tenta conectar imediatamente."""
+        with self._cond:
+            self._ensure_running()
+            state = self._states.setdefault(stream.camera_id, ConnectionState())
+            state.token += 1
+            state.failures = 0
+            self._schedule(stream, state, 0.0, 'scheduled')
+
+    def cancel(self, camera_id):
+        with self._cond:
+            state = self._states.pop(camera_id, None)
+            if state is not None:
+                # Tentativas em andamento com o token antigo sao descartadas
+                state.token += 1
+
+    def mark_disconnected(self, camera_id, reason=None):
+        with self._cond:
+            state = self._states.get(camera_id)
+            if state is not None and state.status == 'connected':
+                state.status = 'idle'
+                state.last_error = reason
+                notify_status_change()
+
+    def _schedule(self, stream, state, delay, status):
+        if state.status != status:
+            notify_status_change()
+        state.status = status
+        state.next_attempt = time.time() + delay
+        heapq.heappush(self._heap, (state.next_attempt, next(self._counter), stream, state.token))
+        self._cond.notify()
+
+    def _backoff(self, failures):
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, failures - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.time():
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._cond.wait(timeout=timeout)
+                _, _, stream, token = heapq.heappop(self._heap)
+                state = self._states.get(stream.camera_id)
+                if state is None or state.token != token:
+                    continue
+                state.status = 'connecting'
+                state.attempts += 1
+                state.last_attempt = time.time()
+                state.next_attempt = None
+            self._executor.submit(self._connect, stream, state, token)
+
+    def _connect(self, stream, state, token):
+        cap = None
+        error = None
+        try:
+            cap = stream._create_capture()
+            if not cap.isOpened():
+                error = 'falha ao abrir o stream'
+        except Exception as exc:
+            error = str(exc)
+
+        with self._cond:
+            current = self._states.get(stream.camera_id) is state and state.token == token
+            if current and error is None and stream._attach_capture(cap):
+                state.status = 'connected'
+                state.failures = 0
+                state.last_error = None
+                state.connected_at = time.time()
+                CONNECT_ATTEMPTS.inc(camera=stream.camera_id, result='success')
+                notify_status_change()
+                logger.info('Conexao RTSP %s estabelecida', stream.camera_id)
+                return
+
+            if cap is not None:
+                cap.release()
+            if not current:
+                return
+
+            state.failures += 1
+            state.last_error = error or 'stream parado'
+            CONNECT_ATTEMPTS.inc(camera=stream.camera_id, result='failure')
+            if state.failures >= self.circuit_threshold:
+                delay = self.park_seconds
+                self._schedule(stream, state, delay, 'parked')
+                if state.failures == self.circuit_threshold:
+                    logger.error(
+                        'Camera %s estacionada apos %s falhas seguidas; nova tentativa em %.0fs',
+                        stream.camera_id, state.failures, delay
+                    )
+            else:
+                delay = self._backoff(state.failures)
+                self._schedule(stream, state, delay, 'backoff')
+                logger.warning(
+                    'Falha ao conectar camera %s (%s); nova tentativa em %.1fs',
+                    stream.camera_id, state.last_error, delay
+                )
+
+    def get_state(self, camera_id):
+        with self._cond:
+            state = self._states.get(camera_id)
+            return state.as_dict() if state else ConnectionState().as_dict()
+
+    def get_stats(self):
+        with self._cond:
+            counts = {}
+            for state in self._states.values():
+                counts[state.status] = counts.get(state.status, 0) + 1
+            return {'cameras': len(self._states), 'by_status': counts, 'pending': len(self._heap)}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_reconnect_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = ReconnectScheduler()
+    return _scheduler
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Harness local do modo de gravação passthrough.
+
+Usa um arquivo de vídeo como se fosse a câmera (ou gera um clipe H.264
+sintético com o próprio ffmpeg), grava com o PassthroughRecorder em uma
+pasta temporária e confere se os segmentos mantêm o codec original.
+
+Uso:
+    python record_harness.py [arquivo.mp4] --seconds 20 --segment 5 --container mkv
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+
+from config import RECORDING
+
+
+def fourcc_name(capture):
+    code = int(capture.get(cv2.CAP_PROP_FOURCC))
+    return ''.join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00')
+
+
+def generate_sample(ffmpeg_path, target, seconds):
+    command = [
+        ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc=size=640x480:rate=20:duration={seconds}',
+        '-c:v', 'libx264', '-g', '20', '-pix_fmt', 'yuv420p', target
+    ]
+    subprocess.run(command, check=True)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Harness do modo de gravação passthrough')
+    parser.add_argument('source', nargs='?', help='arquivo de vídeo usado como câmera')
+    parser.add_argument('--seconds', type=int, default=12, help='tempo de gravação')
+    parser.add_argument('--segment', type=int, default=4, help='duração de cada segmento')
+    parser.add_argument('--container', choices=['mp4', 'fmp4', 'mkv'], default='mp4')
+    parser.add_argument('--ffmpeg', default=RECORDING.get('ffmpeg_path') or 'ffmpeg')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='passthrough_')
+    source = args.source or generate_sample(args.ffmpeg, os.path.join(workdir, 'sample.mp4'), args.seconds + 5)
+
+    # A pasta de gravações é lida de RECORDING em tempo de execução
+    RECORDING['storage_path'] = os.path.join(workdir, 'recordings')
+    from recorder import PassthroughRecorder
+
+    config = dict(
+        RECORDING,
+        enabled=True,
+        mode='passthrough',
+        segment_seconds=args.segment,
+        container=args.container,
+        ffmpeg_path=args.ffmpeg
+    )
+    recorder = PassthroughRecorder('harness', source, config)
+
+    source_capture = cv2.VideoCapture(source)
+    source_codec = fourcc_name(source_capture)
+    source_capture.release()
+
+    print(f'Fonte: {source} ({source_codec})')
+    print(f'Gravando {args.seconds}s em {RECORDING["storage_path"]}...')
+    if not recorder.open():
+        print('Não foi possível iniciar o ffmpeg')
+        return 1
+
+    time.sleep(args.seconds)
+    recorder.close()
+
+    segments = []
+    for root, _, files in os.walk(RECORDING['storage_path']):
+        if '.staging' in root:
+            continue
+        for name in sorted(files):
+            segments.append(os.path.join(root, name))
+
+    ok = bool(segments)
+    for path in segments:
+        capture = cv2.VideoCapture(path)
+        codec = fourcc_name(capture)
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+        match = codec.lower() in (source_codec.lower(), 'avc1', 'h264', 'hevc', 'hvc1')
+        ok = ok and match
+        print(f'  {os.path.basename(path)}: codec={codec} frames={frames} '
+              f'tamanho={os.path.getsize(path) / 1024:.1f} KB {"OK" if match else "CODEC DIFERENTE"}')
+
+    print(f'Segmentos: {len(segments)} | reinícios do ffmpeg: {recorder.restarts}')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
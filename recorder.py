@@ -0,0 +1,641 @@
+"""
+Gravadores por camera.
+
+``VideoRecorder`` (modo ``reencode``): os frames chegam do ``_capture_loop``
+na taxa de gravacao e sao escritos em um buffer circular NumPy
+pre-alocado. Quando um evento dispara a gravacao, uma thread de escrita
+consome o pre-roll e os frames ao vivo do buffer e gera o clipe sem
+bloquear a captura.
+
+``PassthroughRecorder`` (modo ``passthrough``): o ffmpeg copia os pacotes
+H.264/H.265 originais da camera para segmentos MP4/MKV alinhados em
+keyframes, sem decodificar nem recodificar.
+"""
+
+import csv
+import functools
+import logging
+import re
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from config import RECORDING
+import metrics
+from recording_catalog import get_recording_catalog, probe_video
+from recording_utils import (
+    ensure_recording_directory_exists, generate_recording_filename, get_recordings_base_path,
+    unique_recording_path
+)
+
+logger = logging.getLogger(__name__)
+
+WRITE_SECONDS = metrics.histogram('recorder_write_seconds', 'Tempo do VideoWriter.write por camera', ('camera',))
+
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_major_version(ffmpeg_path):
+    """Versao principal do ffmpeg (0 se nao der para descobrir)."""
+    try:
+        output = subprocess.run(
+            [ffmpeg_path, '-hide_banner', '-version'], capture_output=True, timeout=5
+        ).stdout.decode('utf-8', 'replace')
+    except (OSError, subprocess.SubprocessError):
+        return 0
+    match = re.search(r'version n?(\d+)\.', output)
+    return int(match.group(1)) if match else 0
+
+
+class VideoRecorder:
+    mode = 'reencode'
+
+    def __init__(self, camera_id='camera', config_source=None):
+        self.camera_id = camera_id
+        self.config = config_source or RECORDING
+        self.recording = False
+        self.recording_start_time = None
+        self.filename = None
+
+        self._cond = threading.Condition()
+        self._ring = None
+        self._written = 0
+        self._next_sample = 0.0
+        self._stop_at = 0.0
+        self._writer_thread = None
+        # Custo medio (s) de um VideoWriter.write, medido nas gravacoes
+        self._write_cost = None
+
+        self.frames_dropped = 0
+        self._ensure_storage_path()
+
+    def _ensure_storage_path(self):
+        os.makedirs(self.storage_path, exist_ok=True)
+
+    def refresh_from_config(self, config_source=None):
+        self.config = config_source or RECORDING
+        self._ensure_storage_path()
+        if not self.enabled:
+            self.stop_recording()
+            if not self.recording:
+                self._ring = None
+
+    @property
+    def enabled(self):
+        return self.config.get('enabled', False)
+
+    @property
+    def record_on_person(self):
+        return self.config.get('record_on_person_detection', True)
+
+    @property
+    def duration(self):
+        return self.config.get('record_duration', 30)
+
+    @property
+    def pre_roll(self):
+        return self.config.get('pre_roll_seconds', 5)
+
+    @property
+    def codec(self):
+        return self.config.get('video_codec', 'mp4v')
+
+    @property
+    def fps(self):
+        return self.config.get('fps', 20)
+
+    @property
+    def resolution(self):
+        width, height = self.config.get('resolution', (640, 480))
+        return int(width), int(height)
+
+    @property
+    def storage_path(self):
+        return self.config.get('storage_path', 'recordings/')
+
+    @property
+    def pre_roll_frames(self):
+        return max(0, int(self.fps * self.pre_roll))
+
+    @property
+    def capacity(self):
+        # Folga para a thread de escrita drenar o pre-roll enquanto chegam
+        # frames novos: no minimo ~1s, ou o que o custo medido do write exige
+        base = max(int(self.fps), 10)
+        slack = base
+        if self._write_cost:
+            drain_frames = self.pre_roll_frames * self._write_cost * self.fps
+            slack = max(base, int(drain_frames * 1.5) + 1)
+        return self.pre_roll_frames + min(slack, self.pre_roll_frames * 2 + base)
+
+    def _ensure_ring(self):
+        width, height = self.resolution
+        capacity = self.capacity
+        ring = self._ring
+        # Cresce quando a folga medida aumenta; nao encolhe para nao perder o pre-roll
+        if ring is None or ring.shape[1:] != (height, width, 3) or len(ring) < capacity:
+            if self.recording:
+                return ring
+            ring = np.empty((capacity, height, width, 3), dtype=np.uint8)
+            self._ring = ring
+            with self._cond:
+                self._written = 0
+        return ring
+
+    def open(self):
+        pass
+
+    def close(self):
+        self.stop_recording()
+
+    def push_frame(self, frame, now=None):
+        if not self.enabled:
+            return
+
+        now = now or time.monotonic()
+        if now < self._next_sample:
+            return
+        interval = 1.0 / max(self.fps, 1)
+        if now - self._next_sample > interval:
+            self._next_sample = now
+        self._next_sample += interval
+
+        ring = self._ensure_ring()
+        slot = ring[self._written % len(ring)]
+        if frame.shape[1::-1] == slot.shape[1::-1]:
+            np.copyto(slot, frame)
+        else:
+            cv2.resize(frame, (slot.shape[1], slot.shape[0]), dst=slot)
+
+        with self._cond:
+            self._written += 1
+            if self.recording:
+                self._cond.notify_all()
+
+    def start_recording(self, trigger_reason='Person detection'):
+        if not self.enabled:
+            return False
+
+        with self._cond:
+            if self.recording:
+                # Evento durante a gravacao estende o pos-evento
+                self._stop_at = time.monotonic() + self.duration
+                return True
+            if self._ring is None:
+                return False
+
+            start_index = max(0, self._written - min(self.pre_roll_frames, len(self._ring) - 1))
+            self._stop_at = time.monotonic() + self.duration
+            self.recording = True
+            # O clipe comeca no primeiro frame do pre-roll
+            self.recording_start_time = time.time() - (self._written - start_index) / max(self.fps, 1)
+
+        self._writer_thread = threading.Thread(
+            target=self._writer_loop,
+            args=(start_index, trigger_reason),
+            name=f'recorder-{self.camera_id}',
+            daemon=True
+        )
+        self._writer_thread.start()
+        return True
+
+    def stop_recording(self):
+        with self._cond:
+            if not self.recording:
+                return
+            self._stop_at = time.monotonic()
+            self._cond.notify_all()
+
+    def _open_writer(self):
+        recording_dir = ensure_recording_directory_exists()
+        if not recording_dir:
+            logger.error('Could not prepare recordings directory')
+            return None, None
+
+        # Dois clipes no mesmo segundo (pos-roll curto) nao se sobrescrevem
+        filename = generate_recording_filename(camera_id=self.camera_id)
+        full_path = unique_recording_path(recording_dir, filename)
+        fourcc = cv2.VideoWriter_fourcc(*self.codec)
+        writer = cv2.VideoWriter(full_path, fourcc, self.fps, self.resolution)
+        if not writer.isOpened():
+            logger.error('Could not open VideoWriter')
+            return None, None
+        return writer, full_path
+
+    def _writer_loop(self, read_pos, trigger_reason):
+        writer = None
+        try:
+            writer, full_path = self._open_writer()
+            if writer is None:
+                return
+
+            self.filename = full_path
+            logger.info(f'Recording started: {full_path} ({trigger_reason})')
+            ring = self._ring
+            capacity = len(ring)
+            frame = np.empty_like(ring[0])
+
+            while True:
+                with self._cond:
+                    while self._written <= read_pos and time.monotonic() < self._stop_at:
+                        self._cond.wait(timeout=0.5)
+                    available = self._written
+                    finished = time.monotonic() >= self._stop_at
+
+                while read_pos < available:
+                    # O push_frame grava o slot do indice _written fora do lock:
+                    # o slot de read_pos so e seguro enquanto _written - read_pos < capacity,
+                    # antes e depois da copia (senao a copia pode estar rasgada)
+                    lag = self._written - read_pos
+                    if lag < capacity:
+                        np.copyto(frame, ring[read_pos % capacity])
+                        lag = self._written - read_pos
+                    if lag >= capacity:
+                        skipped = self._written - (capacity - 1) - read_pos
+                        self.frames_dropped += max(skipped, 1)
+                        read_pos += max(skipped, 1)
+                        continue
+
+                    started = time.perf_counter()
+                    with WRITE_SECONDS.time(camera=self.camera_id):
+                        writer.write(frame)
+                    cost = time.perf_counter() - started
+                    self._write_cost = cost if self._write_cost is None else self._write_cost * 0.9 + cost * 0.1
+                    read_pos += 1
+
+                if finished:
+                    break
+
+            elapsed_time = time.time() - self.recording_start_time
+            logger.info(f'Recording finished: {full_path} ({elapsed_time:.1f}s)')
+        except Exception as e:
+            logger.error(f'Error recording camera {self.camera_id}: {e}')
+        finally:
+            if writer is not None:
+                writer.release()
+                self._catalog_clip(trigger_reason)
+            with self._cond:
+                self.recording = False
+
+    def _catalog_clip(self, trigger_reason):
+        try:
+            get_recording_catalog().add_recording(
+                self.filename,
+                camera_id=self.camera_id,
+                start_ts=self.recording_start_time,
+                end_ts=time.time(),
+                trigger=trigger_reason,
+                codec=self.codec
+            )
+        except Exception as e:
+            logger.error(f'Error cataloging recording {self.filename}: {e}')
+
+    def get_stats(self):
+        return {
+            'mode': self.mode,
+            'recording': self.recording,
+            'filename': self.filename,
+            'frames_dropped': self.frames_dropped
+        }
+
+
+class PassthroughRecorder:
+    mode = 'passthrough'
+
+    def __init__(self, camera_id='camera', source_url=None, config_source=None):
+        self.camera_id = camera_id
+        self.source_url = source_url
+        self.config = config_source or RECORDING
+        self.filename = None
+        self.last_event_time = None
+        self.segments_finalized = 0
+        self.restarts = 0
+        self.stalls = 0
+        self._last_progress = 0.0
+
+        self._process = None
+        self._monitor = None
+        self._stderr_reader = None
+        self._stderr_tail = deque(maxlen=20)
+        self._active = False
+        self._list_offset = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.config.get('enabled', False)
+
+    @property
+    def record_on_person(self):
+        return self.config.get('record_on_person_detection', True)
+
+    @property
+    def segment_seconds(self):
+        return max(1, int(self.config.get('segment_seconds', 60)))
+
+    @property
+    def container(self):
+        container = str(self.config.get('container', 'mp4')).lower()
+        return container if container in ('mp4', 'fmp4', 'mkv') else 'mp4'
+
+    @property
+    def extension(self):
+        # fMP4 continua sendo .mp4 para o navegador
+        return 'mkv' if self.container == 'mkv' else 'mp4'
+
+    @property
+    def ffmpeg_path(self):
+        return self.config.get('ffmpeg_path') or 'ffmpeg'
+
+    @property
+    def input_timeout(self):
+        return max(1, int(self.config.get('input_timeout', 10)))
+
+    @property
+    def stall_timeout(self):
+        # Sem segmento novo por este tempo o ffmpeg e considerado travado
+        return self.segment_seconds * 2 + self.input_timeout
+
+    @property
+    def storage_path(self):
+        return self.config.get('storage_path', 'recordings/')
+
+    @property
+    def staging_dir(self):
+        return os.path.join(get_recordings_base_path(), '.staging', str(self.camera_id))
+
+    @property
+    def segment_list_path(self):
+        return os.path.join(self.staging_dir, 'segments.csv')
+
+    @property
+    def recording(self):
+        process = self._process
+        return process is not None and process.poll() is None
+
+    def refresh_from_config(self, config_source=None):
+        self.config = config_source or RECORDING
+        if not self.enabled:
+            self.close()
+
+    def open(self):
+        if not self.enabled or not self.source_url:
+            return False
+        if shutil.which(self.ffmpeg_path) is None and not os.path.isfile(self.ffmpeg_path):
+            logger.error(f'ffmpeg not found ({self.ffmpeg_path}); passthrough recording disabled')
+            return False
+
+        with self._lock:
+            if self._active:
+                return True
+            self._active = True
+            os.makedirs(self.staging_dir, exist_ok=True)
+            self._monitor = threading.Thread(
+                target=self._monitor_loop,
+                name=f'passthrough-{self.camera_id}',
+                daemon=True
+            )
+            self._monitor.start()
+        return True
+
+    def close(self):
+        with self._lock:
+            if not self._active:
+                return
+            self._active = False
+            monitor = self._monitor
+            self._monitor = None
+        if monitor and monitor.is_alive():
+            monitor.join(timeout=10)
+
+    def start_recording(self, trigger_reason='Person detection'):
+        # A gravacao e continua; o evento apenas fica registrado
+        if not self.enabled:
+            return False
+        self.last_event_time = time.time()
+        logger.info(f'Passthrough event on {self.camera_id}: {trigger_reason}')
+        return self.recording
+
+    def stop_recording(self):
+        pass
+
+    def push_frame(self, frame, now=None):
+        pass
+
+    def build_command(self):
+        output_pattern = os.path.join(self.staging_dir, f'%Y%m%d_%H%M%S.{self.extension}')
+        command = [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin']
+        # Timeouts de socket em microssegundos: camera travada faz o ffmpeg sair
+        # com erro em vez de bloquear para sempre. No ffmpeg 4 o -timeout do
+        # RTSP e o de escuta; o de socket ainda se chama -stimeout.
+        timeout_us = str(self.input_timeout * 1000000)
+        if self.source_url.startswith('rtsp://'):
+            timeout_option = '-stimeout' if 0 < ffmpeg_major_version(self.ffmpeg_path) < 5 else '-timeout'
+            command += ['-rtsp_transport', 'tcp', timeout_option, timeout_us]
+        elif os.path.isfile(self.source_url):
+            command += ['-re']
+        else:
+            command += ['-rw_timeout', timeout_us]
+        command += [
+            '-i', self.source_url,
+            '-map', '0:v:0',
+            '-an',
+            '-c', 'copy',
+            '-f', 'segment',
+            '-segment_time', str(self.segment_seconds),
+            '-reset_timestamps', '1',
+            '-strftime', '1',
+            '-segment_list', self.segment_list_path,
+            '-segment_list_type', 'csv',
+        ]
+        if self.container == 'mp4':
+            command += ['-segment_format', 'mp4', '-segment_format_options', 'movflags=+faststart']
+        elif self.container == 'fmp4':
+            # Fragmentos a cada keyframe, sem indice no final: um segmento
+            # interrompido (queda do ffmpeg) continua legivel ate o ultimo
+            # fragmento, e o navegador comeca a tocar sem baixar o indice
+            command += [
+                '-segment_format', 'mp4',
+                '-segment_format_options', 'movflags=+frag_keyframe+empty_moov+default_base_moof'
+            ]
+        else:
+            command += ['-segment_format', 'matroska']
+        command.append(output_pattern)
+        return command
+
+    def _start_process(self):
+        self._list_offset = 0
+        try:
+            os.remove(self.segment_list_path)
+        except OSError:
+            pass
+        command = self.build_command()
+        logger.info(f'Starting passthrough recording for {self.camera_id}')
+        self._last_progress = time.monotonic()
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        # O pipe precisa ser lido o tempo todo: avisos de RTSP/DTS enchem o
+        # buffer e o ffmpeg trava sem sair
+        self._stderr_tail.clear()
+        self._stderr_reader = threading.Thread(
+            target=self._drain_stderr,
+            args=(self._process,),
+            name=f'passthrough-stderr-{self.camera_id}',
+            daemon=True
+        )
+        self._stderr_reader.start()
+
+    def _drain_stderr(self, process):
+        for line in iter(process.stderr.readline, b''):
+            self._stderr_tail.append(line.decode('utf-8', 'replace').rstrip())
+        process.stderr.close()
+
+    def _stop_process(self):
+        process = self._process
+        if process is None:
+            return
+        if process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        self._process = None
+
+    def _monitor_loop(self):
+        backoff = 1.0
+        try:
+            while self._active:
+                process = self._process
+                if process is None or process.poll() is not None:
+                    if process is not None:
+                        if self._stderr_reader is not None:
+                            self._stderr_reader.join(timeout=2)
+                        error = ' | '.join(self._stderr_tail)
+                        logger.warning(f'ffmpeg for {self.camera_id} exited ({process.returncode}): {error[-300:]}')
+                        self._collect_segments()
+                        self.restarts += 1
+                        time.sleep(backoff)
+                        backoff = min(backoff * 2, 60)
+                        if not self._active:
+                            break
+                    try:
+                        self._start_process()
+                    except Exception as e:
+                        logger.error(f'Error starting ffmpeg for {self.camera_id}: {e}')
+                        self._process = None
+                        time.sleep(backoff)
+                        continue
+                elif self._collect_segments():
+                    backoff = 1.0
+                    self._last_progress = time.monotonic()
+                elif time.monotonic() - self._last_progress > self.stall_timeout:
+                    # Vivo mas sem fechar segmentos (stream parado sem erro):
+                    # encerra e deixa o ramo acima reiniciar com backoff
+                    self.stalls += 1
+                    logger.warning(f'ffmpeg for {self.camera_id} wrote no segment in {self.stall_timeout}s; restarting')
+                    self._last_progress = time.monotonic()
+                    process.terminate()
+                    try:
+                        process.wait(timeout=5)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                time.sleep(1)
+        finally:
+            self._stop_process()
+            self._collect_segments()
+
+    def _collect_segments(self):
+        try:
+            with open(self.segment_list_path, newline='', encoding='utf-8') as handle:
+                handle.seek(self._list_offset)
+                data = handle.read()
+        except OSError:
+            return 0
+
+        # Apenas linhas completas; a ultima pode estar sendo escrita
+        complete = data[:data.rfind('\n') + 1]
+        self._list_offset += len(complete.encode('utf-8'))
+
+        finalized = 0
+        for row in csv.reader(complete.splitlines()):
+            if not row:
+                continue
+            try:
+                duration = float(row[2]) - float(row[1])
+            except (IndexError, ValueError):
+                duration = None
+            if self._finalize_segment(row[0], duration):
+                finalized += 1
+        return finalized
+
+    def _finalize_segment(self, segment_name, duration=None):
+        staged_path = os.path.join(self.staging_dir, os.path.basename(segment_name))
+        if not os.path.exists(staged_path):
+            return None
+
+        stem, extension = os.path.splitext(os.path.basename(staged_path))
+        try:
+            started = datetime.strptime(stem, '%Y%m%d_%H%M%S')
+        except ValueError:
+            started = datetime.now()
+
+        recording_dir = ensure_recording_directory_exists(started)
+        if not recording_dir:
+            return None
+
+        filename = generate_recording_filename(started, camera_id=self.camera_id, extension=extension)
+        final_path = unique_recording_path(recording_dir, filename)
+
+        try:
+            shutil.move(staged_path, final_path)
+        except OSError as e:
+            logger.error(f'Error moving segment {staged_path}: {e}')
+            return None
+
+        self.filename = final_path
+        self.segments_finalized += 1
+        logger.info(f'Passthrough segment saved: {final_path}')
+
+        _, codec = probe_video(final_path)
+        try:
+            get_recording_catalog().add_recording(
+                final_path,
+                camera_id=self.camera_id,
+                start_ts=started.timestamp(),
+                duration=duration,
+                trigger='continuous',
+                codec=codec
+            )
+        except Exception as e:
+            logger.error(f'Error cataloging segment {final_path}: {e}')
+        return final_path
+
+    def get_stats(self):
+        return {
+            'mode': self.mode,
+            'recording': self.recording,
+            'filename': self.filename,
+            'segments': self.segments_finalized,
+            'restarts': self.restarts,
+            'stalls': self.stalls,
+            'last_event_time': self.last_event_time
+        }
+
+
+def create_recorder(camera_id, source_url=None, config_source=None):
+    config = config_source or RECORDING
+    if config.get('mode', 'reencode') == 'passthrough':
+        return PassthroughRecorder(camera_id, source_url, config)
+    return VideoRecorder(camera_id, config)
@@ -0,0 +1,317 @@
+"""
+Catálogo indexado de gravações (SQLite).
+
+O gravador registra cada clipe quando ele é finalizado, e as consultas da
+API viram buscas indexadas em vez de percorrer ``recordings/ano/mes/dia``
+e chamar ``os.stat`` em todos os arquivos a cada requisição.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from config import RECORDING
+from recording_utils import (
+    RECORDING_EXTENSIONS, format_file_size, get_recordings_base_path, parse_recording_filename
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    camera_id TEXT,
+    year TEXT NOT NULL,
+    month TEXT NOT NULL,
+    day TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL,
+    duration REAL,
+    size INTEGER NOT NULL DEFAULT 0,
+    trigger TEXT,
+    codec TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_date ON recordings (year, month, day, start_ts);
+CREATE INDEX IF NOT EXISTS idx_recordings_camera ON recordings (camera_id, start_ts);
+CREATE INDEX IF NOT EXISTS idx_recordings_start ON recordings (start_ts);
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# FOURCCs de H.264 que os navegadores tocam num <video> (mp4v/XVID nao tocam)
+BROWSER_CODECS = {'avc1', 'avc3', 'h264', 'x264'}
+
+
+def browser_playable(filename, codec):
+    """True se o player do navegador consegue tocar a gravacao (MP4 com H.264)."""
+    return filename.lower().endswith('.mp4') and (codec or '').lower() in BROWSER_CODECS
+
+
+def probe_video(full_path):
+    """Retorna (duração, codec) lendo apenas o cabeçalho do arquivo."""
+    try:
+        import cv2
+
+        capture = cv2.VideoCapture(full_path)
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 0
+            frames = capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+            code = int(capture.get(cv2.CAP_PROP_FOURCC))
+        finally:
+            capture.release()
+        codec = ''.join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00') if code > 0 else None
+        duration = frames / fps if fps > 0 else None
+        return duration, codec
+    except Exception:
+        return None, None
+
+
+class RecordingCatalog:
+    def __init__(self, db_path=None, base_path=None):
+        self.base_path = base_path or get_recordings_base_path()
+        self.db_path = db_path or RECORDING.get('catalog_path') or os.path.join(self.base_path, 'catalog.sqlite3')
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+        self._listeners = []
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def _relative_path(self, full_path):
+        return os.path.relpath(full_path, self.base_path).replace(os.sep, '/')
+
+    def add_recording(self, full_path, camera_id=None, start_ts=None, end_ts=None,
+                      duration=None, trigger=None, codec=None):
+        try:
+            stat = os.stat(full_path)
+        except OSError as e:
+            logger.error(f"Gravação não encontrada para catalogar {full_path}: {e}")
+            return None
+
+        relative = self._relative_path(full_path)
+        parts = relative.split('/')
+        if len(parts) != 4:
+            logger.warning(f"Gravação fora da estrutura ano/mes/dia ignorada: {relative}")
+            return None
+        year, month, day, filename = parts
+
+        parsed = parse_recording_filename(filename)
+        if start_ts is None and parsed:
+            # Nomes antigos nao tem os segundos
+            for pattern in ('%d/%m/%y %H:%M:%S', '%d/%m/%y %H:%M'):
+                try:
+                    start_ts = datetime.strptime(parsed['datetime_str'], pattern).timestamp()
+                    break
+                except ValueError:
+                    continue
+        if start_ts is None:
+            start_ts = stat.st_mtime - duration if duration else stat.st_mtime
+        if end_ts is None and duration is not None:
+            end_ts = start_ts + duration
+        if duration is None and end_ts is not None:
+            duration = max(0.0, end_ts - start_ts)
+        if camera_id is None and parsed:
+            camera_id = parsed.get('camera_id')
+
+        row = (relative, filename, camera_id, year, month, day, start_ts, end_ts,
+               duration, stat.st_size, trigger, codec)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO recordings '
+                '(path, filename, camera_id, year, month, day, start_ts, end_ts, duration, size, trigger, codec) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                row
+            )
+            self._conn.commit()
+
+        entry = self._row_to_entry(dict(zip(
+            ('path', 'filename', 'camera_id', 'year', 'month', 'day', 'start_ts', 'end_ts',
+             'duration', 'size', 'trigger', 'codec'),
+            row
+        )))
+        for callback in list(self._listeners):
+            try:
+                callback(entry)
+            except Exception as e:
+                logger.error(f"Erro ao notificar catálogo: {e}")
+        return entry
+
+    def remove_recording(self, relative_path):
+        with self._lock:
+            cursor = self._conn.execute('DELETE FROM recordings WHERE path = ?', (relative_path,))
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM catalog_meta WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?)', (key, str(value)))
+            self._conn.commit()
+
+    def reconcile(self):
+        """
+        Varredura única do disco: importa arquivos que ainda não estão no
+        catálogo e remove entradas cujo arquivo não existe mais.
+        """
+        started = time.time()
+        with self._lock:
+            known = {row['path'] for row in self._conn.execute('SELECT path FROM recordings')}
+
+        seen = set()
+        imported = 0
+        if os.path.exists(self.base_path):
+            for root, dirs, files in os.walk(self.base_path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                for filename in sorted(files):
+                    if not filename.endswith(RECORDING_EXTENSIONS):
+                        continue
+                    full_path = os.path.join(root, filename)
+                    relative = self._relative_path(full_path)
+                    seen.add(relative)
+                    if relative in known:
+                        continue
+                    duration, codec = probe_video(full_path)
+                    if self.add_recording(full_path, duration=duration, trigger='import', codec=codec):
+                        imported += 1
+
+        removed = 0
+        for relative in known - seen:
+            if self.remove_recording(relative):
+                removed += 1
+
+        self.set_meta('reconciled_at', time.time())
+        logger.info(
+            f"Catálogo reconciliado: {imported} importadas, {removed} removidas "
+            f"({time.time() - started:.2f}s)"
+        )
+        return {'imported': imported, 'removed': removed}
+
+    @staticmethod
+    def _filters(year=None, month=None, day=None, camera_id=None, start=None, end=None):
+        clauses = []
+        params = []
+        for column, value in (('year', year), ('month', month), ('day', day), ('camera_id', camera_id)):
+            if value:
+                clauses.append(f'{column} = ?')
+                params.append(str(value))
+        if start is not None:
+            clauses.append('start_ts >= ?')
+            params.append(float(start))
+        if end is not None:
+            clauses.append('start_ts < ?')
+            params.append(float(end))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
+
+    def _group(self, columns, **filters):
+        where, params = self._filters(**filters)
+        select = ', '.join(columns)
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {select}, COUNT(*) AS video_count, SUM(size) AS total_size '
+                f'FROM recordings{where} GROUP BY {select} ORDER BY {select}',
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_years(self, camera_id=None):
+        return [
+            dict(row, type='year', path=row['year'])
+            for row in self._group(['year'], camera_id=camera_id)
+        ]
+
+    def list_months(self, year, camera_id=None):
+        return [
+            dict(row, type='month', path=f"{row['year']}/{row['month']}")
+            for row in self._group(['year', 'month'], year=year, camera_id=camera_id)
+        ]
+
+    def list_days(self, year, month, camera_id=None):
+        return [
+            dict(row, type='day', path=f"{row['year']}/{row['month']}/{row['day']}")
+            for row in self._group(['year', 'month', 'day'], year=year, month=month, camera_id=camera_id)
+        ]
+
+    def count_recordings(self, **filters):
+        where, params = self._filters(**filters)
+        with self._lock:
+            row = self._conn.execute(f'SELECT COUNT(*) AS total FROM recordings{where}', params).fetchone()
+        return row['total']
+
+    def list_recordings(self, limit=None, offset=0, descending=False, **filters):
+        where, params = self._filters(**filters)
+        query = f"SELECT * FROM recordings{where} ORDER BY start_ts {'DESC' if descending else 'ASC'}, path"
+        if limit is not None:
+            query += ' LIMIT ? OFFSET ?'
+            params += [int(limit), int(offset)]
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row_to_entry(dict(row)) for row in rows]
+
+    def index_rows(self):
+        """Retorna (start_ts, caminho relativo, câmera, tamanho) de todas as gravações."""
+        with self._lock:
+            rows = self._conn.execute('SELECT start_ts, path, camera_id, size FROM recordings').fetchall()
+        return [tuple(row) for row in rows]
+
+    def total_size(self, camera_id=None):
+        where, params = self._filters(camera_id=camera_id)
+        with self._lock:
+            row = self._conn.execute(f'SELECT COALESCE(SUM(size), 0) AS total FROM recordings{where}', params).fetchone()
+        return row['total']
+
+    def _row_to_entry(self, row):
+        relative = row['path']
+        return {
+            'filename': row['filename'],
+            'path': os.path.join(self.base_path, *relative.split('/')),
+            'relative_path': relative,
+            'camera_id': row['camera_id'],
+            'year': row['year'],
+            'month': row['month'],
+            'day': row['day'],
+            'start_ts': row['start_ts'],
+            'end_ts': row['end_ts'],
+            'duration': row['duration'],
+            'size': row['size'],
+            'size_formatted': format_file_size(row['size']),
+            'trigger': row['trigger'],
+            'codec': row['codec'],
+            'playable': browser_playable(row['filename'], row['codec']),
+            'created': datetime.fromtimestamp(row['start_ts']).strftime("%d/%m/%Y %H:%M:%S"),
+            'url': f"/recordings/{relative}"
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_recording_catalog():
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = RecordingCatalog()
+                if _catalog.get_meta('reconciled_at') is None:
+                    threading.Thread(target=_catalog.reconcile, name='catalog-reconcile', daemon=True).start()
+    return _catalog
@@ -9,6 +9,9 @@ from config import RECORDING
 
 logger = logging.getLogger(__name__)
 
+# Extensões reconhecidas como gravações (MP4 recodificado ou passthrough MP4/MKV)
+RECORDING_EXTENSIONS = ('.mp4', '.mkv')
+
 def get_month_name(month_num):
     """Retorna o nome do mês em português"""
     months = {
@@ -55,96 +58,75 @@ def ensure_recording_directory_exists(date=None):
         logger.error(f"Erro ao criar diretório de gravações: {e}")
         return None
 
-def generate_recording_filename(date=None):
+def generate_recording_filename(date=None, camera_id=None, extension='.mp4'):
     """
-    Gera um nome de arquivo único para gravação
-    Formato: clip_HH:MMhDD/MM/YY.mp4
+    Gera um nome de arquivo para gravação
+    Formato: clip_HH:MM:SShDD/MM/YY[_camera].mp4
     """
     if date is None:
         date = datetime.now()
     
-    time_str = date.strftime("%H:%M")
+    time_str = date.strftime("%H:%M:%S")
     date_str = date.strftime("%d/%m/%y")
     
-    filename = f"clip_{time_str}h{date_str}.mp4"
+    filename = f"clip_{time_str}h{date_str}"
+    if camera_id:
+        filename += f"_{camera_id}"
+    filename += extension
     
     # Substituir caracteres problemáticos para sistemas de arquivo
     filename = filename.replace('/', '-').replace(':', '-')
     
     return filename
 
-def get_all_recordings():
+def unique_recording_path(directory, filename):
+    """Caminho em directory para filename, com sufixo _N se o arquivo já existir"""
+    full_path = os.path.join(directory, filename)
+    base, ext = os.path.splitext(filename)
+    suffix = 1
+    while os.path.exists(full_path):
+        full_path = os.path.join(directory, f"{base}_{suffix}{ext}")
+        suffix += 1
+    return full_path
+
+def get_all_recordings(camera_id=None):
     """
-    Retorna todas as gravações organizadas por data
+    Retorna todas as gravações organizadas por data, a partir do catálogo
     Estrutura: {ano: {mes: {dia: [arquivos]}}}
     """
-    base_path = get_recordings_base_path()
+    from recording_catalog import get_recording_catalog
+
     recordings = {}
-    
-    if not os.path.exists(base_path):
-        return recordings
-    
     try:
-        # Percorrer anos
-        for year in sorted(os.listdir(base_path)):
-            year_path = os.path.join(base_path, year)
-            if not os.path.isdir(year_path):
-                continue
-            
-            recordings[year] = {}
-            
-            # Percorrer meses
-            for month in sorted(os.listdir(year_path)):
-                month_path = os.path.join(year_path, month)
-                if not os.path.isdir(month_path):
-                    continue
-                
-                recordings[year][month] = {}
-                
-                # Percorrer dias
-                for day in sorted(os.listdir(month_path)):
-                    day_path = os.path.join(month_path, day)
-                    if not os.path.isdir(day_path):
-                        continue
-                    
-                    # Listar arquivos de vídeo
-                    video_files = []
-                    for file in sorted(os.listdir(day_path)):
-                        if file.endswith('.mp4'):
-                            file_path = os.path.join(day_path, file)
-                            try:
-                                stat = os.stat(file_path)
-                                video_files.append({
-                                    'filename': file,
-                                    'path': file_path,
-                                    'size': stat.st_size,
-                                    'size_formatted': f"{stat.st_size / (1024*1024):.1f} MB",
-                                    'created': datetime.fromtimestamp(stat.st_ctime).strftime("%d/%m/%Y %H:%M:%S"),
-                                    'url': f"/recordings/{year}/{month}/{day}/{file}"
-                                })
-                            except Exception as e:
-                                logger.error(f"Erro ao obter info do arquivo {file}: {e}")
-                    
-                    recordings[year][month][day] = video_files
-    
+        for entry in get_recording_catalog().list_recordings(camera_id=camera_id):
+            days = recordings.setdefault(entry['year'], {}).setdefault(entry['month'], {})
+            days.setdefault(entry['day'], []).append(entry)
     except Exception as e:
         logger.error(f"Erro ao listar gravações: {e}")
     
     return recordings
 
-def get_recordings_by_year_month(year, month):
+def get_recordings_by_year_month(year, month, camera_id=None):
     """
     Retorna gravações de um ano e mês específicos
+    Estrutura: {dia: [arquivos]}
     """
-    all_recordings = get_all_recordings()
-    return all_recordings.get(year, {}).get(month, {})
+    from recording_catalog import get_recording_catalog
 
-def get_recordings_by_date(year, month, day):
+    days = {}
+    for entry in get_recording_catalog().list_recordings(year=year, month=month, camera_id=camera_id):
+        days.setdefault(entry['day'], []).append(entry)
+    return days
+
+def get_recordings_by_date(year, month, day, camera_id=None, limit=None, offset=0):
     """
     Retorna gravações de uma data específica
     """
-    all_recordings = get_all_recordings()
-    return all_recordings.get(year, {}).get(month, {}).get(day, [])
+    from recording_catalog import get_recording_catalog
+
+    return get_recording_catalog().list_recordings(
+        year=year, month=month, day=day, camera_id=camera_id, limit=limit, offset=offset
+    )
 
 def format_file_size(size_bytes):
     """Formata tamanho de arquivo em bytes para formato legível"""
@@ -161,19 +143,19 @@ def format_file_size(size_bytes):
 def parse_recording_filename(filename):
     """
     Tenta extrair informações do nome do arquivo de gravação
-    Formato esperado: clip_HH-MMhDD-MM-YY.mp4
+    Formato esperado: clip_HH-MM[-SS]hDD-MM-YY[_camera].mp4
     """
     try:
         # Remover extensão
-        name_without_ext = filename.replace('.mp4', '')
+        name_without_ext = os.path.splitext(filename)[0]
         
         # Separar partes
-        parts = name_without_ext.split('h')
+        parts = name_without_ext.split('h', 1)
         if len(parts) != 2:
             return None
         
         time_part = parts[0].replace('clip_', '')
-        date_part = parts[1]
+        date_part, _, camera_id = parts[1].partition('_')
         
         # Substituir traços de volta para barras e dois pontos
         time_str = time_part.replace('-', ':')
@@ -182,7 +164,8 @@ def parse_recording_filename(filename):
         return {
             'time': time_str,
             'date': date_str,
-            'datetime_str': f"{date_str} {time_str}"
+            'datetime_str': f"{date_str} {time_str}",
+            'camera_id': camera_id or None
         }
     except:
         return None
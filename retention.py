@@ -0,0 +1,232 @@
+"""
+Gerenciador de retenção das gravações.
+
+Mantém o total de bytes em execução e um índice ordenado por tempo dos
+segmentos (heaps global e por câmera). Quando ``max_storage_gb``, a cota de
+uma câmera ou a idade máxima é ultrapassada, os segmentos mais antigos são
+apagados aos poucos em uma thread de fundo, nunca no caminho da gravação.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+
+from config import RECORDING, SYSTEM
+from recording_catalog import get_recording_catalog
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+
+class RetentionManager:
+    def __init__(self, catalog=None, config_source=None, system_source=None):
+        self.catalog = catalog or get_recording_catalog()
+        self.config = config_source or RECORDING
+        self.system = system_source or SYSTEM
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        self._heap = []
+        self._camera_heaps = {}
+        self._sizes = {}
+        self.total_bytes = 0
+        self.camera_bytes = {}
+
+        self.deleted_files = 0
+        self.deleted_bytes = 0
+        self.last_run = None
+
+    @property
+    def max_bytes(self):
+        return float(self.config.get('max_storage_gb', 10)) * GB
+
+    @property
+    def target_ratio(self):
+        return float(self.config.get('cleanup_target_ratio', 0.8))
+
+    @property
+    def camera_quotas(self):
+        return self.config.get('camera_quotas_gb') or {}
+
+    @property
+    def retention_days(self):
+        return self.config.get('retention_days') or self.system.get('alert_retention_days')
+
+    @property
+    def check_interval(self):
+        return float(self.config.get('retention_check_interval', 300))
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='retention', daemon=True)
+        self._thread.start()
+
+    def _load_index(self):
+        # O listener entra antes da carga para nao perder clipes finalizados
+        # durante a leitura; _add ignora caminhos ja conhecidos.
+        self.catalog.add_listener(self.track)
+        with self._lock:
+            for start_ts, path, camera_id, size in self.catalog.index_rows():
+                self._add(start_ts, path, camera_id, size)
+            heapq.heapify(self._heap)
+            for heap in self._camera_heaps.values():
+                heapq.heapify(heap)
+
+    def _add(self, start_ts, path, camera_id, size, push=False):
+        if path in self._sizes:
+            previous_camera, previous_size = self._sizes[path]
+            self.total_bytes -= previous_size
+            self.camera_bytes[previous_camera] = self.camera_bytes.get(previous_camera, 0) - previous_size
+        else:
+            item = (start_ts, path)
+            camera_heap = self._camera_heaps.setdefault(camera_id, [])
+            if push:
+                heapq.heappush(self._heap, item)
+                heapq.heappush(camera_heap, item)
+            else:
+                self._heap.append(item)
+                camera_heap.append(item)
+        self._sizes[path] = (camera_id, size)
+        self.total_bytes += size
+        self.camera_bytes[camera_id] = self.camera_bytes.get(camera_id, 0) + size
+
+    def track(self, entry):
+        with self._lock:
+            self._add(entry['start_ts'], entry['relative_path'], entry['camera_id'], entry['size'], push=True)
+            over_quota = self.total_bytes > self.max_bytes or self._camera_over_quota(entry['camera_id'])
+        if over_quota:
+            self._wake.set()
+
+    def _camera_over_quota(self, camera_id):
+        quota = self.camera_quotas.get(camera_id)
+        return bool(quota) and self.camera_bytes.get(camera_id, 0) > float(quota) * GB
+
+    def _run(self):
+        try:
+            self._load_index()
+        except Exception as e:
+            logger.error(f"Erro ao carregar índice de retenção: {e}")
+            return
+
+        while True:
+            try:
+                self.enforce()
+            except Exception as e:
+                logger.error(f"Erro na retenção de gravações: {e}")
+            self._wake.wait(timeout=self.check_interval)
+            self._wake.clear()
+
+    def _pop_oldest(self, heap):
+        while heap:
+            start_ts, path = heap[0]
+            if path in self._sizes:
+                return start_ts, path
+            heapq.heappop(heap)
+        return None
+
+    def _delete(self, path):
+        camera_id, size = self._sizes.pop(path)
+        self.total_bytes -= size
+        self.camera_bytes[camera_id] = self.camera_bytes.get(camera_id, 0) - size
+
+        full_path = os.path.join(self.catalog.base_path, *path.split('/'))
+        try:
+            os.remove(full_path)
+            logger.info(f"Gravação antiga removida: {full_path}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Erro ao remover gravação {full_path}: {e}")
+        self.catalog.remove_recording(path)
+
+        try:
+            os.rmdir(os.path.dirname(full_path))
+        except OSError:
+            pass
+
+        self.deleted_files += 1
+        self.deleted_bytes += size
+
+    def _evict(self, heap, should_continue):
+        removed = 0
+        while True:
+            with self._lock:
+                oldest = self._pop_oldest(heap)
+                if oldest is None or not should_continue(oldest[0]):
+                    return removed
+                self._delete(oldest[1])
+            removed += 1
+
+    def enforce(self):
+        removed = 0
+        retention_days = self.retention_days
+        if retention_days:
+            cutoff = time.time() - float(retention_days) * 86400
+            removed += self._evict(self._heap, lambda start_ts: start_ts < cutoff)
+            self._prune_alert_images(cutoff)
+
+        if self.total_bytes > self.max_bytes:
+            target = self.max_bytes * self.target_ratio
+            removed += self._evict(self._heap, lambda _: self.total_bytes > target)
+
+        for camera_id, quota_gb in self.camera_quotas.items():
+            if not quota_gb or camera_id not in self._camera_heaps:
+                continue
+            target = float(quota_gb) * GB
+            if self.camera_bytes.get(camera_id, 0) > target:
+                target *= self.target_ratio
+                removed += self._evict(
+                    self._camera_heaps[camera_id],
+                    lambda _, cam=camera_id, limit=target: self.camera_bytes.get(cam, 0) > limit
+                )
+
+        self.last_run = time.time()
+        if removed:
+            logger.info(
+                f"Retenção: {removed} gravações removidas, "
+                f"{self.total_bytes / GB:.2f} GB em uso de {self.max_bytes / GB:.2f} GB"
+            )
+        return removed
+
+    @staticmethod
+    def _prune_alert_images(cutoff, alerts_dir='alerts'):
+        try:
+            entries = list(os.scandir(alerts_dir))
+        except OSError:
+            return
+        for entry in entries:
+            if not entry.name.endswith('.jpg'):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+    def get_stats(self):
+        return {
+            'total_bytes': self.total_bytes,
+            'max_bytes': int(self.max_bytes),
+            'camera_bytes': {str(cam): size for cam, size in self.camera_bytes.items()},
+            'segments': len(self._sizes),
+            'deleted_files': self.deleted_files,
+            'deleted_bytes': self.deleted_bytes,
+            'retention_days': self.retention_days,
+            'last_run': self.last_run
+        }
+
+
+_retention_manager = None
+
+
+def get_retention_manager():
+    global _retention_manager
+    if _retention_manager is None:
+        _retention_manager = RetentionManager()
+    return _retention_manager
@@ -0,0 +1,180 @@
+"""
+Snapshot versionado do ``/status`` e amostragem das metricas do sistema.
+
+O snapshot so e reconstruido quando alguma camera, alerta ou conexao avisa
+que mudou (``notify_status_change``) ou quando passa ``max_age`` segundos.
+Cada conteudo diferente recebe uma nova versao, usada como ETag: polls sem
+mudanca respondem 304 sem serializar nada. Cada nova versao tambem e
+publicada no canal SSE (``event_hub``) como evento ``status``, com o mesmo
+JSON ja serializado.
+
+Telemetria que muda a cada frame (FPS, idade do frame, contadores, numeros
+do agendador) fica fora do snapshot versionado: senao toda reconstrucao
+geraria uma versao nova. Ela e separada em ``telemetry()``, sem versao, e
+servida por um endpoint proprio.
+
+As metricas de CPU, memoria e disco sao coletadas por uma thread propria a
+cada ``interval`` segundos em vez de a cada requisicao.
+"""
+
+import json
+import logging
+import threading
+import time
+
+from event_hub import publish_event
+
+logger = logging.getLogger(__name__)
+
+# Campos de telemetria: saem do snapshot versionado e vao para telemetry()
+TELEMETRY_FIELDS = frozenset({
+    'timestamp', 'motion_count', 'person_count', 'total_detections', 'ai_last_timestamp', 'avg_fps'
+})
+CAMERA_TELEMETRY_FIELDS = frozenset({
+    'motion_events', 'person_events', 'detection_count', 'tracking', 'last_frame',
+    'last_inference_ts', 'last_inference', 'frame_rate', 'detection_schedule', 'frame_age_ms',
+    'buffer_lag_ms', 'detection_latency_ms', 'frames_discarded', 'motion', 'substream'
+})
+
+
+def split_telemetry(payload):
+    """Separa o payload em (estado versionado, telemetria sem versao)."""
+    state = {k: v for k, v in payload.items() if k not in TELEMETRY_FIELDS}
+    telemetry = {k: v for k, v in payload.items() if k in TELEMETRY_FIELDS}
+    cameras = payload.get('cameras')
+    if cameras is not None:
+        state['cameras'] = [
+            {k: v for k, v in camera.items() if k not in CAMERA_TELEMETRY_FIELDS}
+            for camera in cameras
+        ]
+        telemetry['cameras'] = [
+            dict({k: v for k, v in camera.items() if k in CAMERA_TELEMETRY_FIELDS}, id=camera.get('id'))
+            for camera in cameras
+        ]
+    return state, telemetry
+
+
+class StatusAggregator:
+    def __init__(self, min_interval=0.5, max_age=5.0):
+        self.min_interval = min_interval
+        self.max_age = max_age
+
+        self._builder = None
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._thread = None
+
+        self.version = 0
+        self.built_at = 0.0
+        self.rebuilds = 0
+        self._content = None
+        self._body = None
+        self._telemetry = {}
+
+    def configure(self, builder):
+        self._builder = builder
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='status-aggregator', daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        self._changed.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as exc:
+                logger.error('Erro ao montar snapshot de status: %s', exc)
+            self._changed.wait(timeout=self.max_age)
+            self._changed.clear()
+            # Agrupa rajadas de mudancas (varias cameras no mesmo instante)
+            time.sleep(self.min_interval)
+
+    def refresh(self):
+        state, telemetry = split_telemetry(self._builder())
+        content = json.dumps(state, sort_keys=True, default=str)
+        with self._lock:
+            self.built_at = time.time()
+            self.rebuilds += 1
+            self._telemetry = telemetry
+            if content == self._content:
+                return self.version
+            self.version += 1
+            state['version'] = self.version
+            self._content = content
+            self._body = body = json.dumps(state, default=str)
+            version = self.version
+        publish_event('status', body)
+        return version
+
+    @property
+    def etag(self):
+        return f'status-{self.version}'
+
+    def snapshot(self):
+        """Retorna (etag, corpo JSON) do ultimo snapshot."""
+        if self._body is None:
+            self.refresh()
+        with self._lock:
+            return self.etag, self._body
+
+    def telemetry(self):
+        """Ultima telemetria coletada (atualizada a cada ``max_age`` segundos)."""
+        if self._body is None:
+            self.refresh()
+        with self._lock:
+            return dict(self._telemetry, built_at=self.built_at)
+
+    def get_stats(self):
+        return {'version': self.version, 'rebuilds': self.rebuilds, 'built_at': self.built_at}
+
+
+class SystemSampler:
+    def __init__(self, interval=5.0, disk_path='.'):
+        self.interval = interval
+        self.disk_path = disk_path
+        self._thread = None
+        self.sample = {'cpu_percent': 0.0, 'memory_percent': 0.0, 'disk_free': 0, 'sampled_at': None}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='system-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        import psutil
+
+        # A primeira chamada de cpu_percent so inicia a medicao
+        psutil.cpu_percent(interval=None)
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sample = {
+                    'cpu_percent': psutil.cpu_percent(interval=None),
+                    'memory_percent': psutil.virtual_memory().percent,
+                    'disk_free': psutil.disk_usage(self.disk_path).free // (1024 ** 3),  # GB
+                    'sampled_at': time.time()
+                }
+            except Exception as exc:
+                logger.error('Erro ao coletar metricas do sistema: %s', exc)
+
+
+_status_aggregator = StatusAggregator()
+_system_sampler = SystemSampler()
+
+
+def get_status_aggregator():
+    return _status_aggregator
+
+
+def get_system_sampler():
+    return _system_sampler
+
+
+def notify_status_change():
+    _status_aggregator.notify()
@@ -0,0 +1,312 @@
+"""
+Servidor assincrono para os endpoints de streaming (MJPEG e SSE).
+
+Com o servidor threaded do Flask cada ``/video_feed`` aberto prende uma
+thread do SO dentro de ``generate_frames`` durante toda a sessao. Aqui os
+mesmos endpoints rodam num servidor aiohttp, em uma thread propria com seu
+event loop, dentro do mesmo processo e com o mesmo ``CameraManager``:
+
+* cada perfil de camera (``ViewSpec``) tem um unico repasse: uma thread
+  assina o ``FrameBroadcaster`` e distribui os bytes para as filas asyncio
+  dos clientes, entao o numero de threads nao cresce com os clientes. O
+  repasse sai do indice quando o ultimo cliente sai, e e trocado (levando os
+  clientes junto) quando a camera e recriada com um broadcaster novo;
+* a fila de cada cliente e curta (``client_queue``); quando um cliente lento
+  enche a fila, o frame mais antigo e descartado e ele recebe sempre o mais
+  recente;
+* ``/events`` funciona igual, com um repasse do ``EventHub`` e replay por
+  ``Last-Event-ID``.
+
+A autenticacao reaproveita o cookie de sessao do Flask (o painel envia o
+cookie para a outra porta do mesmo host). ``aiohttp`` e opcional: sem ele o
+servidor nao sobe e o painel segue usando os endpoints do Flask.
+"""
+
+import asyncio
+import logging
+import threading
+from urllib.parse import urlparse
+
+from config import STREAMING
+from event_hub import format_event, get_event_hub
+from live_view import resolve_view
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+
+class Relay:
+    """Uma thread le a fonte bloqueante e entrega cada item as filas asyncio."""
+
+    def __init__(self, loop, name, source, on_clients=None, owner=None):
+        self.loop = loop
+        self.name = name
+        self.owner = owner
+        self._source = source
+        self._on_clients = on_clients
+        self.clients = set()
+        self.dropped = 0
+        self.delivered = 0
+        self.stopped = False
+        self._thread = None
+
+    def add(self, client_queue):
+        self.clients.add(client_queue)
+        self._changed()
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name=f'relay-{self.name}', daemon=True)
+        self._thread.start()
+
+    def _finished(self, thread):
+        # Roda no event loop: um cliente pode ter chegado enquanto a thread saia
+        if self._thread is thread:
+            self._thread = None
+            if self.clients and not self.stopped:
+                self._start()
+
+    def remove(self, client_queue):
+        self.clients.discard(client_queue)
+        self._changed()
+
+    def stop(self):
+        """Encerra o repasse; retorna os clientes que ainda estavam nele."""
+        self.stopped = True
+        clients, self.clients = self.clients, set()
+        self._changed()
+        return clients
+
+    def _changed(self):
+        if self._on_clients is not None:
+            self._on_clients(len(self.clients))
+
+    def _run(self):
+        source = self._source()
+        try:
+            for item in source:
+                # Sem clientes o repasse encerra e solta a fonte (o codificador para)
+                if not self.clients or self.stopped:
+                    break
+                self.loop.call_soon_threadsafe(self._fan_out, item)
+        except Exception as exc:
+            logger.error('Erro no repasse %s: %s', self.name, exc)
+        finally:
+            source.close()
+            self.loop.call_soon_threadsafe(self._finished, threading.current_thread())
+
+    def _fan_out(self, item):
+        for client_queue in list(self.clients):
+            if client_queue.full():
+                # Cliente lento: descarta o item antigo em vez de acumular atraso
+                client_queue.get_nowait()
+                self.dropped += 1
+            client_queue.put_nowait(item)
+            self.delivered += 1
+
+
+class StreamServer:
+    def __init__(self, camera_manager, authenticate, initial_status=None, settings=None):
+        self.camera_manager = camera_manager
+        self.authenticate = authenticate
+        self.initial_status = initial_status
+        self.settings = settings or STREAMING
+
+        self.loop = None
+        self.running = False
+        self._thread = None
+        self._relays = {}
+        self.connections_total = 0
+
+    @property
+    def port(self):
+        return int(self.settings.get('port', 5001))
+
+    def start(self):
+        """Sobe o servidor em segundo plano; retorna False se o aiohttp faltar."""
+        if self.running:
+            return True
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            logger.error('aiohttp nao instalado; streaming assincrono desativado')
+            return False
+        self.running = True
+        self._thread = threading.Thread(target=self._serve, name='stream-server', daemon=True)
+        self._thread.start()
+        return True
+
+    def _serve(self):
+        from aiohttp import web
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        app = web.Application()
+        app.router.add_get('/video_feed', self.video_feed)
+        app.router.add_get('/video_feed/{camera_id}', self.video_feed)
+        app.router.add_get('/events', self.events)
+
+        runner = web.AppRunner(app, access_log=None)
+        try:
+            self.loop.run_until_complete(runner.setup())
+            site = web.TCPSite(runner, self.settings.get('host', '0.0.0.0'), self.port)
+            self.loop.run_until_complete(site.start())
+        except Exception as exc:
+            logger.error('Nao foi possivel iniciar o streaming assincrono na porta %s: %s', self.port, exc)
+            self.running = False
+            return
+        logger.info('Streaming assincrono em %s:%s', self.settings.get('host', '0.0.0.0'), self.port)
+        self.loop.run_forever()
+
+    def _relay(self, key, name, source, on_clients=None, owner=None):
+        """Repasse de ``key``; se a fonte mudou (camera recriada), troca o repasse."""
+        relay = self._relays.get(key)
+        if relay is not None and relay.owner is not owner:
+            clients = relay.stop()
+            relay = None
+        else:
+            clients = ()
+        if relay is None:
+            relay = self._relays[key] = Relay(self.loop, name, source, on_clients, owner)
+            for client_queue in clients:
+                relay.add(client_queue)
+        return relay
+
+    def _detach(self, key, client_queue):
+        # Roda no event loop, como _relay: sem lock
+        relay = self._relays.get(key)
+        if relay is None:
+            return
+        relay.remove(client_queue)
+        if not relay.clients:
+            del self._relays[key]
+            relay.stop()
+
+    def _allowed(self, request):
+        return self.authenticate(request.cookies)
+
+    @staticmethod
+    def _cors_headers(request):
+        # O painel (porta do Flask) le o SSE daqui; so o mesmo host pode ler com cookie
+        origin = request.headers.get('Origin')
+        if origin and urlparse(origin).hostname == request.url.host:
+            return {'Access-Control-Allow-Origin': origin, 'Access-Control-Allow-Credentials': 'true'}
+        return {}
+
+    async def video_feed(self, request):
+        from aiohttp import web
+
+        if not self._allowed(request):
+            raise web.HTTPUnauthorized()
+        camera_id = request.match_info.get('camera_id') or request.query.get('camera_id')
+        manager = self.camera_manager
+        stream = manager.get_stream(camera_id) if camera_id else manager.get_default_stream()
+        if stream is None:
+            raise web.HTTPNotFound()
+
+        spec = resolve_view(
+            request.query.get('profile'),
+            width=request.query.get('width'),
+            quality=request.query.get('quality'),
+            max_fps=request.query.get('fps')
+        )
+        view = stream.get_view(spec)
+
+        def set_relayed(count):
+            # O repasse ja conta como um assinante do broadcaster
+            view.relayed_viewers = max(0, count - 1)
+
+        key = (stream.camera_id, spec)
+        relay = self._relay(key, f'{stream.camera_id}-{spec.width or "full"}', view.subscribe, set_relayed, view)
+
+        response = web.StreamResponse(headers={
+            'Content-Type': 'multipart/x-mixed-replace; boundary=frame',
+            'Cache-Control': 'no-cache'
+        })
+        await response.prepare(request)
+        client_queue = asyncio.Queue(maxsize=max(1, int(self.settings.get('client_queue', 2))))
+        relay.add(client_queue)
+        self.connections_total += 1
+        try:
+            while True:
+                jpeg = await client_queue.get()
+                await response.write(FRAME_HEADER + jpeg + b'\r\n')
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            # O repasse pode ter sido trocado no meio da sessao: sai do atual
+            self._detach(key, client_queue)
+        return response
+
+    async def events(self, request):
+        from aiohttp import web
+
+        if not self._allowed(request):
+            raise web.HTTPUnauthorized()
+        hub = get_event_hub()
+
+        def hub_source():
+            cursor = hub.resolve_cursor()
+            while True:
+                pending = hub.read_after(cursor, timeout=hub.heartbeat)
+                if pending:
+                    cursor = pending[-1][0]
+                # Lista vazia = intervalo sem eventos, vira comentario de keep-alive
+                yield pending
+
+        relay = self._relay('events', 'events', hub_source)
+
+        headers = {'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        headers.update(self._cors_headers(request))
+        response = web.StreamResponse(headers=headers)
+        await response.prepare(request)
+
+        client_queue = asyncio.Queue(maxsize=max(1, int(self.settings.get('event_queue', 100))))
+        relay.add(client_queue)
+        self.connections_total += 1
+        try:
+            cursor = hub.resolve_cursor(request.headers.get('Last-Event-ID'))
+            await response.write(f'retry: {hub.retry_ms}\n\n'.encode('utf-8'))
+            if self.initial_status is not None:
+                await response.write(format_event(None, 'status', self.initial_status()).encode('utf-8'))
+            # Eventos perdidos desde o Last-Event-ID saem do historico do hub
+            backlog = hub.read_after(cursor)
+            while True:
+                pending = [(event_id, message) for event_id, message in backlog if event_id > cursor]
+                if pending:
+                    cursor = pending[-1][0]
+                    await response.write(''.join(message for _, message in pending).encode('utf-8'))
+                elif not backlog:
+                    await response.write(': ping\n\n'.encode('utf-8'))
+                backlog = await client_queue.get()
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            self._detach('events', client_queue)
+        return response
+
+    def public_base(self, request_host):
+        """Base absoluta usada pelo painel para apontar os streams para ca."""
+        if not self.running:
+            return ''
+        if self.settings.get('public_url'):
+            return self.settings['public_url'].rstrip('/')
+        hostname = urlparse(f'//{request_host}').hostname or 'localhost'
+        if ':' in hostname:
+            hostname = f'[{hostname}]'
+        return f'//{hostname}:{self.port}'
+
+    def get_stats(self):
+        relays = list(self._relays.items())
+        return {
+            'running': self.running,
+            'port': self.port,
+            'connections': self.connections_total,
+            'clients': sum(len(relay.clients) for _, relay in relays),
+            'relays': len(relays),
+            'dropped': sum(relay.dropped for _, relay in relays),
+            'delivered': sum(relay.delivered for _, relay in relays)
+        }
@@ -0,0 +1,158 @@
+"""
+Rastreador leve de pessoas por IoU, usado para deduplicar deteccoes.
+
+Cada rodada do YOLO e associada as trilhas existentes pela sobreposicao
+(IoU) com a posicao prevista de cada trilha; caixas sem par abrem trilhas
+novas. So trilhas novas contam como evento e disparam alerta, entao uma
+pessoa parada na frente da camera conta uma vez e uma segunda pessoa que
+chega logo depois nao e perdida.
+
+Cada trilha guarda uma velocidade suavizada (pixels/s) para extrapolar a
+caixa entre rodadas do YOLO; assim o overlay continua acompanhando a pessoa
+enquanto a inferencia roda com menos frequencia. Trilhas sem atualizacao
+ha mais de ``max_age`` segundos sao descartadas.
+"""
+
+import itertools
+import threading
+
+import numpy as np
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU entre todas as caixas ``x1, y1, x2, y2`` de ``boxes_a`` e ``boxes_b``."""
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    def __init__(self, track_id, bbox, confidence, timestamp):
+        self.track_id = track_id
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.confidence = confidence
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.hits = 1
+
+    def predict(self, timestamp, max_extrapolation):
+        dt = min(max(0.0, timestamp - self.last_seen), max_extrapolation)
+        return self.bbox + self.velocity * dt
+
+    def update(self, bbox, confidence, timestamp, smoothing):
+        bbox = np.asarray(bbox, dtype=np.float32)
+        dt = timestamp - self.last_seen
+        if dt > 0:
+            velocity = (bbox - self.bbox) / dt
+            self.velocity += smoothing * (velocity - self.velocity)
+        self.bbox = bbox
+        self.confidence = confidence
+        self.last_seen = timestamp
+        self.hits += 1
+
+    def as_detection(self, bbox=None):
+        x1, y1, x2, y2 = (self.bbox if bbox is None else bbox).tolist()
+        return {
+            'track_id': self.track_id,
+            'bbox': (int(x1), int(y1), int(x2), int(y2)),
+            'confidence': self.confidence
+        }
+
+
+class IoUTracker:
+    def __init__(self, iou_threshold=0.3, max_age=3.0, min_hits=1, max_extrapolation=1.0, smoothing=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = max(1, int(min_hits))
+        self.max_extrapolation = max_extrapolation
+        self.smoothing = smoothing
+
+        self._lock = threading.Lock()
+        self._tracks = []
+        self._ids = itertools.count(1)
+        self.tracks_total = 0
+
+    def configure(self, settings):
+        self.iou_threshold = float(settings.get('track_iou', self.iou_threshold))
+        self.max_age = float(settings.get('track_max_age', self.max_age))
+        self.min_hits = max(1, int(settings.get('track_min_hits', self.min_hits)))
+
+    def update(self, detections, timestamp):
+        """Associa as deteccoes de uma rodada do YOLO.
+
+        Retorna ``(trilhas ativas, trilhas confirmadas nesta rodada)``, ambas
+        como listas de dicts com ``track_id``, ``bbox`` e ``confidence``.
+        """
+        with self._lock:
+            self._tracks = [t for t in self._tracks if timestamp - t.last_seen <= self.max_age]
+
+            boxes = np.array([d['bbox'] for d in detections], dtype=np.float32).reshape(-1, 4)
+            predicted = np.array(
+                [t.predict(timestamp, self.max_extrapolation) for t in self._tracks],
+                dtype=np.float32
+            ).reshape(-1, 4)
+            overlaps = iou_matrix(predicted, boxes)
+
+            # Associacao gulosa pelo maior IoU; suficiente para poucas pessoas por camera
+            matched_tracks = set()
+            matched_detections = set()
+            for flat in np.argsort(overlaps, axis=None)[::-1]:
+                track_index, det_index = (int(i) for i in np.unravel_index(flat, overlaps.shape))
+                if overlaps[track_index, det_index] < self.iou_threshold:
+                    break
+                if track_index in matched_tracks or det_index in matched_detections:
+                    continue
+                matched_tracks.add(track_index)
+                matched_detections.add(det_index)
+                detection = detections[det_index]
+                self._tracks[track_index].update(detection['bbox'], detection['confidence'], timestamp, self.smoothing)
+
+            confirmed = []
+            for index, track in enumerate(self._tracks):
+                if index in matched_tracks and track.hits == self.min_hits:
+                    confirmed.append(track)
+
+            for index, detection in enumerate(detections):
+                if index in matched_detections:
+                    continue
+                track = Track(next(self._ids), detection['bbox'], detection['confidence'], timestamp)
+                self._tracks.append(track)
+                if self.min_hits == 1:
+                    confirmed.append(track)
+
+            self.tracks_total += len(confirmed)
+            active = [t.as_detection() for t in self._tracks if t.hits >= self.min_hits and t.last_seen == timestamp]
+            return active, [t.as_detection() for t in confirmed]
+
+    def predict(self, timestamp):
+        """Caixas das trilhas confirmadas extrapoladas para ``timestamp``."""
+        with self._lock:
+            return [
+                track.as_detection(track.predict(timestamp, self.max_extrapolation))
+                for track in self._tracks
+                if track.hits >= self.min_hits and timestamp - track.last_seen <= self.max_age
+            ]
+
+    def has_active(self, timestamp):
+        with self._lock:
+            return any(
+                track.hits >= self.min_hits and timestamp - track.last_seen <= self.max_age
+                for track in self._tracks
+            )
+
+    def reset(self):
+        with self._lock:
+            self._tracks = []
+
+    def get_stats(self):
+        with self._lock:
+            return {'active_tracks': len(self._tracks), 'tracks_total': self.tracks_total}